@@ -0,0 +1,20 @@
+"""本地数据目录（去重索引等需要持久保存的文件）"""
+import os
+import sys
+
+
+def get_data_dir():
+    """
+    获取本地数据目录，不存在时自动创建
+
+    优先使用环境变量 VOICE_UPLOAD_DATA_DIR；打包环境下写入用户主目录，
+    开发环境下写入当前目录的 data 文件夹（与 logs 文件夹并列）。
+    """
+    data_dir = os.environ.get("VOICE_UPLOAD_DATA_DIR")
+    if not data_dir:
+        if getattr(sys, 'frozen', False):
+            data_dir = os.path.join(os.path.expanduser("~"), ".voice_upload_tool")
+        else:
+            data_dir = "data"
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
@@ -0,0 +1,231 @@
+"""
+上传前的音频预处理
+
+解码 -> 混音为单声道 -> 去除首尾静音 -> 检查时长 -> 重采样 -> 重新编码。
+参考音频建议时长 5-30 秒，而用户常常直接拖入大体积的 WAV、长录音或 48kHz 立体声文件，
+预处理后上传的数据量通常只有原来的几分之一。DSP 全部使用 NumPy 向量化运算；
+WAV 由标准库直接解码，其他格式以及 MP3 编码需要系统中安装 ffmpeg。
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPTIONS = {
+    # 输出采样率，CosyVoice 系列模型内部使用 16k/24k
+    "sample_rate": 24000,
+    # 去除静音后允许的最长秒数，超出时拒绝上传（截断会使音频与文字内容不一致），为None时不检查
+    "max_duration": None,
+    # 是否去除首尾静音
+    "trim_silence": True,
+    # 低于该电平（dBFS）的帧视为静音
+    "silence_threshold_db": -40.0,
+    # 去除静音后首尾各保留的秒数，避免切掉字头字尾
+    "silence_padding": 0.1,
+    # 输出格式：wav、mp3，auto 表示有 ffmpeg 时用 mp3，否则用 wav
+    "format": "auto",
+}
+
+
+class PreprocessError(Exception):
+    """音频无法解码或编码，调用方可以改用原文件上传"""
+
+
+class AudioTooLongError(Exception):
+    """去除静音后的时长仍超过 max_duration，不能截断（文字内容对应的是完整音频），也不应改用原文件上传"""
+
+
+def find_ffmpeg():
+    """查找 ffmpeg，未安装时返回None"""
+    return shutil.which("ffmpeg")
+
+
+def _read_wav(path):
+    """用标准库读取 PCM WAV，返回 (float32数组[帧, 声道], 采样率)"""
+    with wave.open(path, "rb") as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        raw = f.readframes(f.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        # 24位样本补成32位再转换
+        bytes3 = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((bytes3.shape[0], 4), dtype=np.uint8)
+        padded[:, 1:] = bytes3
+        samples = padded.view("<i4").reshape(-1).astype(np.float32) / 2147483648.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise PreprocessError(f"不支持的WAV采样位宽: {width * 8}位")
+
+    return samples.reshape(-1, channels), rate
+
+
+def decode_audio(path):
+    """
+    解码音频文件
+
+    返回:
+        tuple: (float32数组[帧, 声道]，取值范围[-1, 1], 采样率)
+    """
+    try:
+        return _read_wav(path)
+    except (wave.Error, EOFError):
+        # 不是标准库能处理的 PCM WAV，交给 ffmpeg 转成临时 WAV
+        pass
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise PreprocessError(f"解码 {os.path.splitext(path)[1] or '该'} 格式需要安装ffmpeg")
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-i", path, "-acodec", "pcm_s16le", tmp_path],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        return _read_wav(tmp_path)
+    except subprocess.CalledProcessError as e:
+        raise PreprocessError(f"ffmpeg解码失败: {e.stderr.decode('utf-8', 'replace').strip()}")
+    finally:
+        os.remove(tmp_path)
+
+
+def to_mono(samples):
+    """多声道取平均混为单声道"""
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def trim_silence(samples, rate, threshold_db=-40.0, padding=0.1, frame_ms=20):
+    """按帧的RMS电平去除首尾静音，整段都低于阈值时原样返回"""
+    frame = max(1, int(rate * frame_ms / 1000))
+    count = len(samples) // frame
+    if count == 0:
+        return samples
+
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    voiced = np.flatnonzero(rms > 10 ** (threshold_db / 20))
+    if voiced.size == 0:
+        return samples
+
+    pad = int(rate * padding)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+
+def resample(samples, rate, target_rate):
+    """基于FFT的带限重采样，降采样时自动滤除高于新奈奎斯特频率的成分"""
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    target_len = max(1, int(round(len(samples) * target_rate / rate)))
+    spectrum = np.fft.rfft(samples)
+    bins = target_len // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, target_len) * (target_len / len(samples))).astype(np.float32)
+
+
+def write_wav(path, samples, rate):
+    """写入16位单声道PCM WAV"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+
+
+def encode_audio(path, samples, rate, fmt):
+    """按格式写出音频，mp3 通过 ffmpeg 从内存中的PCM编码"""
+    if fmt == "wav":
+        write_wav(path, samples, rate)
+        return
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        raise PreprocessError(f"编码 {fmt} 格式需要安装ffmpeg")
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    try:
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "-",
+             "-b:a", "64k", path],
+            input=pcm.tobytes(), check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except subprocess.CalledProcessError as e:
+        raise PreprocessError(f"ffmpeg编码失败: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+
+def preprocess_file(path, options=None, output_dir=None):
+    """
+    预处理单个音频文件
+
+    处理结果比原文件还大时（例如原本就是低码率的MP3）返回原文件路径。
+
+    参数:
+        path (str): 原始音频路径
+        options (dict): 预处理参数，未指定的项使用 DEFAULT_OPTIONS
+        output_dir (str): 输出目录，默认使用系统临时目录
+
+    返回:
+        str: 预处理后的文件路径（调用方负责删除），或原文件路径
+    """
+    opts = dict(DEFAULT_OPTIONS)
+    if options:
+        opts.update(options)
+
+    fmt = opts["format"]
+    if fmt == "auto":
+        fmt = "mp3" if find_ffmpeg() else "wav"
+
+    samples, rate = decode_audio(path)
+    samples = to_mono(samples)
+    if opts["trim_silence"]:
+        samples = trim_silence(samples, rate, opts["silence_threshold_db"], opts["silence_padding"])
+    duration = len(samples) / rate
+    if opts["max_duration"] and duration > opts["max_duration"]:
+        raise AudioTooLongError(f"去除首尾静音后时长 {duration:.1f}秒，超过{opts['max_duration']:g}秒的上限")
+    samples = resample(samples, rate, opts["sample_rate"])
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    fd, out_path = tempfile.mkstemp(prefix=f"{stem}_", suffix=f".{fmt}", dir=output_dir)
+    os.close(fd)
+    try:
+        encode_audio(out_path, samples, opts["sample_rate"], fmt)
+    except Exception:
+        os.remove(out_path)
+        raise
+
+    original_size = os.path.getsize(path)
+    new_size = os.path.getsize(out_path)
+    if new_size >= original_size:
+        os.remove(out_path)
+        logger.info(f"预处理后文件未变小，使用原文件: {os.path.basename(path)}")
+        return path
+
+    logger.info(
+        f"预处理完成: {os.path.basename(path)} {original_size / 1024:.0f}KB -> {new_size / 1024:.0f}KB, "
+        f"时长 {len(samples) / opts['sample_rate']:.1f}s"
+    )
+    return out_path
+
+
+def create_process_pool(max_workers=None):
+    """创建用于批量预处理的进程池，DSP是CPU密集型任务，不受GIL限制"""
+    return ProcessPoolExecutor(max_workers=max_workers)
@@ -0,0 +1,423 @@
+"""
+上传前的本地音频检查
+
+只解析容器头部并抽样读取少量音频帧，不做完整解码：WAV 通过 mmap 按窗口抽样计算削波
+和静音比例，MP3/FLAC/OGG/MP4 从帧头、STREAMINFO、最后一页的 granule 或 mvhd 中读出
+时长、采样率和声道数。损坏的文件、静音片段和过长的录音在毫秒级被拒绝，不会浪费一次完整
+上传和服务端往返。这里识别不了的格式（webm、wma等）不做检查，交给服务端判断。只依赖标准库，导入本模块不会加载NumPy。
+"""
+import array
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = {
+    # 时长范围（秒），为None时不检查；参考音频建议5-30秒
+    "min_duration": 1.0,
+    "max_duration": 60.0,
+    # 采样率下限（Hz）
+    "min_sample_rate": 8000,
+    # 声道数上限
+    "max_channels": 2,
+    # 达到满幅的采样点比例上限
+    "max_clipping_ratio": 0.05,
+    # 静音窗口比例上限，整段静音的片段会被拒绝
+    "max_silence_ratio": 0.9,
+    # 低于该电平（dBFS）的窗口视为静音
+    "silence_threshold_db": -50.0,
+    # 允许上传的容器格式
+    "allowed_formats": ("wav", "mp3", "flac", "ogg", "mp4", "aac"),
+}
+
+# 抽样的窗口数和每个窗口的时长（秒）
+SAMPLE_WINDOWS = 64
+WINDOW_SECONDS = 0.03
+
+# 满幅判定阈值
+CLIP_LEVEL = 0.999
+
+# MPEG-1/2 Layer III 的码率表（kbps）和采样率表
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+_ADTS_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+
+class AudioFormatError(Exception):
+    """文件头部损坏或不是可识别的音频格式"""
+
+
+class UnknownFormatError(AudioFormatError):
+    """文件头不属于能解析的任何一种格式"""
+
+
+def _skip_id3(data):
+    """跳过文件开头的 ID3v2 标签，返回音频数据的起始偏移"""
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _probe_wav(data):
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise AudioFormatError("WAV文件头损坏")
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        (size,) = struct.unpack("<I", data[offset + 4:offset + 8])
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(data):
+                raise AudioFormatError("WAV fmt 块不完整")
+            tag, channels, rate, _, block_align, bits = struct.unpack("<HHIIHH", data[body:body + 16])
+            if tag == 0xFFFE and size >= 26:
+                # WAVE_FORMAT_EXTENSIBLE：真实编码在子格式GUID的前两个字节
+                (tag,) = struct.unpack("<H", data[body + 24:body + 26])
+            fmt = (tag, channels, rate, block_align, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError("WAV缺少 fmt 块")
+            tag, channels, rate, block_align, bits = fmt
+            if not channels or not rate or not block_align:
+                raise AudioFormatError("WAV格式参数无效")
+            # 录音中断或流式写出的文件 data 大小可能不准确，以实际文件长度为准
+            size = min(size, len(data) - body)
+            return {
+                "format": "wav",
+                "codec": {1: "pcm", 3: "float"}.get(tag, f"0x{tag:04x}"),
+                "sample_rate": rate,
+                "channels": channels,
+                "duration": size // block_align / rate,
+                "_pcm": (body, size, block_align, bits // 8) if tag in (1, 3) else None,
+                "_float": tag == 3,
+            }
+        offset = body + size + (size & 1)
+    raise AudioFormatError("WAV缺少 data 块")
+
+
+def _mp3_frame(data, pos):
+    """解析 pos 处的 MPEG 音频帧头，返回 (版本, 层, 码率kbps, 采样率, 声道数, 帧长)，不是合法帧头时返回None"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    # 只识别 Layer III，版本、码率和采样率的保留值都视为无效
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_index]
+    rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (data[pos + 2] >> 1) & 0x01
+    channels = 1 if data[pos + 3] >> 6 == 3 else 2
+    length = (144 if version == 3 else 72) * bitrate * 1000 // rate + padding
+    return version, layer, bitrate, rate, channels, length
+
+
+def _probe_mp3(data):
+    start = _skip_id3(data)
+    # 在开头64KB内寻找连续两个合法帧头，避免把数据中的偶然同步字当作帧
+    for pos in range(start, min(len(data), start + 64 * 1024)):
+        frame = _mp3_frame(data, pos)
+        if frame and _mp3_frame(data, pos + frame[5]):
+            break
+    else:
+        raise AudioFormatError("未找到有效的MP3帧")
+
+    version, _, bitrate, rate, channels, _ = frame
+    samples_per_frame = 1152 if version == 3 else 576
+    # VBR 文件的第一帧是 Xing/Info 或 VBRI 头，记录了总帧数
+    side_info = (32 if channels == 2 else 17) if version == 3 else (17 if channels == 2 else 9)
+    xing = pos + 4 + side_info
+    frames = None
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        (flags,) = struct.unpack(">I", data[xing + 4:xing + 8])
+        if flags & 0x01:
+            (frames,) = struct.unpack(">I", data[xing + 8:xing + 12])
+    elif data[pos + 36:pos + 40] == b"VBRI":
+        (frames,) = struct.unpack(">I", data[pos + 50:pos + 54])
+
+    if frames:
+        duration = frames * samples_per_frame / rate
+    else:
+        end = len(data) - (128 if data[-128:-125] == b"TAG" else 0)
+        duration = (end - pos) * 8 / (bitrate * 1000)
+    return {"format": "mp3", "codec": "mp3", "sample_rate": rate, "channels": channels, "duration": duration}
+
+
+def _probe_flac(data):
+    start = _skip_id3(data)
+    if data[start:start + 4] != b"fLaC" or data[start + 4] & 0x7F != 0 or len(data) < start + 8 + 34:
+        raise AudioFormatError("FLAC文件头损坏")
+    streaminfo = start + 8
+    (packed,) = struct.unpack(">Q", data[streaminfo + 10:streaminfo + 18])
+    rate = packed >> 44
+    if not rate:
+        raise AudioFormatError("FLAC采样率无效")
+    total = packed & ((1 << 36) - 1)
+    return {
+        "format": "flac",
+        "codec": "flac",
+        "sample_rate": rate,
+        "channels": ((packed >> 41) & 0x07) + 1,
+        # 总采样数为0表示编码器未写入，时长未知
+        "duration": total / rate if total else None,
+    }
+
+
+def _probe_ogg(data):
+    if len(data) < 28 or data[:4] != b"OggS":
+        raise AudioFormatError("OGG文件头损坏")
+    packet = 27 + data[26]
+    if data[packet:packet + 7] == b"\x01vorbis":
+        codec = "vorbis"
+        channels = data[packet + 11]
+        (rate,) = struct.unpack("<I", data[packet + 12:packet + 16])
+        granule_rate, pre_skip = rate, 0
+    elif data[packet:packet + 8] == b"OpusHead":
+        codec = "opus"
+        channels = data[packet + 9]
+        pre_skip, rate = struct.unpack("<HI", data[packet + 10:packet + 16])
+        # Opus 的 granule 总是以48kHz计数
+        granule_rate = 48000
+    else:
+        raise AudioFormatError("OGG中没有可识别的音频流")
+    if not granule_rate:
+        raise AudioFormatError("OGG采样率无效")
+
+    # 最后一页的 granule position 即总采样数
+    last = data.rfind(b"OggS", max(0, len(data) - 64 * 1024))
+    duration = None
+    if last >= 0 and last + 14 <= len(data):
+        (granule,) = struct.unpack("<q", data[last + 6:last + 14])
+        if granule > 0:
+            duration = max(0, granule - pre_skip) / granule_rate
+    return {"format": "ogg", "codec": codec, "sample_rate": rate or None, "channels": channels, "duration": duration}
+
+
+def _iter_boxes(data, start, end):
+    """遍历 MP4 box，产出 (类型, 内容起始偏移, 结束偏移)"""
+    offset = start
+    while offset + 8 <= end:
+        (size,) = struct.unpack(">I", data[offset:offset + 4])
+        box_type = data[offset + 4:offset + 8]
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", data[offset + 8:offset + 16])
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise AudioFormatError("MP4 box 长度无效")
+        yield box_type, offset + header, min(end, offset + size)
+        offset += size
+
+
+def _probe_mp4(data):
+    duration = None
+    for box_type, body, end in _iter_boxes(data, 0, len(data)):
+        if box_type != b"moov":
+            continue
+        for child_type, child, _ in _iter_boxes(data, body, end):
+            if child_type != b"mvhd":
+                continue
+            if data[child] == 1:
+                timescale, length = struct.unpack(">IQ", data[child + 20:child + 32])
+            else:
+                timescale, length = struct.unpack(">II", data[child + 12:child + 20])
+            if timescale:
+                duration = length / timescale
+    return {"format": "mp4", "codec": None, "sample_rate": None, "channels": None, "duration": duration}
+
+
+def _probe_adts(data):
+    start = _skip_id3(data)
+    rate_index = (data[start + 2] >> 2) & 0x0F
+    if rate_index >= len(_ADTS_SAMPLE_RATES):
+        raise AudioFormatError("AAC采样率无效")
+    channels = ((data[start + 2] & 0x01) << 2) | (data[start + 3] >> 6)
+    return {
+        "format": "aac",
+        "codec": "aac",
+        "sample_rate": _ADTS_SAMPLE_RATES[rate_index],
+        "channels": channels or None,
+        "duration": None,
+    }
+
+
+def probe(data):
+    """
+    按文件头的特征识别格式并读取基本参数
+
+    参数:
+        data: 文件内容（bytes 或 mmap）
+
+    返回:
+        dict: format, codec, sample_rate, channels, duration，无法得知的项为None
+    """
+    head = data[:12]
+    if head[:4] == b"RIFF":
+        return _probe_wav(data)
+    if head[:4] == b"OggS":
+        return _probe_ogg(data)
+    if head[4:8] == b"ftyp":
+        return _probe_mp4(data)
+    start = _skip_id3(data)
+    marker = data[start:start + 4]
+    if marker == b"fLaC":
+        return _probe_flac(data)
+    if len(marker) >= 2 and marker[0] == 0xFF and marker[1] & 0xF6 == 0xF0:
+        return _probe_adts(data)
+    if len(marker) >= 2 and marker[0] == 0xFF and marker[1] & 0xE0 == 0xE0 or head[:3] == b"ID3":
+        return _probe_mp3(data)
+    raise UnknownFormatError("无法识别的音频格式")
+
+
+def _decode_window(raw, width, is_float):
+    """把一段交错的PCM字节转换为[-1, 1]范围内的浮点采样"""
+    if is_float and width == 4:
+        samples = array.array("f")
+        samples.frombytes(raw)
+        scale = 1.0
+    elif width == 1:
+        return [(b - 128) / 128.0 for b in raw]
+    elif width == 2:
+        samples = array.array("h")
+        samples.frombytes(raw)
+        scale = 32768.0
+    elif width == 3:
+        return [int.from_bytes(raw[i:i + 3], "little", signed=True) / 8388608.0 for i in range(0, len(raw) - 2, 3)]
+    elif width == 4:
+        samples = array.array("i")
+        samples.frombytes(raw)
+        scale = 2147483648.0
+    else:
+        return []
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return [s / scale for s in samples]
+
+
+def sample_levels(data, pcm, rate, is_float, silence_threshold_db, windows=SAMPLE_WINDOWS, window_seconds=WINDOW_SECONDS):
+    """
+    在整段音频上均匀抽取若干窗口，估算削波比例和静音比例
+
+    返回:
+        tuple: (削波采样点比例, 静音窗口比例)
+    """
+    offset, size, block_align, width = pcm
+    frames = size // block_align
+    window_frames = max(1, int(rate * window_seconds))
+    if frames == 0:
+        return 0.0, 1.0
+    windows = max(1, min(windows, frames // window_frames))
+    span = frames - window_frames
+    threshold = 10 ** (silence_threshold_db / 20)
+
+    clipped = total = silent = 0
+    for i in range(windows):
+        start = span * i // (windows - 1) if windows > 1 else 0
+        begin = offset + start * block_align
+        samples = _decode_window(data[begin:begin + window_frames * block_align], width, is_float)
+        if not samples:
+            continue
+        total += len(samples)
+        clipped += sum(1 for s in samples if abs(s) >= CLIP_LEVEL)
+        if math.sqrt(sum(s * s for s in samples) / len(samples)) < threshold:
+            silent += 1
+    return (clipped / total if total else 0.0), silent / windows
+
+
+def validate_audio(path, rules=None):
+    """
+    检查音频文件是否适合上传
+
+    参数:
+        path (str): 音频文件路径
+        rules (dict): 检查规则，未指定的项使用 DEFAULT_RULES，值为None的规则不检查
+
+    返回:
+        dict: ok(是否通过), errors(未通过的原因列表), info(格式、时长、采样率、声道数、削波和静音比例)，
+              无法识别的格式不做检查，视为通过，info 中 format 为None
+    """
+    opts = dict(DEFAULT_RULES)
+    if rules:
+        opts.update(rules)
+
+    try:
+        if os.path.getsize(path) == 0:
+            return {"ok": False, "errors": ["文件为空"], "info": {}}
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            info = probe(data)
+            pcm = info.pop("_pcm", None)
+            is_float = info.pop("_float", False)
+            if pcm and (opts["max_clipping_ratio"] is not None or opts["max_silence_ratio"] is not None):
+                info["clipping_ratio"], info["silence_ratio"] = sample_levels(
+                    data, pcm, info["sample_rate"], is_float, opts["silence_threshold_db"]
+                )
+    except UnknownFormatError:
+        return {"ok": True, "errors": [], "info": {"format": None}}
+    except (AudioFormatError, struct.error, IndexError) as e:
+        message = str(e) if isinstance(e, AudioFormatError) else "文件头不完整"
+        return {"ok": False, "errors": [message], "info": {}}
+    except (OSError, ValueError) as e:
+        return {"ok": False, "errors": [f"无法读取文件: {e}"], "info": {}}
+
+    errors = []
+    if opts["allowed_formats"] and info["format"] not in opts["allowed_formats"]:
+        errors.append(f"不支持的格式: {info['format']}")
+    duration = info.get("duration")
+    if duration is not None:
+        if opts["min_duration"] is not None and duration < opts["min_duration"]:
+            errors.append(f"时长过短 ({duration:.1f}秒)，至少需要{opts['min_duration']:g}秒")
+        if opts["max_duration"] is not None and duration > opts["max_duration"]:
+            errors.append(f"时长过长 ({duration:.1f}秒)，最长{opts['max_duration']:g}秒")
+    if info.get("sample_rate") and opts["min_sample_rate"] and info["sample_rate"] < opts["min_sample_rate"]:
+        errors.append(f"采样率过低 ({info['sample_rate']}Hz)")
+    if info.get("channels") and opts["max_channels"] and info["channels"] > opts["max_channels"]:
+        errors.append(f"声道数过多 ({info['channels']})")
+    if info.get("clipping_ratio") is not None and opts["max_clipping_ratio"] is not None \
+            and info["clipping_ratio"] > opts["max_clipping_ratio"]:
+        errors.append(f"削波严重 ({info['clipping_ratio']:.1%} 的采样点达到满幅)")
+    if info.get("silence_ratio") is not None and opts["max_silence_ratio"] is not None \
+            and info["silence_ratio"] > opts["max_silence_ratio"]:
+        errors.append(f"静音过多 ({info['silence_ratio']:.0%})")
+    return {"ok": not errors, "errors": errors, "info": info}
+
+
+def validate_files(paths, rules=None, max_workers=8):
+    """
+    并行检查多个文件，按输入顺序返回结果
+
+    参数:
+        paths (list): 文件路径列表
+        rules (dict): 检查规则
+        max_workers (int): 最大并行数
+
+    返回:
+        list: 每个文件的 validate_audio 结果
+    """
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(paths))), thread_name_prefix="audio-validate") as executor:
+        return list(executor.map(lambda path: validate_audio(path, rules), paths))
+
+
+def format_errors(report):
+    """把检查结果格式化为一行错误信息"""
+    return "音频检查未通过：" + "；".join(report["errors"])
@@ -0,0 +1,125 @@
+"""
+批量上传的检查点日志
+
+批量上传时每完成一个条目就向日志文件追加一行JSON，记录条目的状态和返回的uri。
+进程崩溃、断网或按下 Ctrl-C 中断后，使用 --resume 重新运行同一批条目时，
+日志中已成功的条目直接沿用记录的uri，只上传未完成和失败的条目。
+
+日志只追加不修改，每条记录写入后立即刷新到磁盘，中断时最多丢失正在写入的一行，
+读取时会忽略这样不完整的行。同一条目有多条记录时以最后一条为准。
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 目录模式下日志文件的默认文件名
+DIRECTORY_JOURNAL_NAME = ".voice_upload_journal.jsonl"
+
+
+def item_key(item):
+    """条目的标识：文件路径、名称、文字内容和模型都相同才视为同一条目"""
+    identity = [os.path.abspath(item["file"]) if item["file"] else "", item["customName"], item["text"], item["model"]]
+    return hashlib.sha1(json.dumps(identity, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def default_journal_path(manifest=None, directory=None):
+    """清单模式下日志保存在清单旁边，目录模式下保存在音频目录中"""
+    if manifest:
+        return os.path.abspath(manifest) + ".journal.jsonl"
+    return os.path.join(os.path.abspath(directory), DIRECTORY_JOURNAL_NAME)
+
+
+class BatchJournal:
+    """
+    追加写入的检查点日志
+
+    参数:
+        path (str): 日志文件路径
+        resume (bool): 读取已有的记录以跳过已完成的条目；为False时清空日志重新开始
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.completed = {}
+        self._lock = threading.Lock()
+        if resume:
+            self._load()
+        elif os.path.exists(path):
+            logger.info(f"未指定继续上次的批量上传，清空检查点日志: {path}")
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logger.info(f"检查点日志不存在，从头开始: {self.path}")
+            return
+        states = {}
+        line = ""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 通常是中断时写了一半的最后一行
+                    logger.warning(f"检查点日志第{line_no}行不完整，已忽略")
+                    continue
+                states[record["key"]] = record
+        if line and not line.endswith("\n"):
+            # 补上换行，否则新记录会接在不完整的行后面一起被忽略
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        self.completed = {key: record for key, record in states.items() if record.get("status") == "success"}
+        logger.info(f"从检查点日志读取到 {len(self.completed)} 个已完成的条目: {self.path}")
+
+    def split(self, items):
+        """
+        区分已完成和待上传的条目
+
+        返回:
+            tuple: (待上传的条目列表, [(已完成的条目, 日志记录)])
+        """
+        pending = []
+        done = []
+        for item in items:
+            record = self.completed.get(item_key(item))
+            if record:
+                done.append((item, record))
+            else:
+                pending.append(item)
+        return pending, done
+
+    def record(self, result):
+        """追加一个条目的最终结果并立即写入磁盘"""
+        record = {
+            "key": item_key(result),
+            "index": result["index"],
+            "file": result["file"],
+            "customName": result["customName"],
+            "status": result["status"],
+            "uri": result.get("uri"),
+            "error": result.get("error"),
+            "at": time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if result["status"] == "success":
+                self.completed[record["key"]] = record
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,293 @@
+"""
+批量上传引擎
+
+从清单文件（CSV/JSONL）或目录加载待上传条目，通过有界线程池并发调用单条上传函数，
+逐条汇报进度并统计整体吞吐量。失败的条目会重新排到队尾重试，不会阻塞其余条目。
+"""
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+
+# 目录模式下识别的音频扩展名
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac", ".m4a", ".aac", ".opus")
+
+
+def _make_item(index, file, custom_name, text, model, base_dir=None):
+    """构造一个批量条目，相对路径以清单所在目录为基准"""
+    file = (file or "").strip()
+    if file and base_dir and not os.path.isabs(file):
+        file = os.path.join(base_dir, file)
+    return {
+        "index": index,
+        "file": file,
+        "customName": (custom_name or "").strip(),
+        "text": (text or "").strip(),
+        "model": (model or "").strip() or DEFAULT_MODEL,
+    }
+
+
+def load_manifest(manifest_path, default_model=DEFAULT_MODEL):
+    """
+    读取批量上传清单
+
+    支持两种格式，字段名与API保持一致：
+    - CSV：表头包含 file, customName, text, model（model可省略）
+    - JSONL：每行一个JSON对象，字段同上
+
+    参数:
+        manifest_path (str): 清单文件路径
+        default_model (str): 条目未指定model时使用的模型
+
+    返回:
+        list: 条目列表
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    items = []
+
+    if manifest_path.lower().endswith((".jsonl", ".ndjson")):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"清单第{line_no}行不是合法的JSON: {e}")
+                items.append(_make_item(
+                    len(items), row.get("file"), row.get("customName"),
+                    row.get("text"), row.get("model") or default_model, base_dir
+                ))
+    else:
+        # utf-8-sig 兼容 Excel 导出的带BOM的CSV
+        with open(manifest_path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                items.append(_make_item(
+                    len(items), row.get("file"), row.get("customName"),
+                    row.get("text"), row.get("model") or default_model, base_dir
+                ))
+
+    logger.info(f"从清单加载 {len(items)} 个条目: {manifest_path}")
+    return items
+
+
+def scan_directory(directory, default_model=DEFAULT_MODEL):
+    """
+    扫描目录生成批量条目
+
+    每个音频文件需要一个同名的 .txt 文件作为参考文字内容，
+    音色名称取文件名（不含扩展名）。缺少文字文件的音频同样会生成条目，
+    由上传阶段报告错误，方便在结果中看到遗漏的文件。
+
+    参数:
+        directory (str): 音频所在目录
+        default_model (str): 使用的模型
+
+    返回:
+        list: 条目列表
+    """
+    items = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        text = ""
+        text_path = os.path.join(directory, stem + ".txt")
+        if os.path.exists(text_path):
+            with open(text_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        items.append(_make_item(len(items), os.path.join(directory, name), stem, text, default_model))
+
+    logger.info(f"从目录扫描到 {len(items)} 个音频: {directory}")
+    return items
+
+
+def iter_batch(items, worker, concurrency=4, max_retries=2, retry_delay=2.0):
+    """
+    并发执行批量上传，按完成顺序逐条产出结果
+
+    worker(item) 需返回字典，至少包含:
+        ok (bool): 是否成功
+        uri (str): 成功时返回的音色ID
+        error (str): 失败原因
+        retryable (bool): 失败是否值得重试（由worker判断，如限流、请求确定未送达的连接错误）
+
+    可重试的失败在退避期间不占用线程，由调度循环等到退避时间过后再重新排到线程池队尾，
+    其余条目照常执行。
+
+    参数:
+        items (list): 条目列表
+        worker (callable): 单条上传函数
+        concurrency (int): 最大并发数
+        max_retries (int): 每个条目的最大重试次数
+        retry_delay (float): 首次重试的等待秒数，之后按指数增长
+
+    产出:
+        dict: 单个条目的最终结果
+    """
+    concurrency = max(1, int(concurrency))
+
+    def run(item, attempt):
+        start = time.monotonic()
+        try:
+            outcome = worker(item)
+        except Exception as e:
+            logger.exception(f"批量条目执行异常: {item['file']}")
+            outcome = {"ok": False, "error": str(e), "retryable": False}
+        outcome["elapsed"] = time.monotonic() - start
+        outcome["attempts"] = attempt
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-upload") as executor:
+        pending = {}
+        # 等待退避的重试条目：(可以提交的时间, 序号, 条目, 第几次尝试)
+        delayed = []
+        sequence = itertools.count()
+        for item in items:
+            pending[executor.submit(run, item, 1)] = item
+
+        try:
+            while pending or delayed:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    _, _, item, attempt = heapq.heappop(delayed)
+                    pending[executor.submit(run, item, attempt)] = item
+                timeout = max(0.0, delayed[0][0] - now) if delayed else None
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    outcome = future.result()
+                    attempt = outcome["attempts"]
+                    if not outcome.get("ok") and outcome.get("retryable") and attempt <= max_retries:
+                        backoff = retry_delay * (2 ** (attempt - 1))
+                        logger.warning(f"上传失败，{backoff:.1f}秒后第{attempt}次重试: {item['file']} - {outcome.get('error')}")
+                        heapq.heappush(delayed, (time.monotonic() + backoff, next(sequence), item, attempt + 1))
+                        continue
+
+                    yield make_result(item, outcome, attempt, outcome["elapsed"])
+        finally:
+            # 中途停止（如 Ctrl-C）时取消还没开始的条目，只等待正在上传的条目结束
+            for future in pending:
+                future.cancel()
+
+
+def make_result(item, outcome, attempts, elapsed):
+    """由条目和最终执行结果构造 iter_batch 产出的结果"""
+    result = dict(item)
+    result.update({
+        "status": "success" if outcome.get("ok") else "failed",
+        "uri": outcome.get("uri"),
+        "duplicate": outcome.get("duplicate", False),
+        "resumed": outcome.get("resumed", False),
+        "error": outcome.get("error"),
+        "key": outcome.get("key"),
+        "attempts": attempts,
+        "elapsed": elapsed,
+    })
+    return result
+
+
+def run_batch(items, worker, concurrency=4, max_retries=2, retry_delay=2.0, progress_callback=None):
+    """
+    执行批量上传并返回汇总信息
+
+    参数:
+        items (list): 条目列表
+        worker (callable): 单条上传函数，约定同 iter_batch
+        concurrency (int): 最大并发数
+        max_retries (int): 每个条目的最大重试次数
+        retry_delay (float): 首次重试的等待秒数
+        progress_callback (callable): 每完成一条调用 progress_callback(result, done, total)
+
+    返回:
+        dict: 汇总信息，包含 results 和吞吐统计
+    """
+    stats = BatchStats(len(items))
+    for result in iter_batch(items, worker, concurrency, max_retries, retry_delay):
+        stats.add(result)
+        if progress_callback:
+            progress_callback(result, stats.done, stats.total)
+    return stats.summary()
+
+
+class BatchStats:
+    """累计批量上传的进度与吞吐量"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.resumed = 0
+        self.bytes_uploaded = 0
+        self.results = []
+        self.start = time.monotonic()
+
+    def add(self, result):
+        self.done += 1
+        self.results.append(result)
+        if result["status"] == "success":
+            self.succeeded += 1
+            self.resumed += bool(result.get("resumed"))
+            # 命中去重索引和沿用上次结果的条目没有实际上传，不计入吞吐量
+            if not result.get("duplicate") and not result.get("resumed"):
+                try:
+                    self.bytes_uploaded += os.path.getsize(result["file"])
+                except OSError:
+                    pass
+        else:
+            self.failed += 1
+
+    def summary(self):
+        elapsed = time.monotonic() - self.start
+        return {
+            "total": self.total,
+            "done": self.done,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "resumed": self.resumed,
+            "elapsed": elapsed,
+            "items_per_second": self.done / elapsed if elapsed > 0 else 0.0,
+            "mb_per_second": self.bytes_uploaded / (1024 * 1024) / elapsed if elapsed > 0 else 0.0,
+            "results": sorted(self.results, key=lambda r: r["index"]),
+        }
+
+
+def format_progress(result, done, total):
+    """格式化单条进度信息"""
+    name = result["customName"] or os.path.basename(result["file"])
+    if result.get("key"):
+        name = f"{name} @{result['key']}"
+    if result["status"] == "success":
+        if result.get("resumed"):
+            return f"[{done}/{total}] ✓ {name} -> {result['uri']} (上次已完成，跳过)"
+        if result.get("duplicate"):
+            return f"[{done}/{total}] ✓ {name} -> {result['uri']} (已上传过，跳过)"
+        return f"[{done}/{total}] ✓ {name} -> {result['uri']} ({result['elapsed']:.1f}s)"
+    if not result["attempts"]:
+        # 未通过上传前检查的条目没有发出过请求
+        return f"[{done}/{total}] ✗ {name}: {result['error']}"
+    return f"[{done}/{total}] ✗ {name}: {result['error']} (尝试{result['attempts']}次)"
+
+
+def format_summary(summary):
+    """格式化批量汇总信息"""
+    resumed = f"（其中 {summary['resumed']} 个上次已完成）" if summary.get("resumed") else ""
+    return (
+        f"批量上传完成：共 {summary['total']} 个，成功 {summary['succeeded']} 个{resumed}，失败 {summary['failed']} 个\n"
+        f"耗时 {summary['elapsed']:.1f}s，吞吐 {summary['items_per_second']:.2f} 个/秒，"
+        f"{summary['mb_per_second']:.2f} MB/秒"
+    )
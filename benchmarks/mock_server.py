@@ -0,0 +1,291 @@
+"""
+本地模拟的硅基流动API
+
+实现 /v1/uploads/audio/voice、/v1/audio/voice/list、/v1/audio/voice/deletions、/v1/audio/speech 和 /v1/user/info 接口，
+可以配置响应延迟、接收带宽、错误注入比例和音色列表的大小，供基准测试和本地调试使用，不会访问真实服务。
+语音合成接口按文本长度返回一段正弦波（WAV），分块流式发送。
+通过环境变量 SILICONFLOW_BASE_URL 指向本服务即可。包含 invalid 的API Key会被拒绝（401）。
+
+用法:
+    python benchmarks/mock_server.py --port 8808 --latency 0.2 --bandwidth 20 --error-rate 0.05 --voices 2000
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 接收请求体时每次读取的字节数，带宽限制按块计算
+READ_CHUNK_SIZE = 64 * 1024
+
+# 合成音频流式发送时的块大小和采样率
+SPEECH_CHUNK_SIZE = 8 * 1024
+SPEECH_RATE = 16000
+
+
+class MockState:
+    """
+    模拟服务的配置和数据
+
+    参数:
+        latency (float): 每个请求在返回前额外等待的秒数
+        bandwidth (float): 单个上传连接的接收速率（MB/秒），0表示不限制
+        error_rate (float): 返回错误的比例（0-1）
+        error_status (int): 注入错误时返回的状态码，429时附带 Retry-After
+        voices (int): 初始音色列表的条数
+    """
+
+    def __init__(self, latency=0.0, bandwidth=0.0, error_rate=0.0, error_status=503, voices=100):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.lock = threading.Lock()
+        self.voices = [self._voice(f"voice-{i}", f"预置音色{i}") for i in range(voices)]
+        self.uploads = 0
+        self.syntheses = 0
+
+    @staticmethod
+    def _voice(name, text, model="FunAudioLLM/CosyVoice2-0.5B"):
+        return {"model": model, "customName": name, "text": text, "uri": f"speech:{name}:mock:{uuid.uuid4().hex}"}
+
+    def add_voice(self, name, text, model):
+        voice = self._voice(name, text, model)
+        with self.lock:
+            self.voices.append(voice)
+            self.uploads += 1
+        return voice
+
+    def delete_voice(self, uri):
+        """删除音色，返回是否存在"""
+        with self.lock:
+            for index, voice in enumerate(self.voices):
+                if voice["uri"] == uri:
+                    del self.voices[index]
+                    return True
+        return False
+
+    def synthesize(self, text):
+        """每个字约0.2秒的正弦波，用于检查试听和缓存，不是真实的语音"""
+        with self.lock:
+            self.syntheses += 1
+        frames = int(SPEECH_RATE * 0.2 * max(1, len(text)))
+        samples = struct.pack(f"<{frames}h", *(int(8000 * math.sin(2 * math.pi * 220 * i / SPEECH_RATE))
+                                              for i in range(frames)))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SPEECH_RATE)
+            w.writeframes(samples)
+        return buffer.getvalue()
+
+    def list_body(self):
+        with self.lock:
+            body = json.dumps({"result": self.voices}, ensure_ascii=False).encode("utf-8")
+        return body, '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+def _parse_fields(body, content_type):
+    """从 multipart 请求体中取出普通表单字段，文件内容不解析"""
+    boundary = content_type.split("boundary=", 1)[-1].encode("ascii")
+    fields = {}
+    for part in body.split(b"--" + boundary):
+        head, _, value = part.partition(b"\r\n\r\n")
+        if b"filename=" in head or b'name="' not in head:
+            continue
+        name = head.split(b'name="', 1)[1].split(b'"', 1)[0].decode("utf-8")
+        fields[name] = value[:-2].decode("utf-8", "replace") if value.endswith(b"\r\n") else value.decode("utf-8", "replace")
+    return fields
+
+
+def make_handler(state):
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 响应头和响应体合并发送，并关闭Nagle算法，避免与延迟确认叠加产生约40ms的额外等待
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def _send_json(self, status, payload, headers=None):
+            body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _inject_error(self):
+            """按配置的比例返回错误，返回是否已经响应"""
+            if state.error_rate and random.random() < state.error_rate:
+                headers = {"Retry-After": "1"} if state.error_status == 429 else None
+                self._send_json(state.error_status, {"message": "mock injected error"}, headers)
+                return True
+            return False
+
+        def _authorized(self):
+            authorization = self.headers.get("Authorization", "")
+            if not authorization.startswith("Bearer ") or "invalid" in authorization:
+                self._send_json(401, {"message": "Invalid token"})
+                return False
+            return True
+
+        def _read_body(self):
+            """按配置的带宽读取请求体"""
+            remaining = int(self.headers.get("Content-Length", 0))
+            chunks = []
+            start = time.monotonic()
+            received = 0
+            while remaining > 0:
+                chunk = self.rfile.read(min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+                received += len(chunk)
+                if state.bandwidth:
+                    ahead = received / (state.bandwidth * 1024 * 1024) - (time.monotonic() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+            return b"".join(chunks)
+
+        def do_POST(self):
+            if self.path == "/v1/audio/voice/deletions":
+                self._delete()
+                return
+            if self.path == "/v1/audio/speech":
+                self._speech()
+                return
+            if self.path != "/v1/uploads/audio/voice":
+                self._send_json(404, {"message": "not found"})
+                return
+            body = self._read_body()
+            if not self._authorized():
+                return
+            time.sleep(state.latency)
+            if self._inject_error():
+                return
+            fields = _parse_fields(body, self.headers.get("Content-Type", ""))
+            voice = state.add_voice(fields.get("customName", ""), fields.get("text", ""), fields.get("model", ""))
+            self._send_json(200, {"uri": voice["uri"]})
+
+        def _delete(self):
+            body = self._read_body()
+            if not self._authorized():
+                return
+            time.sleep(state.latency)
+            if self._inject_error():
+                return
+            try:
+                uri = json.loads(body or b"{}").get("uri")
+            except ValueError:
+                uri = None
+            if not uri or not state.delete_voice(uri):
+                self._send_json(400, {"message": "voice not found"})
+                return
+            self._send_json(200, {})
+
+        def _speech(self):
+            """分块发送合成的音频（Transfer-Encoding: chunked），延迟分摊到各块之间"""
+            body = self._read_body()
+            if not self._authorized():
+                return
+            if self._inject_error():
+                return
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                payload = {}
+            if not payload.get("input") or not payload.get("voice"):
+                self._send_json(400, {"message": "input and voice are required"})
+                return
+            audio = state.synthesize(payload["input"])
+            chunks = [audio[i:i + SPEECH_CHUNK_SIZE] for i in range(0, len(audio), SPEECH_CHUNK_SIZE)]
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/wav")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in chunks:
+                time.sleep(state.latency / len(chunks))
+                self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            if self.path == "/v1/user/info":
+                if self._authorized():
+                    self._send_json(200, {"code": 20000, "status": True, "data": {"id": "mock", "status": "normal"}})
+                return
+            if self.path != "/v1/audio/voice/list":
+                self._send_json(404, {"message": "not found"})
+                return
+            if not self._authorized():
+                return
+            time.sleep(state.latency)
+            if self._inject_error():
+                return
+            body, etag = state.list_body()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send_json(200, body, {"ETag": etag})
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockHandler
+
+
+def create_server(host="127.0.0.1", port=0, **options):
+    """
+    创建模拟服务（未启动），port为0时自动分配端口
+
+    返回:
+        ThreadingHTTPServer: 服务器实例，state 属性为 MockState
+    """
+    state = MockState(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟的硅基流动API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808, help="监听端口，0表示自动分配")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求额外等待的秒数")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="单个上传连接的接收速率（MB/秒），0表示不限制")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的比例（0-1）")
+    parser.add_argument("--error-status", type=int, default=503, help="注入错误时返回的状态码")
+    parser.add_argument("--voices", type=int, default=100, help="初始音色列表的条数")
+    args = parser.parse_args()
+
+    server = create_server(
+        args.host, args.port, latency=args.latency, bandwidth=args.bandwidth,
+        error_rate=args.error_rate, error_status=args.error_status, voices=args.voices
+    )
+    # 第一行输出实际地址，供调用方（基准测试）读取
+    print(f"http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+启动耗时基准测试
+
+分别测量 `import voice_api`（命令行/脚本路径）和 `import gradio`（图形界面路径）在
+新进程中的导入耗时，并用 -X importtime 列出 voice_api 导入链中最慢的模块，
+同时检查命令行路径没有加载 Gradio。
+
+用法:
+    python benchmarks/startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(statement, runs):
+    """在新进程中执行导入语句，返回每次的耗时（秒）"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def slowest_imports(module, top):
+    """解析 -X importtime 的输出，返回累计耗时最长的模块"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, check=True, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # 格式: "import time: self [us] | cumulative | imported package"
+        _, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数")
+    parser.add_argument("--top", type=int, default=10, help="列出最慢的模块数量")
+    args = parser.parse_args()
+
+    check = subprocess.run(
+        [sys.executable, "-c", "import sys, voice_api; print('gradio' in sys.modules)"],
+        cwd=ROOT, check=True, stdout=subprocess.PIPE, universal_newlines=True
+    )
+    print(f"import voice_api 是否加载了Gradio: {check.stdout.strip()}")
+
+    for label, statement in [
+        ("python (空进程)", "pass"),
+        ("import voice_api", "import voice_api"),
+        ("import cli", "import cli"),
+        ("import gradio", "import gradio"),
+    ]:
+        try:
+            samples = time_import(statement, args.runs)
+        except subprocess.CalledProcessError:
+            print(f"{label:<20} 导入失败")
+            continue
+        print(f"{label:<20} 中位数 {statistics.median(samples) * 1000:8.1f}ms  最小 {min(samples) * 1000:8.1f}ms")
+
+    print(f"\nimport voice_api 中累计耗时最长的 {args.top} 个模块:")
+    for cumulative_us, name in slowest_imports("voice_api", args.top):
+        print(f"{cumulative_us / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
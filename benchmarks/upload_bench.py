@@ -0,0 +1,273 @@
+"""
+上传和查询列表的吞吐量基准测试
+
+启动本地模拟服务（mock_server.py），按不同的执行方式、并发数和文件大小驱动上传路径，
+以及不同并发数下的列表查询路径，报告吞吐量、p50/p99延迟、失败数和峰值内存（RSS）。
+每个场景在独立的子进程中运行，峰值内存和客户端状态（连接池、限流、熔断）互不影响。
+
+用法:
+    python benchmarks/upload_bench.py
+    python benchmarks/upload_bench.py --modes sequential,threaded,async --concurrency 1,4,16 --sizes 0.5,5 --count 40
+    python benchmarks/upload_bench.py --latency 0.3 --bandwidth 10 --error-rate 0.05 --json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+API_KEY = "sk-benchmark-" + "0" * 32
+
+HEADER = (
+    f"{'场景':<5}{'方式':<9}{'并发':>3}{'大小':>7}{'次数':>4}{'失败':>4}"
+    f"{'个/秒':>7}{'MB/秒':>6}{'p50(ms)':>10}{'p99(ms)':>10}{'RSS':>9}"
+)
+
+
+def percentile(samples, q):
+    """最近秩法计算分位数"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），平台不支持时返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以KB为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_items(directory, count, size_mb):
+    """生成随机噪声的WAV测试文件，内容互不相同，不会命中去重索引，且能通过上传前的音频检查"""
+    items = []
+    # 16位单声道，时长随大小变化，关闭时长检查（见 run_upload）
+    frames = max(1, int(size_mb * 1024 * 1024) // 2)
+    for i in range(count):
+        path = os.path.join(directory, f"bench-{i}.wav")
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(24000)
+            f.writeframes(os.urandom(frames * 2))
+        items.append({
+            "index": i, "file": path, "customName": f"bench-{i}",
+            "text": "基准测试", "model": "FunAudioLLM/CosyVoice2-0.5B",
+        })
+    return items
+
+
+def run_upload(args):
+    """在当前进程中执行一个上传场景"""
+    import voice_api
+
+    # 测试文件的时长由大小决定，只保留格式检查
+    rules = {"min_duration": None, "max_duration": None}
+    with tempfile.TemporaryDirectory() as directory:
+        items = make_items(directory, args.count, args.size)
+        latencies = []
+        failed = 0
+        start = time.perf_counter()
+        if args.mode == "sequential":
+            for item in items:
+                item_start = time.perf_counter()
+                outcome = voice_api.upload_voice_file(
+                    API_KEY, item["file"], item["model"], item["customName"], item["text"], validation_rules=rules
+                )
+                latencies.append(time.perf_counter() - item_start)
+                failed += not outcome["ok"]
+        elif args.mode == "async":
+            latencies, failed = asyncio.run(_upload_async(items, args.concurrency, rules))
+        else:
+            # 批量层不重试，延迟只反映单次执行（客户端内部的退避重试仍然生效）
+            for result in voice_api.iter_batch_upload(API_KEY, items, args.concurrency, max_retries=0,
+                                                      validation_rules=rules):
+                latencies.append(result["elapsed"])
+                failed += result["status"] != "success"
+        elapsed = time.perf_counter() - start
+
+    return {
+        "scenario": "upload",
+        "mode": args.mode,
+        "concurrency": 1 if args.mode == "sequential" else args.concurrency,
+        "size_mb": args.size,
+        "count": args.count,
+        "failed": failed,
+        "elapsed": elapsed,
+        "items_per_second": args.count / elapsed,
+        "mb_per_second": args.count * args.size / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def _upload_async(items, concurrency, rules):
+    """在一个事件循环中以指定的并发数上传，对应界面中的异步处理函数"""
+    import voice_api
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(item):
+        async with semaphore:
+            item_start = time.perf_counter()
+            outcome = await voice_api.upload_voice_file_async(
+                API_KEY, item["file"], item["model"], item["customName"], item["text"], validation_rules=rules
+            )
+            return time.perf_counter() - item_start, outcome["ok"]
+
+    results = await asyncio.gather(*(upload(item) for item in items))
+    return [latency for latency, _ in results], sum(1 for _, ok in results if not ok)
+
+
+def run_list(args):
+    """在当前进程中执行一个列表查询场景，每次查询前清空缓存，测量完整的拉取和解析"""
+    import voice_api
+
+    def fetch(_):
+        voice_api.voice_list_cache.invalidate(API_KEY)
+        call_start = time.perf_counter()
+        entry, error = voice_api.fetch_voice_list(API_KEY)
+        return time.perf_counter() - call_start, error
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(fetch, range(args.count)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, _ in results]
+
+    return {
+        "scenario": "list",
+        "mode": "threaded",
+        "concurrency": args.concurrency,
+        "size_mb": None,
+        "count": args.count,
+        "failed": sum(1 for _, error in results if error),
+        "elapsed": elapsed,
+        "items_per_second": args.count / elapsed,
+        "mb_per_second": None,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_scenario_process(base_url, data_dir, rate_limit, scenario, **options):
+    """在子进程中运行一个场景，返回其结果"""
+    command = [sys.executable, os.path.abspath(__file__), "--run", scenario]
+    for name, value in options.items():
+        command += [f"--{name.replace('_', '-')}", str(value)]
+    env = dict(os.environ, SILICONFLOW_BASE_URL=base_url, VOICE_UPLOAD_DATA_DIR=data_dir,
+               SILICONFLOW_RATE_LIMIT=str(rate_limit))
+    result = subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def start_mock_server(args):
+    """在子进程中启动模拟服务，返回 (进程, 地址)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "mock_server.py"), "--port", "0",
+         "--latency", str(args.latency), "--bandwidth", str(args.bandwidth),
+         "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+         "--voices", str(args.voices)],
+        stdout=subprocess.PIPE, universal_newlines=True
+    )
+    return process, process.stdout.readline().strip()
+
+
+def format_row(row):
+    size = "-" if row["size_mb"] is None else f"{row['size_mb']:g}MB"
+    mb_per_second = "-" if row["mb_per_second"] is None else f"{row['mb_per_second']:.2f}"
+    rss = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.0f}MB"
+    return (
+        f"{row['scenario']:<7}{row['mode']:<11}{row['concurrency']:>5}{size:>9}{row['count']:>6}{row['failed']:>6}"
+        f"{row['items_per_second']:>10.2f}{mb_per_second:>9}{row['p50'] * 1000:>10.1f}{row['p99'] * 1000:>10.1f}{rss:>9}"
+    )
+
+
+def _csv(cast):
+    return lambda value: [cast(part) for part in value.split(",") if part.strip()]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="上传和查询列表的吞吐量基准测试")
+    parser.add_argument("--modes", type=_csv(str), default=["sequential", "threaded"],
+                        help="上传的执行方式，逗号分隔：sequential、threaded、async")
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 4, 8], help="并发数，逗号分隔")
+    parser.add_argument("--sizes", type=_csv(float), default=[0.5, 5.0], help="测试文件大小（MB），逗号分隔")
+    parser.add_argument("--count", type=int, default=20, help="每个场景的上传/查询次数")
+    parser.add_argument("--no-list", action="store_true", help="不测试列表查询")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务每个请求的额外延迟（秒）")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="模拟服务单连接接收速率（MB/秒），0表示不限制")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务返回错误的比例（0-1）")
+    parser.add_argument("--error-status", type=int, default=503, help="注入错误时返回的状态码")
+    parser.add_argument("--voices", type=int, default=1000, help="模拟服务音色列表的条数")
+    parser.add_argument("--rate-limit", type=float, default=1000.0,
+                        help="客户端每秒请求上限，默认放开限流以测量管线本身的吞吐")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    # 以下参数供子进程使用
+    parser.add_argument("--run", choices=["upload", "list"], help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=float, help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.run:
+        # 子进程：--concurrency 只有一个值
+        args.concurrency = args.concurrency[0]
+        sys.path.insert(0, ROOT)
+        result = run_upload(args) if args.run == "upload" else run_list(args)
+        print(json.dumps(result))
+        return
+
+    server, base_url = start_mock_server(args)
+    rows = []
+    if not args.json:
+        print(HEADER)
+    try:
+        with tempfile.TemporaryDirectory() as data_dir:
+            for size in args.sizes:
+                for mode in args.modes:
+                    for concurrency in ([1] if mode == "sequential" else args.concurrency):
+                        rows.append(run_scenario_process(
+                            base_url, data_dir, args.rate_limit, "upload",
+                            mode=mode, concurrency=concurrency, size=size, count=args.count
+                        ))
+                        if not args.json:
+                            print(format_row(rows[-1]), flush=True)
+            if not args.no_list:
+                for concurrency in args.concurrency:
+                    rows.append(run_scenario_process(
+                        base_url, data_dir, args.rate_limit, "list", concurrency=concurrency, count=args.count
+                    ))
+                    if not args.json:
+                        print(format_row(rows[-1]), flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,525 @@
+"""
+硅基流动参考音色上传工具 - 命令行版本
+
+不加载Gradio，适合在定时任务、CI和脚本中调用。API Key 可通过 --api-key 参数
+或环境变量 SILICONFLOW_API_KEY 提供。
+
+示例:
+    python cli.py upload voice.wav --name alice --text "今天天气真不错"
+    python cli.py list --filter alice
+    python cli.py search "alice model:CosyVoice2 after:2026-10-01"
+    python cli.py batch --manifest voices.csv --concurrency 8
+    python cli.py batch --manifest voices.csv --resume
+    python cli.py sync --manifest voices.csv --prune --dry-run
+    python cli.py delete --filter test- --yes
+    python cli.py export voices.csv
+    python cli.py validate voices/*.wav
+    python cli.py check-text --manifest voices.csv
+    python cli.py preview speech:alice:xxx -o alice.mp3
+    python cli.py --keys keys.json batch --manifest voices.csv --concurrency 16
+    python cli.py jobs submit voice.wav --name alice --text "今天天气真不错"
+    python cli.py jobs work
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import audio_validate
+import batch_journal
+import batch_upload
+import job_queue
+import key_pool
+import metrics
+import tts_preview
+import voice_api
+import voice_index
+import voice_manage
+from voice_cache import filter_voices
+
+logger = logging.getLogger(__name__)
+
+
+def cmd_upload(args):
+    outcome = voice_api.upload_voice_file(
+        args.api_key, args.file, args.model, args.name, args.text,
+        skip_duplicates=not args.no_dedup,
+        preprocess_options={} if args.preprocess else None,
+        validate=not args.no_validate
+    )
+    if args.json:
+        print(json.dumps(outcome, ensure_ascii=False))
+    elif outcome["ok"]:
+        print(outcome["uri"])
+    else:
+        print(outcome["error"], file=sys.stderr)
+    return 0 if outcome["ok"] else 1
+
+
+def cmd_list(args):
+    columns = ("customName", "model", "uri")
+    if args.key_pool:
+        # 查询Key池中的所有账号，部分账号失败时仍输出其余账号的音色
+        voices, errors = voice_api.fetch_pool_voice_list(args.key_pool, force_refresh=True)
+        for account, error in errors.items():
+            print(f"[{account}] {error}", file=sys.stderr)
+        if errors and not voices:
+            return 1
+        columns = ("account",) + columns
+    else:
+        entry, error = voice_api.fetch_voice_list(args.api_key, force_refresh=True)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        voices = entry["voices"]
+
+    voices = filter_voices(voices, args.filter)
+    if args.json:
+        print(json.dumps(voices, indent=2, ensure_ascii=False))
+    else:
+        for voice in voices:
+            print("\t".join(str(voice.get(column, "")) for column in columns))
+    return 0
+
+
+def cmd_search(args):
+    # 本地还没有该账号的列表时先拉取一次，之后只在本地索引上检索
+    if args.refresh or not voice_index.get_voice_index().has_account(args.api_key):
+        entry, error = voice_api.fetch_voice_list(args.api_key, force_refresh=args.refresh)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+    result = voice_index.get_voice_index().search(args.api_key, **voice_index.parse_query(args.query))
+    voices = result["voices"][:args.limit] if args.limit else result["voices"]
+    if args.json:
+        print(json.dumps(voices, indent=2, ensure_ascii=False))
+    else:
+        for voice in voices:
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(voice["created_at"]))
+            print("\t".join((voice["customName"], voice["model"], voice["uri"], created)))
+    print(f"匹配 {len(result['voices'])}/{result['total']} 个", file=sys.stderr)
+    return 0
+
+
+def _load_items(args):
+    """读取清单或扫描目录，失败时输出错误信息并返回None"""
+    model = getattr(args, "model", batch_upload.DEFAULT_MODEL)
+    try:
+        if args.manifest:
+            return batch_upload.load_manifest(args.manifest, model)
+        return batch_upload.scan_directory(args.dir, model)
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"错误：无法读取{'清单' if args.manifest else '目录'} - {e}", file=sys.stderr)
+        return None
+
+
+def cmd_batch(args):
+    items = _load_items(args)
+    if items is None:
+        return 2
+    if not items:
+        print("清单中没有可上传的条目", file=sys.stderr)
+        return 1
+
+    # 指定了Key池时，条目分摊到池中的各个Key
+    pool = args.key_pool
+    stats = batch_upload.BatchStats(len(items))
+    journal_path = args.journal or batch_journal.default_journal_path(args.manifest, args.dir)
+    with batch_journal.BatchJournal(journal_path, resume=args.resume) as journal:
+        try:
+            for result in voice_api.iter_batch_upload(args.api_key, items, args.concurrency, args.retries, args.preprocess,
+                                                      validate=not args.no_validate, key_pool=pool, journal=journal,
+                                                      check_text=args.check_text):
+                stats.add(result)
+                print(batch_upload.format_progress(result, stats.done, stats.total), file=sys.stderr)
+        except KeyboardInterrupt:
+            print(f"\n已中断，完成 {stats.done}/{stats.total} 个。加上 --resume 重新运行可跳过已成功的条目", file=sys.stderr)
+            return 130
+
+    summary = stats.summary()
+    if args.json:
+        # 附带各阶段耗时和请求统计，便于分析时间花在哪里
+        summary["metrics"] = metrics.summary()
+        if pool:
+            summary["keys"] = pool.stats()
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print(batch_upload.format_summary(summary))
+        if pool:
+            for key in pool.stats():
+                print(f"  {key['name']} ({key['account']}): 成功 {key['succeeded']}，失败 {key['failed']}，{key['health']}")
+    return 0 if summary["failed"] == 0 else 1
+
+
+def _fetch_voices(args):
+    """获取服务端的音色列表，失败时返回None"""
+    entry, error = voice_api.fetch_voice_list(args.api_key, force_refresh=True)
+    if error:
+        print(error, file=sys.stderr)
+        return None
+    return entry["voices"]
+
+
+def _run_delete(args, voices, stats):
+    for result in voice_manage.iter_delete(args.api_key, voices, args.concurrency, args.retries):
+        stats.add(result)
+        print(batch_upload.format_progress(result, stats.done, stats.total), file=sys.stderr)
+
+
+def cmd_delete(args):
+    if not (args.uri or args.filter or args.manifest):
+        print("错误：请通过 --uri、--filter 或 --manifest 指定要删除的音色", file=sys.stderr)
+        return 2
+    items = _load_items(args) if args.manifest else None
+    if args.manifest and items is None:
+        return 2
+    voices = _fetch_voices(args)
+    if voices is None:
+        return 1
+    selected = voice_manage.select_voices(voices, args.filter, args.uri, items)
+    if not selected:
+        print("没有匹配的音色", file=sys.stderr)
+        return 0
+    if not args.yes:
+        for voice in selected:
+            print(f"{voice.get('customName', '')}\t{voice.get('uri', '')}")
+        print(f"将删除以上 {len(selected)} 个音色，确认后加上 --yes 执行", file=sys.stderr)
+        return 0
+
+    stats = batch_upload.BatchStats(len(selected))
+    _run_delete(args, selected, stats)
+    summary = stats.summary()
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print(f"删除完成：共 {summary['total']} 个，成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，"
+              f"耗时 {summary['elapsed']:.1f}s")
+    return 0 if summary["failed"] == 0 else 1
+
+
+def cmd_export(args):
+    if args.key_pool:
+        voices, errors = voice_api.fetch_pool_voice_list(args.key_pool, force_refresh=True)
+        for account, error in errors.items():
+            print(f"[{account}] {error}", file=sys.stderr)
+        if errors and not voices:
+            return 1
+    else:
+        voices = _fetch_voices(args)
+        if voices is None:
+            return 1
+    try:
+        count = voice_manage.export_voices(filter_voices(voices, args.filter), args.output)
+    except (OSError, ValueError) as e:
+        print(f"错误：导出失败 - {e}", file=sys.stderr)
+        return 1
+    print(f"已导出 {count} 个音色到 {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_sync(args):
+    items = _load_items(args)
+    if items is None:
+        return 2
+    voices = _fetch_voices(args)
+    if voices is None:
+        return 1
+    plan = voice_manage.plan_sync(items, voices)
+    print(voice_manage.format_plan(plan, args.prune), file=sys.stderr)
+    if args.dry_run:
+        if args.json:
+            print(json.dumps(plan, indent=2, ensure_ascii=False))
+        return 0
+
+    deletions = plan["delete"] if args.prune else []
+    if deletions and not args.yes:
+        for voice in deletions:
+            print(f"{voice.get('customName', '')}\t{voice.get('uri', '')}")
+        print(f"以上 {len(deletions)} 个音色本次不会删除，确认后加上 --yes 执行", file=sys.stderr)
+        deletions = []
+    stats = batch_upload.BatchStats(len(plan["upload"]) + len(deletions))
+    # 同步按名称、模型和文字内容比对，不能让改名的条目通过去重拿到旧音色的uri，否则旧音色会被当作多余的删掉
+    for result in voice_api.iter_batch_upload(args.api_key, plan["upload"], args.concurrency, args.retries,
+                                              args.preprocess, validate=not args.no_validate,
+                                              check_text=args.check_text, skip_duplicates=False):
+        stats.add(result)
+        print(batch_upload.format_progress(result, stats.done, stats.total), file=sys.stderr)
+    # 先上传再删除，中途失败时账号中不会缺少清单里的音色
+    _run_delete(args, deletions, stats)
+
+    summary = stats.summary()
+    summary["unchanged"] = plan["unchanged"]
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print(f"同步完成：已存在 {plan['unchanged']} 个，上传和删除共 {summary['total']} 个，"
+              f"成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，耗时 {summary['elapsed']:.1f}s")
+    return 0 if summary["failed"] == 0 else 1
+
+
+def cmd_validate(args):
+    # Windows 的命令行不会展开通配符
+    paths = [path for pattern in args.files for path in (glob.glob(pattern) or [pattern])]
+    reports = audio_validate.validate_files(paths)
+    if args.json:
+        print(json.dumps([dict(report, file=path) for path, report in zip(paths, reports)], indent=2, ensure_ascii=False))
+    else:
+        for path, report in zip(paths, reports):
+            info = report["info"]
+            if report["ok"] and info.get("format") is None:
+                print(f"? {path} (无法识别的格式，未检查)")
+            elif report["ok"]:
+                duration = f"{info['duration']:.1f}s" if info.get("duration") is not None else "时长未知"
+                print(f"✓ {path} ({info['format']}, {duration})")
+            else:
+                print(f"✗ {path}: {'；'.join(report['errors'])}")
+    return 0 if all(report["ok"] for report in reports) else 1
+
+
+def cmd_check_text(args):
+    import transcript_check
+
+    items = _load_items(args)
+    if items is None:
+        return 2
+    if not items:
+        print("清单中没有可检查的条目", file=sys.stderr)
+        return 1
+    rules = {key: value for key, value in (("min_rate", args.min_rate), ("max_rate", args.max_rate)) if value is not None}
+    start = time.monotonic()
+    reports = transcript_check.check_items(items, rules, args.workers)
+    elapsed = time.monotonic() - start
+    mismatched = sum(1 for report in reports if report["ok"] is False)
+    if args.json:
+        print(json.dumps([dict(report, file=item["file"], customName=item["customName"])
+                          for item, report in zip(items, reports)], indent=2, ensure_ascii=False))
+    else:
+        for item, report in zip(items, reports):
+            mark = {True: "✓", False: "✗", None: "?"}[report["ok"]]
+            # 默认只列出不符和无法检查的条目
+            if report["ok"] is not True or args.verbose:
+                print(f"{mark} {item['file']}: {report['message']}")
+    print(f"检查了 {len(items)} 个条目，{mismatched} 个文字内容与音频不符，耗时 {elapsed:.1f}s", file=sys.stderr)
+    return 0 if mismatched == 0 else 1
+
+
+def cmd_preview(args):
+    output = args.output or f"preview-{args.uri.rsplit(':', 1)[-1][:12]}.{tts_preview.RESPONSE_FORMAT}"
+    start = time.monotonic()
+    # 先写到同目录的临时文件，合成成功后再替换，失败时不会覆盖已有的同名文件
+    temp_path = f"{output}.part"
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in tts_preview.iter_preview(args.api_key, args.uri, args.model, args.text):
+                f.write(chunk)
+        os.replace(temp_path, output)
+    except tts_preview.PreviewError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    print(f"已保存试听音频: {output}（{time.monotonic() - start:.2f}s）", file=sys.stderr)
+    return 0
+
+
+def cmd_jobs(args):
+    queue = job_queue.get_job_queue()
+
+    if args.action == "submit":
+        if not args.file or not args.name or not args.text:
+            print("错误：提交任务需要提供 file、--name 和 --text", file=sys.stderr)
+            return 2
+        error = voice_api.check_upload_params(args.api_key, args.file, args.name, args.text)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+        print(queue.submit(args.api_key, os.path.abspath(args.file), args.name, args.text, args.model, args.preprocess))
+        return 0
+
+    if args.action == "status":
+        if args.id is None:
+            print("错误：请通过 --id 指定任务ID", file=sys.stderr)
+            return 2
+        job = queue.get(args.id)
+        # --wait 时轮询直到任务结束
+        while args.wait and job and job["status"] in (job_queue.QUEUED, job_queue.RUNNING):
+            time.sleep(job_queue.POLL_INTERVAL)
+            job = queue.get(args.id)
+        if job is None:
+            print(f"任务不存在: {args.id}", file=sys.stderr)
+            return 1
+        print(json.dumps(job, ensure_ascii=False) if args.json else job_queue.format_job(job))
+        return 0 if job["status"] != job_queue.FAILED else 1
+
+    if args.action == "list":
+        jobs = queue.list_jobs(args.api_key, args.limit)
+        if args.json:
+            print(json.dumps(jobs, indent=2, ensure_ascii=False))
+        else:
+            for job in jobs:
+                print(job_queue.format_job(job))
+        return 0
+
+    # work：在前台执行该账号排队中的任务，全部完成后退出
+    queue.workers = args.workers
+    queue.register_key(args.api_key)
+    queue.start()
+    try:
+        while queue.pending_count(args.api_key):
+            time.sleep(job_queue.POLL_INTERVAL)
+    finally:
+        queue.stop()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="硅基流动参考音色上传工具（命令行版）")
+    parser.add_argument("--api-key", default=os.environ.get("SILICONFLOW_API_KEY"),
+                        help="硅基流动API密钥，默认读取环境变量 SILICONFLOW_API_KEY")
+    parser.add_argument("--keys", default=os.environ.get("VOICE_UPLOAD_KEYS_FILE"),
+                        help="Key池配置文件（JSON），指定后 batch、list 和 export 使用池中的多个Key，"
+                             "默认读取环境变量 VOICE_UPLOAD_KEYS_FILE")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出详细日志")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    upload = subparsers.add_parser("upload", help="上传单个参考音频")
+    upload.add_argument("file", help="音频文件路径")
+    upload.add_argument("--name", required=True, help="参考音频名称")
+    upload.add_argument("--text", required=True, help="参考音频文字内容")
+    upload.add_argument("--model", default=batch_upload.DEFAULT_MODEL, help="模型名称")
+    upload.add_argument("--preprocess", action="store_true", help="上传前预处理音频")
+    upload.add_argument("--no-dedup", action="store_true", help="不查询本地去重索引，总是上传")
+    upload.add_argument("--no-validate", action="store_true", help="跳过上传前的本地音频检查")
+    upload.add_argument("--json", action="store_true", help="以JSON格式输出结果")
+    upload.set_defaults(func=cmd_upload)
+
+    list_parser = subparsers.add_parser("list", help="查询音色列表")
+    list_parser.add_argument("--filter", default="", help="按名称、模型、uri或文字内容过滤")
+    list_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    list_parser.set_defaults(func=cmd_list)
+
+    search = subparsers.add_parser("search", help="在本地索引中检索音色，不重复拉取列表")
+    search.add_argument("query", nargs="?", default="",
+                        help="关键字（匹配名称、模型、uri或文字内容），可加 model:、uri:、after:、before: 过滤")
+    search.add_argument("--refresh", action="store_true", help="先从服务端拉取最新列表")
+    search.add_argument("--limit", type=int, default=0, help="最多输出的条数，0表示不限制")
+    search.add_argument("--json", action="store_true", help="以JSON格式输出")
+    search.set_defaults(func=cmd_search)
+
+    batch = subparsers.add_parser("batch", help="批量上传")
+    source = batch.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="清单文件（CSV/JSONL）")
+    source.add_argument("--dir", help="音频目录，每个音频需有同名 .txt 文字文件")
+    batch.add_argument("--model", default=batch_upload.DEFAULT_MODEL, help="清单未指定model时使用的模型")
+    batch.add_argument("--concurrency", type=int, default=4, help="最大并发数")
+    batch.add_argument("--retries", type=int, default=2, help="失败重试次数")
+    batch.add_argument("--preprocess", action="store_true", help="上传前预处理音频")
+    batch.add_argument("--no-validate", action="store_true", help="跳过上传前的本地音频检查")
+    batch.add_argument("--check-text", action="store_true", help="上传前检查文字内容与音频时长是否相符，不符的条目不上传")
+    batch.add_argument("--json", action="store_true", help="以JSON格式输出汇总信息（含各阶段耗时统计）")
+    batch.add_argument("--resume", action="store_true", help="继续上次中断的批量上传，跳过检查点日志中已成功的条目")
+    batch.add_argument("--journal", help="检查点日志路径，默认为清单旁边的 <清单>.journal.jsonl 或目录中的 "
+                                         f"{batch_journal.DIRECTORY_JOURNAL_NAME}")
+    batch.set_defaults(func=cmd_batch)
+
+    sync = subparsers.add_parser("sync", help="按清单同步音色：只上传服务端缺少的条目，可选删除清单外的音色")
+    source = sync.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="清单文件（CSV/JSONL）")
+    source.add_argument("--dir", help="音频目录，每个音频需有同名 .txt 文字文件")
+    sync.add_argument("--model", default=batch_upload.DEFAULT_MODEL, help="清单未指定model时使用的模型")
+    sync.add_argument("--prune", action="store_true", help="删除清单中没有的音色（以及重复的音色）")
+    sync.add_argument("--yes", action="store_true", help="确认执行 --prune 的删除，未指定时只列出将删除的音色")
+    sync.add_argument("--dry-run", action="store_true", help="只显示同步计划，不上传也不删除")
+    sync.add_argument("--concurrency", type=int, default=4, help="最大并发数")
+    sync.add_argument("--retries", type=int, default=2, help="失败重试次数")
+    sync.add_argument("--preprocess", action="store_true", help="上传前预处理音频")
+    sync.add_argument("--no-validate", action="store_true", help="跳过上传前的本地音频检查")
+    sync.add_argument("--check-text", action="store_true", help="上传前检查文字内容与音频时长是否相符，不符的条目不上传")
+    sync.add_argument("--json", action="store_true", help="以JSON格式输出汇总信息")
+    sync.set_defaults(func=cmd_sync)
+
+    delete = subparsers.add_parser("delete", help="批量删除音色，默认只列出匹配的音色，加上 --yes 才会删除")
+    delete.add_argument("--uri", action="append", help="要删除的音色ID，可重复指定")
+    delete.add_argument("--filter", default="", help="按名称、模型、uri或文字内容匹配")
+    delete.add_argument("--manifest", help="删除与清单条目（名称、模型、文字内容）一致的音色")
+    delete.add_argument("--concurrency", type=int, default=8, help="最大并发数")
+    delete.add_argument("--retries", type=int, default=2, help="失败重试次数")
+    delete.add_argument("--yes", action="store_true", help="确认删除")
+    delete.add_argument("--json", action="store_true", help="以JSON格式输出汇总信息")
+    delete.set_defaults(func=cmd_delete)
+
+    export = subparsers.add_parser("export", help="导出音色列表到 CSV 或 Parquet（扩展名为 .parquet 时）")
+    export.add_argument("output", help="输出文件路径")
+    export.add_argument("--filter", default="", help="按名称、模型、uri或文字内容过滤")
+    export.set_defaults(func=cmd_export)
+
+    validate = subparsers.add_parser("validate", help="在本地检查音频是否适合上传，不需要API Key")
+    validate.add_argument("files", nargs="+", help="音频文件路径，支持通配符")
+    validate.add_argument("--json", action="store_true", help="以JSON格式输出")
+    validate.set_defaults(func=cmd_validate, needs_key=False)
+
+    check_text = subparsers.add_parser("check-text", help="在本地检查清单中的文字内容与音频时长是否相符，不需要API Key")
+    source = check_text.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="清单文件（CSV/JSONL）")
+    source.add_argument("--dir", help="音频目录，每个音频需有同名 .txt 文字文件")
+    check_text.add_argument("--model", default=batch_upload.DEFAULT_MODEL, help=argparse.SUPPRESS)
+    check_text.add_argument("--workers", type=int, help="并行检查的进程数，默认为CPU核数")
+    check_text.add_argument("--min-rate", type=float, help="正常语速下限（音节/秒）")
+    check_text.add_argument("--max-rate", type=float, help="正常语速上限（音节/秒）")
+    check_text.add_argument("--json", action="store_true", help="以JSON格式输出每个条目的检查结果")
+    check_text.set_defaults(func=cmd_check_text, needs_key=False)
+
+    preview = subparsers.add_parser("preview", help="合成一句话试听音色，保存为音频文件（结果有本地缓存）")
+    preview.add_argument("uri", help="音色ID")
+    preview.add_argument("--text", default=tts_preview.DEFAULT_TEXT, help="试听文本")
+    preview.add_argument("--model", default=batch_upload.DEFAULT_MODEL, help="模型名称")
+    preview.add_argument("-o", "--output", help="输出文件路径，默认为当前目录下的 preview-<uri>.mp3")
+    preview.set_defaults(func=cmd_preview)
+
+    jobs = subparsers.add_parser("jobs", help="后台任务队列：submit 提交、status 查询、list 列出、work 执行排队中的任务")
+    jobs.add_argument("action", choices=["submit", "status", "list", "work"])
+    jobs.add_argument("file", nargs="?", help="音频文件路径（submit）")
+    jobs.add_argument("--name", help="参考音频名称（submit）")
+    jobs.add_argument("--text", help="参考音频文字内容（submit）")
+    jobs.add_argument("--model", default=batch_upload.DEFAULT_MODEL, help="模型名称（submit）")
+    jobs.add_argument("--preprocess", action="store_true", help="上传前预处理音频（submit）")
+    jobs.add_argument("--id", type=int, help="任务ID（status）")
+    jobs.add_argument("--wait", action="store_true", help="等待任务结束（status）")
+    jobs.add_argument("--limit", type=int, default=50, help="列出的任务数（list）")
+    jobs.add_argument("--workers", type=int, default=4, help="工作线程数（work）")
+    jobs.add_argument("--json", action="store_true", help="以JSON格式输出")
+    jobs.set_defaults(func=cmd_jobs)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    args.key_pool = None
+    if args.keys and args.command in ("batch", "list", "export"):
+        try:
+            args.key_pool = key_pool.load_key_pool(args.keys)
+        except (OSError, key_pool.KeyPoolError) as e:
+            print(f"错误：无法加载Key池配置 - {e}", file=sys.stderr)
+            return 2
+    if getattr(args, "needs_key", True) and not args.api_key and not args.key_pool:
+        print("错误：请通过 --api-key 或环境变量 SILICONFLOW_API_KEY 提供API Key", file=sys.stderr)
+        return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # 打包后的程序在进程池（预处理、文字检查）的子进程中不再重复执行 main()
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+本地去重索引
+
+以 (账号, 音频内容哈希, 模型, 文字内容) 为键，记录上传成功后返回的音色uri，保存在
+本地SQLite数据库中。再次上传相同的音频时直接返回已有的uri，不产生网络请求，也不会
+在服务端创建重复的音色。音频哈希按块流式计算，不会把整个文件读入内存。
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from app_paths import get_data_dir
+from siliconflow_client import account_fingerprint
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """流式计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupIndex:
+    """
+    音频内容到音色uri的持久化索引
+
+    参数:
+        db_path (str): 数据库文件路径，默认保存在本地数据目录
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir(), "dedup_index.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS voices (
+                    account TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    custom_name TEXT,
+                    uri TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (account, content_hash, model, text)
+                )
+            """)
+
+    def lookup(self, api_key, content_hash, model, text):
+        """查找已上传的音色，未找到时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uri FROM voices WHERE account=? AND content_hash=? AND model=? AND text=?",
+                (account_fingerprint(api_key), content_hash, model, text)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, api_key, content_hash, model, text, custom_name, uri):
+        """记录一次成功的上传"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO voices VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account_fingerprint(api_key), content_hash, model, text, custom_name, uri, time.time())
+            )
+
+    def reconcile(self, api_key, voices, listed_at):
+        """
+        根据服务端的音色列表清理索引，删除服务端已不存在的音色
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            voices (list): get_voice_list 返回的音色列表
+            listed_at (float): 获取列表的时间戳，此后新记录的条目可能不在列表中，予以保留
+
+        返回:
+            int: 删除的条目数
+        """
+        remote_uris = {voice.get("uri") for voice in voices}
+        account = account_fingerprint(api_key)
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT uri FROM voices WHERE account=? AND created_at<?", (account, listed_at)
+            ).fetchall()
+            stale = [(account, uri) for (uri,) in rows if uri not in remote_uris]
+            self._conn.executemany("DELETE FROM voices WHERE account=? AND uri=?", stale)
+        if stale:
+            logger.info(f"去重索引清理了 {len(stale)} 个服务端已删除的音色")
+        return len(stale)
+
+    def forget(self, api_key, uris):
+        """删除指定音色的记录（音色已在服务端删除），返回删除的条目数"""
+        account = account_fingerprint(api_key)
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "DELETE FROM voices WHERE account=? AND uri=?", [(account, uri) for uri in uris]
+            )
+        return cursor.rowcount
+
+    def rebuild(self, api_key, voices, items):
+        """
+        用本地音频重建索引：服务端音色与本地条目的名称、模型、文字内容一致时，
+        计算本地音频的哈希并记录对应的uri
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            voices (list): get_voice_list 返回的音色列表
+            items (list): 本地条目（字段同批量上传清单：file, customName, text, model）
+
+        返回:
+            int: 写入的条目数
+        """
+        remote = {
+            (voice.get("customName"), voice.get("model"), voice.get("text")): voice.get("uri")
+            for voice in voices
+        }
+        count = 0
+        for item in items:
+            uri = remote.get((item["customName"], item["model"], item["text"]))
+            if uri and os.path.exists(item["file"]):
+                self.record(api_key, hash_file(item["file"]), item["model"], item["text"], item["customName"], uri)
+                count += 1
+        logger.info(f"去重索引重建完成，写入 {count} 个条目")
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_dedup_index():
+    """获取进程内共享的去重索引"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DedupIndex()
+    return _index
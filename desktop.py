@@ -0,0 +1,370 @@
+"""
+桌面版启动器（Electron 外壳）
+
+用法:
+    python desktop.py
+
+启动路径上尽量不做重复的工作：
+- 找到的npm路径缓存在数据目录的 launcher.json 中，路径仍存在时直接使用，不再启动子进程探测；
+- package.json 和 main.js 按内容哈希判断，内容没有变化时不重写；
+- npm install 只在 package.json 变化或依赖目录缺失时执行；
+- Electron 外壳与Gradio服务同时启动，窗口先显示加载页，轮询到服务可访问后再加载界面。
+
+每次启动的耗时（区分冷启动和热启动）会写入日志，最近几次的记录保存在 launcher.json 中。
+找不到npm或外壳启动失败时，改为在浏览器中打开界面。
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from app_paths import get_data_dir
+
+logger = logging.getLogger(__name__)
+
+ELECTRON_DIR = "electron_app"
+DEFAULT_PORT = 7860
+
+# launcher.json 中保留的启动耗时记录数
+STARTUP_HISTORY = 10
+
+# npm install 完成后写入 node_modules 的标记文件，内容为 package.json 的哈希
+INSTALL_STAMP = ".voice_upload_install"
+# 生成文件的标记，内容为 package.json 和 main.js 的哈希
+GENERATED_STAMP = ".generated"
+
+PACKAGE_JSON = {
+    "name": "voice-upload-tool",
+    "version": "1.0.0",
+    "description": "硅基流动参考音色上传工具",
+    "main": "main.js",
+    "scripts": {
+        "start": "electron ."
+    },
+    "dependencies": {
+        "electron": "^28.0.0"
+    }
+}
+
+MAIN_JS = """
+const { app, BrowserWindow, Menu } = require('electron');
+const http = require('http');
+
+// 端口由启动器通过环境变量传入
+const APP_URL = `http://127.0.0.1:${process.env.VOICE_UPLOAD_PORT || '7860'}/`;
+const LOADING_PAGE = 'data:text/html;charset=utf-8,' + encodeURIComponent(
+  '<html><body style="font-family:sans-serif;display:flex;align-items:center;justify-content:center;' +
+  'height:100vh;margin:0;color:#6366f1">正在启动服务...</body></html>'
+);
+const startedAt = Date.now();
+
+let mainWindow;
+
+// 轮询服务直到可以访问，服务与窗口同时启动，窗口不能假设服务已经就绪
+function waitForServer(callback) {
+  const request = http.get(APP_URL, (response) => {
+    response.resume();
+    if (response.statusCode < 500) {
+      callback();
+    } else {
+      setTimeout(() => waitForServer(callback), 200);
+    }
+  });
+  request.on('error', () => setTimeout(() => waitForServer(callback), 200));
+  request.setTimeout(2000, () => request.destroy());
+}
+
+function createWindow() {
+  // 创建浏览器窗口
+  mainWindow = new BrowserWindow({
+    width: 1000,
+    height: 800,
+    webPreferences: {
+      nodeIntegration: true
+    },
+    title: '硅基流动参考音色上传工具'
+  });
+
+  // 隐藏菜单栏
+  Menu.setApplicationMenu(null);
+
+  // 先显示加载页，服务就绪后加载应用
+  mainWindow.loadURL(LOADING_PAGE);
+  waitForServer(() => {
+    if (!mainWindow) {
+      return;
+    }
+    mainWindow.loadURL(APP_URL);
+    mainWindow.webContents.once('did-finish-load', () => {
+      console.log(`窗口加载完成，外壳启动后用时 ${Date.now() - startedAt}ms`);
+    });
+  });
+
+  // 当窗口关闭时触发，启动器随之关闭Python服务器
+  mainWindow.on('closed', function () {
+    mainWindow = null;
+    process.exit();
+  });
+}
+
+// 当Electron完成初始化并准备创建浏览器窗口时调用此方法
+app.on('ready', createWindow);
+
+// 当所有窗口关闭时退出应用
+app.on('window-all-closed', function () {
+  if (process.platform !== 'darwin') {
+    app.quit();
+  }
+});
+
+app.on('activate', function () {
+  if (mainWindow === null) {
+    createWindow();
+  }
+});
+"""
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _read_text(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write_text(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def load_cache():
+    """读取启动器缓存，文件不存在或损坏时返回空字典"""
+    try:
+        with open(os.path.join(get_data_dir(), "launcher.json"), encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    path = os.path.join(get_data_dir(), "launcher.json")
+    try:
+        _write_text(path + ".tmp", json.dumps(cache, indent=2, ensure_ascii=False))
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.warning(f"保存启动器缓存失败: {e}")
+
+
+def _windows_npm_candidates():
+    """Windows 上常见的Node.js安装位置"""
+    candidates = [
+        r"C:\Program Files\nodejs\npm.cmd",
+        r"C:\Program Files (x86)\nodejs\npm.cmd",
+        r"C:\ProgramData\nodejs\npm.cmd",
+        os.path.expanduser("~\\AppData\\Roaming\\npm\\npm.cmd"),
+        r"C:\ProgramData\Microsoft\Windows\Start Menu\Programs\Node.js\npm.cmd"
+    ]
+    if os.environ.get("ProgramFiles"):
+        candidates.append(os.path.join(os.environ["ProgramFiles"], "nodejs", "npm.cmd"))
+
+    # 尝试在注册表中查找Node.js安装路径
+    try:
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Node.js")
+        value, _ = winreg.QueryValueEx(key, "InstallPath")
+        if value:
+            candidates.append(os.path.join(value, "npm.cmd"))
+    except Exception:
+        pass
+    return candidates
+
+
+def find_npm(cache=None):
+    """
+    查找npm，缓存的路径仍存在时直接使用
+
+    参数:
+        cache (dict): 启动器缓存，找到的路径会写入其中
+
+    返回:
+        str: npm 的完整路径，未找到时返回None
+    """
+    cache = {} if cache is None else cache
+    cached = cache.get("npm")
+    if cached and os.path.isfile(cached):
+        return cached
+
+    # 只检查文件是否存在，不启动 npm --version 子进程
+    path = shutil.which("npm")
+    if path is None and os.name == "nt":
+        path = next((candidate for candidate in _windows_npm_candidates() if os.path.isfile(candidate)), None)
+    if path:
+        logger.info(f"找到npm: {path}")
+        cache["npm"] = path
+    else:
+        cache.pop("npm", None)
+    return path
+
+
+def create_electron_files(electron_dir=ELECTRON_DIR):
+    """
+    生成Electron应用所需的文件，内容没有变化时不重写
+
+    返回:
+        tuple: (Electron目录, 是否重新生成了文件)
+    """
+    electron_dir = Path(electron_dir)
+    package_json = json.dumps(PACKAGE_JSON, indent=2)
+    digest = _digest(package_json, MAIN_JS)
+    stamp = electron_dir / GENERATED_STAMP
+    if _read_text(stamp) == digest and (electron_dir / "package.json").exists() and (electron_dir / "main.js").exists():
+        return electron_dir, False
+
+    electron_dir.mkdir(exist_ok=True)
+    _write_text(electron_dir / "package.json", package_json)
+    _write_text(electron_dir / "main.js", MAIN_JS)
+    _write_text(stamp, digest)
+    logger.info("Electron文件创建完成")
+    return electron_dir, True
+
+
+def install_dependencies(npm_cmd, electron_dir):
+    """
+    安装Electron依赖，package.json 没有变化且依赖已安装时跳过
+
+    返回:
+        bool: 是否执行了 npm install
+    """
+    electron_dir = Path(electron_dir)
+    digest = _digest(_read_text(electron_dir / "package.json") or "")
+    stamp = electron_dir / "node_modules" / INSTALL_STAMP
+    if _read_text(stamp) == digest:
+        return False
+
+    logger.info("安装Electron依赖...")
+    subprocess.run([npm_cmd, "install"], cwd=electron_dir, check=True)
+    _write_text(stamp, digest)
+    return True
+
+
+def electron_command(npm_cmd, electron_dir):
+    """启动外壳的命令：优先直接运行本地安装的electron，省去 npm start 多启动的一个Node进程"""
+    binary = Path(electron_dir) / "node_modules" / ".bin" / ("electron.cmd" if os.name == "nt" else "electron")
+    if binary.exists():
+        return [str(binary.resolve()), "."]
+    return [npm_cmd, "start"]
+
+
+def launch_electron_app(electron_dir, npm_cmd, port=DEFAULT_PORT):
+    """
+    启动Electron外壳，不等待服务就绪（窗口自行轮询）
+
+    返回:
+        subprocess.Popen: 外壳进程
+    """
+    logger.info("启动Electron应用...")
+    env = dict(os.environ, VOICE_UPLOAD_PORT=str(port))
+    return subprocess.Popen(electron_command(npm_cmd, electron_dir), cwd=electron_dir, env=env)
+
+
+def prepare_shell(cache, timings):
+    """
+    查找工具链、生成文件、安装依赖并启动外壳
+
+    返回:
+        tuple: (外壳进程，失败时为None, 是否为热启动)
+    """
+    started = time.perf_counter()
+    cached_npm = cache.get("npm")
+    npm_cmd = find_npm(cache)
+    timings["find_npm"] = time.perf_counter() - started
+    if not npm_cmd:
+        logger.error("未找到npm命令，将使用浏览器打开应用")
+        return None, False
+
+    try:
+        started = time.perf_counter()
+        electron_dir, generated = create_electron_files()
+        timings["generate"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        installed = install_dependencies(npm_cmd, electron_dir)
+        timings["install"] = time.perf_counter() - started
+
+        port = int(os.environ.get("VOICE_UPLOAD_PORT", DEFAULT_PORT))
+        process = launch_electron_app(electron_dir, npm_cmd, port)
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.error(f"安装依赖或启动Electron失败: {e}，将使用浏览器打开应用")
+        return None, False
+    return process, cached_npm == npm_cmd and not generated and not installed
+
+
+def main():
+    started = time.perf_counter()
+    timings = {}
+
+    import upload
+    from job_queue import get_job_queue
+
+    upload.setup_logging()
+    cache = load_cache()
+    # 外壳先启动，Electron初始化与下面加载Gradio同时进行
+    shell, warm = prepare_shell(cache, timings)
+
+    get_job_queue().start()
+    demo = upload.enable_queue(upload.create_gradio_interface())
+    port = int(os.environ.get("VOICE_UPLOAD_PORT", DEFAULT_PORT))
+    demo.launch(
+        server_name="127.0.0.1",
+        server_port=port,
+        show_api=False,
+        share=False,
+        inbrowser=shell is None,
+        prevent_thread_lock=True
+    )
+    timings["server_ready"] = time.perf_counter() - started
+
+    kind = "热启动" if warm else "冷启动"
+    logger.info(f"{kind}：服务就绪用时 {timings['server_ready']:.2f}s（" +
+                "，".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items() if name != "server_ready") + "）")
+    history = cache.get("startups", [])[-(STARTUP_HISTORY - 1):]
+    history.append({"at": time.strftime("%Y-%m-%d %H:%M:%S"), "warm": warm,
+                    **{name: round(seconds, 3) for name, seconds in timings.items()}})
+    cache["startups"] = history
+    save_cache(cache)
+
+    try:
+        if shell is not None:
+            # 窗口关闭后外壳退出，随之关闭服务
+            shell.wait()
+        else:
+            demo.block_thread()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if shell is not None and shell.poll() is None:
+            shell.terminate()
+        demo.close()
+        get_job_queue().stop()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""
+持久化的后台上传任务队列
+
+上传任务写入本地SQLite数据库后立即返回任务ID，由后台工作线程依次执行，界面和命令行
+通过任务ID查询状态。进程重启后，未完成的任务会重新排队继续执行。
+
+多个进程（界面、服务进程、`cli.py jobs work`）可以共用同一个数据库。执行中的任务记录
+所属进程，并由该进程定期更新心跳；只有心跳超时（所属进程已经退出）的任务才会被重新排队，
+其他进程正在上传的任务不会被重复执行。
+
+数据库中不保存API Key明文，只保存账号摘要。API Key 只保存在当前进程的内存中，
+重启后需要该账号再次提供API Key（在界面上提交任务、查询列表，或使用
+`cli.py jobs work`），对应账号的任务才会继续执行。
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from app_paths import get_data_dir
+from siliconflow_client import api_key_fingerprint
+from upload_staging import link_or_copy
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+STATUS_LABELS = {
+    QUEUED: "排队中",
+    RUNNING: "上传中",
+    SUCCEEDED: "成功",
+    FAILED: "失败",
+}
+
+# 没有新任务时，工作线程检查数据库的间隔（秒），用于发现其他进程提交的任务和到期的重试
+POLL_INTERVAL = 1.0
+
+# 执行中的任务的心跳间隔（秒）
+HEARTBEAT_INTERVAL = 10.0
+
+# 心跳超过该秒数未更新的执行中任务，视为所属进程已经退出
+STALE_AFTER = 60.0
+
+
+def process_owner(pid=None):
+    """任务所属进程的标识（主机名:进程号），pid为None时表示当前进程"""
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+class JobQueue:
+    """
+    SQLite 持久化任务队列
+
+    参数:
+        db_path (str): 数据库文件路径，默认保存在本地数据目录
+        workers (int): 后台工作线程数
+        max_retries (int): 可重试错误的最大重试次数
+        retry_delay (float): 首次重试的等待秒数，之后按指数增长
+    """
+
+    def __init__(self, db_path=None, workers=4, max_retries=2, retry_delay=5.0):
+        self.db_path = db_path or os.path.join(get_data_dir(), "jobs.sqlite3")
+        self.file_dir = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), "job_files")
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._local = threading.local()
+        self._keys = {}
+        self._keys_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    account TEXT NOT NULL,
+                    file TEXT NOT NULL,
+                    custom_name TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    preprocess INTEGER NOT NULL DEFAULT 0,
+                    owns_file INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    uri TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    run_after REAL NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    heartbeat REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # 早期版本的数据库没有 owner 和 heartbeat 列，其中执行中的任务心跳为0，视为已超时
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in (("owner", "TEXT"), ("heartbeat", "REAL NOT NULL DEFAULT 0")):
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, run_after)")
+
+    def _connect(self):
+        """每个线程使用独立的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def register_key(self, api_key):
+        """登记API Key，该账号排队中的任务即可被执行"""
+        if not api_key or not api_key.strip():
+            return
+        with self._keys_lock:
+            self._keys[api_key_fingerprint(api_key)] = api_key.strip()
+        self._notify()
+
+    def submit(self, api_key, file, custom_name, text, model, preprocess=False, copy_file=False):
+        """
+        提交上传任务
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            file (str): 音频文件路径
+            custom_name (str): 参考音频名称
+            text (str): 参考音频文字内容
+            model (str): 模型名称
+            preprocess (bool): 上传前是否预处理音频
+            copy_file (bool): 把音频保存到队列目录中（同一文件系统时为硬链接），用于来源文件可能被清理的情况（如Gradio临时文件）
+
+        返回:
+            int: 任务ID
+        """
+        self.register_key(api_key)
+        # 先保存文件再写入任务，保证任务一旦可见，对应的音频就已经就绪
+        if copy_file:
+            os.makedirs(self.file_dir, exist_ok=True)
+            stored = os.path.join(self.file_dir, f"{uuid.uuid4().hex}_{os.path.basename(file)}")
+            link_or_copy(file, stored)
+            file = stored
+
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (account, file, custom_name, text, model, preprocess, owns_file, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (api_key_fingerprint(api_key), file, custom_name.strip(), text.strip(), model.strip(),
+                 int(bool(preprocess)), int(bool(copy_file)), QUEUED, now, now)
+            )
+            job_id = cursor.lastrowid
+
+        logger.info(f"已提交后台任务 #{job_id}: {custom_name}")
+        self._notify()
+        return job_id
+
+    def get(self, job_id):
+        """查询单个任务，不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, api_key=None, limit=50):
+        """按提交时间倒序列出任务，指定API Key时只列出该账号的任务"""
+        with self._connect() as conn:
+            if api_key:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE account=? ORDER BY id DESC LIMIT ?",
+                    (api_key_fingerprint(api_key), limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def pending_count(self, api_key=None):
+        """未完成（排队中和执行中）的任务数"""
+        with self._connect() as conn:
+            if api_key:
+                row = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?) AND account=?",
+                    (QUEUED, RUNNING, api_key_fingerprint(api_key))
+                ).fetchone()
+            else:
+                row = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()
+        return row[0]
+
+    def _claim(self):
+        """领取一个可执行的任务：排队中、已到重试时间且账号的API Key已登记"""
+        with self._keys_lock:
+            accounts = list(self._keys)
+        if not accounts:
+            return None, None
+
+        placeholders = ",".join("?" * len(accounts))
+        with self._connect() as conn:
+            # IMMEDIATE 事务保证多个线程（或进程）不会领取到同一个任务
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE status=? AND run_after<=? AND account IN ({placeholders}) "
+                f"ORDER BY id LIMIT 1",
+                [QUEUED, time.time()] + accounts
+            ).fetchone()
+            if row is None:
+                return None, None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status=?, attempts=attempts+1, owner=?, heartbeat=?, updated_at=? WHERE id=?",
+                (RUNNING, process_owner(), now, now, row["id"])
+            )
+        with self._keys_lock:
+            api_key = self._keys.get(row["account"])
+        return dict(row, attempts=row["attempts"] + 1), api_key
+
+    def _finish(self, job, outcome):
+        """根据执行结果更新任务状态，可重试的失败重新排队"""
+        now = time.time()
+        with self._connect() as conn:
+            if outcome.get("ok"):
+                conn.execute(
+                    "UPDATE jobs SET status=?, uri=?, error=NULL, updated_at=? WHERE id=?",
+                    (SUCCEEDED, outcome.get("uri"), now, job["id"])
+                )
+            elif outcome.get("retryable") and job["attempts"] <= self.max_retries:
+                delay = self.retry_delay * (2 ** (job["attempts"] - 1))
+                conn.execute(
+                    "UPDATE jobs SET status=?, error=?, run_after=?, updated_at=? WHERE id=?",
+                    (QUEUED, outcome.get("error"), now + delay, now, job["id"])
+                )
+                logger.warning(f"任务 #{job['id']} 失败，{delay:.0f}秒后重试: {outcome.get('error')}")
+                return
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status=?, error=?, updated_at=? WHERE id=?",
+                    (FAILED, outcome.get("error"), now, job["id"])
+                )
+
+        # 任务结束后删除队列目录中保存的音频副本
+        if job["owns_file"] and os.path.exists(job["file"]):
+            os.remove(job["file"])
+
+    def run_once(self):
+        """
+        领取并执行一个任务
+
+        返回:
+            bool: 是否执行了任务
+        """
+        # 延迟导入，避免 voice_api 和本模块循环引用
+        import voice_api
+
+        job, api_key = self._claim()
+        if job is None:
+            return False
+
+        logger.info(f"开始执行任务 #{job['id']}（第{job['attempts']}次）: {job['custom_name']}")
+        try:
+            outcome = voice_api.upload_voice_file(
+                api_key, job["file"], job["model"], job["custom_name"], job["text"],
+                preprocess_options={} if job["preprocess"] else None
+            )
+        except Exception as e:
+            logger.exception(f"任务 #{job['id']} 执行异常")
+            outcome = {"ok": False, "error": f"发生错误: {str(e)}", "retryable": False}
+        self._finish(job, outcome)
+        return True
+
+    def _worker_loop(self):
+        while not self._stopping:
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                logger.exception("后台任务工作线程出错")
+            with self._wakeup:
+                self._wakeup.wait(POLL_INTERVAL)
+
+    def _notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def heartbeat(self):
+        """更新本进程执行中的任务的心跳，返回更新的任务数"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET heartbeat=? WHERE status=? AND owner=?",
+                (time.time(), RUNNING, process_owner())
+            )
+        return cursor.rowcount
+
+    def recover(self, owner=None, stale_after=STALE_AFTER):
+        """
+        把所属进程已经退出的执行中任务重新排队
+
+        参数:
+            owner (str): 已知退出的进程（见 process_owner），指定时立即恢复该进程的所有任务
+            stale_after (float): 未指定 owner 时，只恢复心跳超过该秒数未更新的任务
+
+        返回:
+            int: 重新排队的任务数
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if owner is not None:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status=?, owner=NULL, updated_at=? WHERE status=? AND owner=?",
+                    (QUEUED, now, RUNNING, owner)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status=?, owner=NULL, updated_at=? WHERE status=? AND heartbeat<?",
+                    (QUEUED, now, RUNNING, now - stale_after)
+                )
+        if cursor.rowcount:
+            logger.info(f"恢复了 {cursor.rowcount} 个中断的任务")
+            self._notify()
+        return cursor.rowcount
+
+    def _heartbeat_loop(self):
+        """定期更新心跳，并恢复其他已退出进程遗留的任务"""
+        while not self._stopping:
+            try:
+                self.heartbeat()
+                self.recover()
+            except Exception:
+                logger.exception("更新后台任务心跳出错")
+            with self._wakeup:
+                self._wakeup.wait(HEARTBEAT_INTERVAL)
+
+    def start(self, recover=True):
+        """
+        启动后台工作线程和心跳线程
+
+        参数:
+            recover (bool): 启动前立即恢复心跳已超时的任务（其他进程正在执行的任务不受影响）
+        """
+        if self._threads:
+            return
+        if recover:
+            self.recover()
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logger.info(f"后台任务队列已启动，工作线程 {self.workers} 个")
+
+    def stop(self, timeout=None):
+        """停止后台工作线程，正在执行的任务会先执行完"""
+        self._stopping = True
+        self._notify()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+class _Transaction:
+    """autocommit 连接上的事务上下文：正常退出时提交，出错时回滚"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.conn.in_transaction:
+            if exc_type is None:
+                self.conn.execute("COMMIT")
+            else:
+                self.conn.execute("ROLLBACK")
+
+
+def format_job(job):
+    """格式化任务状态"""
+    status = STATUS_LABELS.get(job["status"], job["status"])
+    line = f"#{job['id']} [{status}] {job['custom_name']}"
+    if job["status"] == SUCCEEDED:
+        line += f" -> {job['uri']}"
+    elif job["error"]:
+        line += f": {job['error']}"
+    return line
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """获取进程内共享的任务队列"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
@@ -0,0 +1,130 @@
+"""
+API Key 有效性缓存
+
+每个API Key用一次开销很小的认证请求（/v1/user/info）检查是否有效，结果按TTL缓存，
+条目数超过上限时淘汰最久未使用的。上传和查询收到的 401/403/200 也会更新缓存，
+已知无效的Key再次上传时直接返回错误，不必等整个音频发送完才收到401。
+
+缓存只保存Key的SHA-256摘要和检查结果，不保存、也不记录Key的明文。
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from siliconflow_client import get_client, api_key_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# 有效和无效结果的缓存时间（秒）。无效的结果缓存较短，用户在控制台恢复Key后很快就能重新使用
+VALID_TTL = 600
+INVALID_TTL = 60
+
+# 最多缓存的Key数量
+MAX_ENTRIES = 256
+
+# 认证失败的状态码
+AUTH_FAILURE_STATUS = (401, 403)
+
+
+class KeyCheckCache:
+    """
+    按Key摘要缓存的有效性检查结果
+
+    参数:
+        valid_ttl (float): 有效结果的缓存秒数
+        invalid_ttl (float): 无效结果的缓存秒数
+        max_entries (int): 最多缓存的条目数，超出时淘汰最久未使用的
+    """
+
+    def __init__(self, valid_ttl=VALID_TTL, invalid_ttl=INVALID_TTL, max_entries=MAX_ENTRIES):
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一个Key同时只发一次检查请求，其余调用等待其结果
+        self._inflight = {}
+
+    def lookup(self, api_key):
+        """
+        查询缓存的检查结果，不发送请求
+
+        返回:
+            dict: valid(是否有效), status_code(状态码), checked_at(检查时间)，没有未过期的结果时返回None
+        """
+        key = api_key_fingerprint(api_key)
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is None:
+                return None
+            ttl = self.valid_ttl if verdict["valid"] else self.invalid_ttl
+            if time.monotonic() - verdict["checked_at"] >= ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(verdict)
+
+    def record(self, api_key, status_code):
+        """根据一次认证请求的状态码更新缓存，与认证无关的状态码（如429、5xx）不记录"""
+        if status_code in AUTH_FAILURE_STATUS:
+            valid = False
+        elif 200 <= status_code < 300:
+            valid = True
+        else:
+            return
+        key = api_key_fingerprint(api_key)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self._entries[key] = {"valid": valid, "status_code": status_code, "checked_at": time.monotonic()}
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if not valid and (previous is None or previous["valid"]):
+            logger.warning(f"API Key认证失败（状态码 {status_code}），后续请求将直接返回错误")
+
+    def check(self, api_key, force=False):
+        """
+        检查API Key是否有效，有缓存时直接返回
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            force (bool): 忽略缓存重新检查
+
+        返回:
+            dict: valid(是否有效，网络错误等无法判断时为None), status_code(状态码), error(无法判断的原因)
+        """
+        if not force:
+            verdict = self.lookup(api_key)
+            if verdict is not None:
+                return verdict
+
+        key = api_key_fingerprint(api_key)
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.lookup(api_key) or {"valid": None, "status_code": None, "error": "检查失败"}
+
+        try:
+            response = get_client().get_user_info(api_key)
+            self.record(api_key, response.status_code)
+            verdict = self.lookup(api_key)
+            if verdict is None:
+                return {"valid": None, "status_code": response.status_code, "error": f"状态码 {response.status_code}"}
+            return verdict
+        except Exception as e:
+            return {"valid": None, "status_code": None, "error": str(e)}
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+key_check_cache = KeyCheckCache()
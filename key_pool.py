@@ -0,0 +1,270 @@
+"""
+多API Key调度
+
+从配置文件加载多个API Key（可以属于不同账号，也可以是同一账号的子Key），批量上传和
+列表查询按轮询（平滑加权）或最少负载策略分摊到各个Key上，总吞吐随Key的数量增长，
+而不是受限于单个账号的限流。每个Key单独跟踪健康状态：连续失败后暂停一段时间，
+认证失败（401/403）的Key不再使用，配额用完的Key不再分配。
+
+配置文件为JSON，默认读取环境变量 VOICE_UPLOAD_KEYS_FILE 指定的文件：
+
+    {
+        "strategy": "least_loaded",
+        "keys": [
+            {"name": "main", "key": "sk-...", "account": "shop", "weight": 2, "max_in_flight": 8},
+            {"name": "sub", "key_env": "SF_SUB_KEY", "account": "shop", "quota": 500, "rate_limit": 2},
+            {"name": "backup", "key": "sk-..."}
+        ]
+    }
+
+key_env 表示从环境变量读取Key，避免明文写入配置文件。account 相同的Key共享同一批音色，
+查询列表时每个账号只请求一次，去重索引、列表缓存和检索索引也按账号共用（以该账号的第一个Key
+为准），用子Key重新运行批量上传时同样能命中其他Key上传过的音频；未指定时每个Key视为独立账号。
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from siliconflow_client import get_client, register_account_keys
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+STRATEGIES = (ROUND_ROBIN, LEAST_LOADED)
+
+# 连续多少次可重试的失败后暂停使用该Key，以及首次暂停的秒数（之后按指数增长）
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30.0
+MAX_COOLDOWN = 300.0
+
+
+class KeyPoolError(Exception):
+    """配置无效，或已没有可用的Key"""
+
+
+class PooledKey:
+    """
+    池中的一个Key及其健康状态
+
+    参数:
+        name (str): 显示名称，用于日志和结果中标记使用的Key
+        api_key (str): 硅基流动API密钥
+        account (str): 所属账号，同一账号的Key共享音色列表
+        weight (float): 权重，需大于0，权重越大分到的请求越多
+        quota (int): 本进程内最多分配的请求数，None表示不限
+        max_in_flight (int): 同时执行的请求数上限，None表示不限
+    """
+
+    def __init__(self, name, api_key, account=None, weight=1.0, quota=None, max_in_flight=None):
+        self.name = name
+        self.api_key = api_key.strip()
+        self.account = account or name
+        self.weight = float(weight)
+        self.quota = quota
+        self.max_in_flight = max_in_flight
+
+        self.in_flight = 0
+        self.dispatched = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.disabled = None
+        # 平滑加权轮询的当前值
+        self.current_weight = 0.0
+
+    def available(self, now):
+        """当前是否可以分配新请求"""
+        if self.disabled or now < self.cooldown_until:
+            return False
+        if self.quota is not None and self.dispatched >= self.quota:
+            return False
+        return self.max_in_flight is None or self.in_flight < self.max_in_flight
+
+    def usable(self):
+        """以后是否还可能被分配（未被禁用且配额未用完）"""
+        return not self.disabled and (self.quota is None or self.dispatched < self.quota)
+
+    def health(self, now):
+        if self.disabled:
+            return f"已停用（{self.disabled}）"
+        if self.quota is not None and self.dispatched >= self.quota:
+            return "配额已用完"
+        if now < self.cooldown_until:
+            return f"暂停中（{self.cooldown_until - now:.0f}秒后恢复）"
+        return "正常"
+
+
+class KeyPool:
+    """
+    API Key 池
+
+    参数:
+        keys (list): PooledKey 列表
+        strategy (str): 调度策略，round_robin（平滑加权轮询）或 least_loaded（按权重的最少负载）
+    """
+
+    def __init__(self, keys, strategy=LEAST_LOADED):
+        if not keys:
+            raise KeyPoolError("Key池中没有配置任何Key")
+        if strategy not in STRATEGIES:
+            raise KeyPoolError(f"未知的调度策略: {strategy}，可选 {', '.join(STRATEGIES)}")
+        for key in keys:
+            # 权重为0的Key永远不会被选中，只剩这样的Key时 acquire() 会一直等待
+            if not key.weight > 0:
+                raise KeyPoolError(f"Key {key.name} 的权重必须大于0")
+        self.keys = list(keys)
+        self.strategy = strategy
+        self._changed = threading.Condition()
+        for account in self.accounts:
+            register_account_keys([key.api_key for key in self.keys if key.account == account])
+
+    @property
+    def accounts(self):
+        """按配置顺序列出账号"""
+        return list(dict.fromkeys(key.account for key in self.keys))
+
+    @property
+    def max_in_flight(self):
+        """池内所有Key的并发上限之和，有Key不限并发时返回None"""
+        limits = [key.max_in_flight for key in self.keys]
+        return None if None in limits else sum(limits)
+
+    def _choose(self, candidates):
+        if self.strategy == ROUND_ROBIN:
+            total = sum(key.weight for key in candidates)
+            for key in candidates:
+                key.current_weight += key.weight
+            chosen = max(candidates, key=lambda key: key.current_weight)
+            chosen.current_weight -= total
+            return chosen
+        return min(candidates, key=lambda key: ((key.in_flight + 1) / key.weight, key.dispatched))
+
+    def acquire(self, account=None, timeout=None):
+        """
+        分配一个Key，没有可立即使用的Key时阻塞等待
+
+        参数:
+            account (str): 只在该账号的Key中分配
+            timeout (float): 最长等待秒数，None表示一直等待
+
+        返回:
+            PooledKey: 分配到的Key，用完后需调用 release()
+
+        异常:
+            KeyPoolError: 所有（该账号的）Key都已停用或配额用完，或等待超时
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                keys = [key for key in self.keys if account is None or key.account == account]
+                if not any(key.usable() for key in keys):
+                    raise KeyPoolError(f"没有可用的API Key{f'（账号 {account}）' if account else ''}")
+                candidates = [key for key in keys if key.available(now)]
+                if candidates:
+                    key = self._choose(candidates)
+                    key.in_flight += 1
+                    key.dispatched += 1
+                    return key
+
+                # 等到最早结束暂停的Key恢复，或有请求完成释放出并发名额
+                wait = None
+                cooling = [key.cooldown_until - now for key in keys if key.usable() and key.cooldown_until > now]
+                if cooling:
+                    wait = min(cooling)
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise KeyPoolError("等待可用的API Key超时")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._changed.wait(wait)
+
+    def release(self, key, outcome):
+        """
+        归还Key并根据执行结果更新其健康状态
+
+        参数:
+            key (PooledKey): acquire() 分配的Key
+            outcome (dict): 上传或查询的结果，约定同 voice_api.upload_voice_file
+        """
+        with self._changed:
+            key.in_flight -= 1
+            status = outcome.get("status_code")
+            if outcome.get("ok"):
+                key.succeeded += 1
+                key.consecutive_failures = 0
+            elif status in (401, 403):
+                key.failed += 1
+                key.disabled = f"认证失败，状态码 {status}"
+                logger.error(f"API Key {key.name} 认证失败，已停用")
+            elif outcome.get("retryable"):
+                # 只有限流、超时、服务端错误等与Key相关的失败计入健康状态，文件本身的问题不算
+                key.failed += 1
+                key.consecutive_failures += 1
+                if key.consecutive_failures >= FAILURE_THRESHOLD:
+                    cooldown = min(MAX_COOLDOWN, COOLDOWN * 2 ** (key.consecutive_failures - FAILURE_THRESHOLD))
+                    key.cooldown_until = time.monotonic() + cooldown
+                    logger.warning(f"API Key {key.name} 连续失败 {key.consecutive_failures} 次，暂停使用 {cooldown:.0f} 秒")
+            else:
+                key.failed += 1
+            self._changed.notify_all()
+
+    def stats(self):
+        """各Key的使用情况"""
+        now = time.monotonic()
+        with self._changed:
+            return [
+                {
+                    "name": key.name,
+                    "account": key.account,
+                    "dispatched": key.dispatched,
+                    "succeeded": key.succeeded,
+                    "failed": key.failed,
+                    "in_flight": key.in_flight,
+                    "health": key.health(now),
+                }
+                for key in self.keys
+            ]
+
+
+def load_key_pool(path=None):
+    """
+    从配置文件加载Key池
+
+    参数:
+        path (str): 配置文件路径，默认读取环境变量 VOICE_UPLOAD_KEYS_FILE
+
+    返回:
+        KeyPool: Key池，未配置时返回None
+    """
+    path = path or os.environ.get("VOICE_UPLOAD_KEYS_FILE")
+    if not path:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise KeyPoolError(f"Key池配置不是合法的JSON: {e}")
+
+    keys = []
+    client = get_client()
+    for index, entry in enumerate(config.get("keys", [])):
+        name = entry.get("name") or f"key-{index + 1}"
+        api_key = entry.get("key") or os.environ.get(entry.get("key_env") or "", "")
+        if not api_key.strip():
+            raise KeyPoolError(f"Key池配置中 {name} 没有提供 key 或 key_env")
+        key = PooledKey(
+            name, api_key, entry.get("account"), entry.get("weight", 1.0),
+            entry.get("quota"), entry.get("max_in_flight")
+        )
+        if entry.get("rate_limit"):
+            client.set_rate_limit(key.api_key, float(entry["rate_limit"]))
+        keys.append(key)
+
+    pool = KeyPool(keys, config.get("strategy", LEAST_LOADED))
+    logger.info(f"已加载Key池: {len(keys)} 个Key，{len(pool.accounts)} 个账号，策略 {pool.strategy}")
+    return pool
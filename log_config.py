@@ -0,0 +1,172 @@
+"""
+日志配置
+
+业务线程只把日志记录放入内存队列（QueueHandler），由单独的后台线程（QueueListener）
+格式化并写入控制台和文件，上传等请求路径不会因为磁盘写入而阻塞。队列有长度上限，
+写入跟不上时丢弃新记录并计数（voice_upload_log_records_dropped_total），不会占满内存。
+
+日志文件每行一条JSON记录，除时间、级别、消息外，还包含调用方通过 extra 传入的字段
+（如 request_id、file、bytes、latency），便于用 jq 等工具分析。文件按大小（默认）或按时间
+轮转，轮转出的旧文件用gzip压缩，只保留最近几个。
+
+环境变量:
+    VOICE_UPLOAD_LOG_MAX_MB        单个日志文件的大小上限，默认10
+    VOICE_UPLOAD_LOG_BACKUPS       保留的旧文件个数，默认5
+    VOICE_UPLOAD_LOG_ROTATE_WHEN   设置后改为按时间轮转，取值同 TimedRotatingFileHandler 的 when（如 midnight）
+    VOICE_UPLOAD_LOG_FORMAT        文件格式，json（默认）或 text
+"""
+import atexit
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+
+import metrics
+
+DEFAULT_MAX_MB = 10
+DEFAULT_BACKUPS = 5
+
+# 队列中最多积压的记录数
+QUEUE_SIZE = 10000
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# LogRecord 自带的属性，其余属性视为调用方通过 extra 传入的结构化字段
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录格式化为一行JSON"""
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith("_"):
+                data[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录并计数，不阻塞调用方"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record):
+        # 在调用方线程中合并消息参数并展开异常堆栈（参数和异常对象可能之后被修改），
+        # 但保留 extra 字段和异常文本，由后台线程按各自的格式输出
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def _gzip_rotator(source, dest):
+    """轮转时把旧文件压缩为 .gz"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def create_file_handler(log_file):
+    """
+    按环境变量创建带轮转和压缩的文件日志处理器
+
+    参数:
+        log_file (str): 日志文件路径
+
+    返回:
+        logging.Handler: 文件日志处理器
+    """
+    backups = int(os.environ.get("VOICE_UPLOAD_LOG_BACKUPS", DEFAULT_BACKUPS))
+    when = os.environ.get("VOICE_UPLOAD_LOG_ROTATE_WHEN")
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(log_file, when=when, backupCount=backups,
+                                                            encoding="utf-8", delay=True)
+    else:
+        max_bytes = int(float(os.environ.get("VOICE_UPLOAD_LOG_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding="utf-8", delay=True)
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    if os.environ.get("VOICE_UPLOAD_LOG_FORMAT", "json").lower() == "text":
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+_listener = None
+_queue_handler = None
+_listener_lock = threading.Lock()
+
+
+def setup_logging(log_dir, name="voice_upload"):
+    """
+    把根日志器的输出改为经由队列异步写入，并增加轮转的文件日志，重复调用时不做任何事
+
+    参数:
+        log_dir (str): 日志目录
+        name (str): 日志文件名（不含扩展名），多进程时每个进程应使用不同的文件
+
+    返回:
+        str: 日志文件路径，已配置过时返回None
+    """
+    global _listener, _queue_handler
+    with _listener_lock:
+        if _listener is not None:
+            return None
+        os.makedirs(log_dir, exist_ok=True)
+        log_file = os.path.join(log_dir, f"{name}.log")
+
+        root = logging.getLogger()
+        # 已有的处理器（如 basicConfig 添加的控制台输出）也移到后台线程中执行
+        handlers = list(root.handlers) + [create_file_handler(log_file)]
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        _queue_handler = BoundedQueueHandler(queue.Queue(QUEUE_SIZE))
+        root.addHandler(_queue_handler)
+
+        _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return log_file
+
+
+def shutdown_logging():
+    """写完队列中剩余的记录并停止后台线程，之后的日志恢复为同步输出到原来的处理器（不含文件）"""
+    global _listener, _queue_handler
+    with _listener_lock:
+        if _listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        _listener.stop()
+        *previous, file_handler = _listener.handlers
+        file_handler.close()
+        for handler in previous:
+            root.addHandler(handler)
+        _listener = _queue_handler = None
@@ -0,0 +1,330 @@
+"""
+运行指标
+
+在上传和查询列表的关键路径上记录分阶段耗时（参数检查、计算哈希、预处理、建立连接、
+发送请求体、等待服务端、解析响应）、按状态码统计的请求数和上传字节数，用于分析每个
+音色的耗时到底花在哪里。指标保存在进程内存中，可以通过 Prometheus 文本格式的
+/metrics 接口（见 start_metrics_server）或 snapshot() 的JSON汇总查看。
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 耗时直方图的分桶上界（秒），覆盖本地操作的毫秒级到大文件上传的分钟级
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# /metrics 接口默认监听的端口，与Gradio的7860相邻
+DEFAULT_METRICS_PORT = 7861
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    只增不减的计数器
+
+    参数:
+        name (str): 指标名
+        documentation (str): 说明
+        labelnames (tuple): 标签名
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [dict(zip(self.labelnames, key), value=value) for key, value in items]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    分桶直方图，记录次数、总和及各桶的累计次数，分位数由分桶线性插值估算，
+    并限制在实际观测到的最小值和最大值之间
+
+    参数:
+        name (str): 指标名
+        documentation (str): 说明
+        labelnames (tuple): 标签名
+        buckets (tuple): 递增的分桶上界
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0, "min": value, "max": value
+                }
+            series["min"] = min(series["min"], value)
+            series["max"] = max(series["max"], value)
+            series["counts"][index] += 1
+            series["count"] += 1
+            series["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """记录 with 块的耗时，块内抛出异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, series, q):
+        total = series["count"]
+        if total == 0:
+            return 0.0
+        return min(series["max"], max(series["min"], self._bucket_quantile(series["counts"], total, q)))
+
+    def _bucket_quantile(self, counts, total, q):
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        # 落在最后一个桶（超过最大上界）时由调用方限制为最大观测值
+        return float("inf")
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(upper)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series["counts"]))) for key, series in self._series.items())
+        result = []
+        for key, series in items:
+            count = series["count"]
+            result.append(dict(
+                zip(self.labelnames, key),
+                count=count,
+                sum=series["sum"],
+                mean=series["sum"] / count if count else 0.0,
+                max=series["max"],
+                p50=self._quantile(series, 0.5),
+                p90=self._quantile(series, 0.9),
+                p99=self._quantile(series, 0.99),
+            ))
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """指标注册表，负责统一导出"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已存在: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render_prometheus(self):
+        """导出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """导出JSON汇总，直方图给出次数、均值和 p50/p90/p99"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+registry = MetricsRegistry()
+
+# 各阶段耗时，operation 为 upload 或 list
+PHASE_SECONDS = registry.histogram(
+    "voice_upload_phase_seconds",
+    "Time spent in each phase of an upload or voice list call",
+    ("operation", "phase")
+)
+API_REQUESTS = registry.counter(
+    "voice_upload_api_requests_total",
+    "SiliconFlow API requests by endpoint and HTTP status (or exception type)",
+    ("endpoint", "status")
+)
+API_REQUEST_SECONDS = registry.histogram(
+    "voice_upload_api_request_seconds",
+    "Wall-clock time of a single SiliconFlow API request attempt",
+    ("endpoint",)
+)
+UPLOAD_BYTES = registry.counter(
+    "voice_upload_bytes_sent_total",
+    "Request body bytes sent to the upload endpoint"
+)
+UPLOADS = registry.counter(
+    "voice_upload_uploads_total",
+    "Finished uploads by result (success, duplicate, failed)",
+    ("result",)
+)
+LOG_RECORDS_DROPPED = registry.counter(
+    "voice_upload_log_records_dropped_total",
+    "Log records dropped because the logging queue was full"
+)
+VOICE_LIST_LOOKUPS = registry.counter(
+    "voice_upload_voice_list_lookups_total",
+    "Voice list lookups by source (cache, not_modified, fetched)",
+    ("source",)
+)
+
+
+def observe_phase(operation, phase, seconds):
+    PHASE_SECONDS.observe(seconds, operation=operation, phase=phase)
+
+
+def phase_timer(operation, phase):
+    """记录 with 块耗时的快捷方式"""
+    return PHASE_SECONDS.time(operation=operation, phase=phase)
+
+
+def summary():
+    """
+    供命令行输出的精简汇总
+
+    返回:
+        dict: phases(各阶段耗时统计), requests(按状态码的请求数), uploads(上传结果计数),
+              bytes_sent(发送字节数), send_mb_per_second(发送请求体阶段的平均速率)
+    """
+    phases = PHASE_SECONDS.snapshot()
+    send_seconds = sum(row["sum"] for row in phases if row["operation"] == "upload" and row["phase"] == "send")
+    bytes_sent = UPLOAD_BYTES.value()
+    return {
+        "phases": phases,
+        "requests": API_REQUESTS.snapshot(),
+        "uploads": {row["result"]: row["value"] for row in UPLOADS.snapshot()},
+        "bytes_sent": bytes_sent,
+        "send_mb_per_second": bytes_sent / (1024 * 1024) / send_seconds if send_seconds > 0 else 0.0,
+    }
+
+
+def start_metrics_server(host="127.0.0.1", port=DEFAULT_METRICS_PORT):
+    """
+    在后台线程中启动 /metrics 接口
+
+    返回:
+        ThreadingHTTPServer: 服务器实例，调用 shutdown() 停止
+    """
+    # 按需导入，命令行路径不需要HTTP服务器
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 抓取请求很频繁，不写入日志
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"指标接口已启动: http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,142 @@
+"""
+流式 multipart/form-data 编码
+
+requests 的 files= 参数会先在内存中拼出完整的请求体，并发上传时每个文件都会占用一份
+完整拷贝。MultipartFileStream 只在内存中保存表单字段和分隔符，音频内容在发送时按固定
+大小的块从磁盘读取，内存占用与文件大小、并发数无关，同时记录已发送的字节数用于显示进度。
+"""
+import mimetypes
+import os
+import time
+import uuid
+
+# 每次从磁盘读取的块大小
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# 进度回调的最小间隔：距上次回调至少发送了总大小的1%或经过了0.2秒，发送完毕时总会回调一次。
+# http.client 每次只读取8KB，不加限制时50MB的文件会回调六千多次
+PROGRESS_MIN_FRACTION = 0.01
+PROGRESS_MIN_INTERVAL = 0.2
+
+
+def _quote(value):
+    """转义 Content-Disposition 中的参数值"""
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartFileStream:
+    """
+    单文件 multipart/form-data 请求体，可直接作为 requests 的 data 参数
+
+    实现了 read()、__iter__ 和 __len__：requests 据此把它当作流式请求体，
+    并设置准确的 Content-Length，而不是退化为分块传输编码。
+
+    参数:
+        fields (dict): 普通表单字段
+        file_field (str): 文件字段名
+        file_path (str): 文件路径
+        chunk_size (int): 每次读取的字节数
+        progress_callback (callable): 发送过程中调用 progress_callback(bytes_sent, total)，
+                                      按 PROGRESS_MIN_FRACTION / PROGRESS_MIN_INTERVAL 限制频率
+    """
+
+    def __init__(self, fields, file_field, file_path, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.bytes_sent = 0
+        self._reported_bytes = 0
+        self._reported_at = 0.0
+        # 首次和最近一次被读取的时间（time.perf_counter），用于区分建立连接、发送请求体和等待响应的耗时
+        self.first_read_at = None
+        self.last_read_at = None
+
+        filename = os.path.basename(file_path)
+        file_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        head = []
+        for name, value in fields.items():
+            head.append(
+                f'--{self.boundary}\r\n'
+                f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        head.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{_quote(file_field)}"; filename="{_quote(filename)}"\r\n'
+            f'Content-Type: {file_type}\r\n\r\n'
+        )
+        self._head = "".join(head).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+        self._file = open(file_path, "rb")
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        self.total = len(self._head) + self._file_size + len(self._tail)
+        # 0: 字段头部  1: 文件内容  2: 结尾分隔符  3: 结束
+        self._stage = 0
+        self._offset = 0
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.total
+
+    def _next_chunk(self, size):
+        """读取下一块数据，返回空字节串表示结束"""
+        while self._stage < 3:
+            if self._stage == 1:
+                chunk = self._file.read(size)
+                if chunk:
+                    return chunk
+                self._stage = 2
+                self._offset = 0
+                continue
+
+            buffer = self._head if self._stage == 0 else self._tail
+            chunk = buffer[self._offset:self._offset + size]
+            if chunk:
+                self._offset += len(chunk)
+                return chunk
+            self._stage += 1
+            self._offset = 0
+        return b""
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.chunk_size
+        now = time.perf_counter()
+        if self.first_read_at is None:
+            self.first_read_at = now
+        chunk = self._next_chunk(size)
+        self.last_read_at = time.perf_counter()
+        if chunk:
+            self.bytes_sent += len(chunk)
+            if self.progress_callback and self._should_report(self.last_read_at):
+                self._reported_bytes = self.bytes_sent
+                self._reported_at = self.last_read_at
+                self.progress_callback(self.bytes_sent, self.total)
+        return chunk
+
+    def _should_report(self, now):
+        if self.bytes_sent >= self.total:
+            return True
+        return (self.bytes_sent - self._reported_bytes >= self.total * PROGRESS_MIN_FRACTION
+                or now - self._reported_at >= PROGRESS_MIN_INTERVAL)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
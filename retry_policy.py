@@ -0,0 +1,239 @@
+"""
+API调用的重试、限流与熔断
+
+- RetryPolicy：指数退避加随机抖动（full jitter），服务端返回 Retry-After 时以其为准
+- TokenBucket：令牌桶限流，同一个API Key的所有工作线程共用一个桶。收到429时速率减半，
+  之后每次成功缓慢回升（AIMD），使吞吐稳定在服务端允许的上限附近，而不是在突发和失败之间震荡
+- CircuitBreaker：连续失败达到阈值后熔断一段时间，期间直接失败，不再请求已经不可用的服务
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """熔断器处于打开状态，请求未发出"""
+
+
+class ConnectFailedError(requests.exceptions.ConnectionError):
+    """建立连接失败，请求确定没有发出（异步客户端把 httpx.ConnectError 转换为此异常）"""
+
+
+def is_connect_error(exc):
+    """
+    判断异常是否发生在连接阶段（连接超时、连接被拒绝、域名解析失败），此时请求确定没有送达服务端
+
+    连接建立之后的断开（Connection aborted、RemoteDisconnected 等）不算：请求体可能已经发完，
+    服务端可能已经处理了请求。
+    """
+    if isinstance(exc, (requests.exceptions.ConnectTimeout, ConnectFailedError)):
+        return True
+    if not isinstance(exc, requests.exceptions.ConnectionError) or isinstance(exc, CircuitOpenError):
+        return False
+    # requests 把 urllib3 的异常包装为 ConnectionError(MaxRetryError(reason=...))
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（秒数或HTTP日期），返回需要等待的秒数，无法解析时返回None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    参数:
+        max_attempts (int): 最多尝试次数（含第一次）
+        base_delay (float): 退避基数（秒）
+        max_delay (float): 单次等待的上限（秒），同样限制 Retry-After
+        retry_statuses (tuple): 需要重试的HTTP状态码
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0, retry_statuses=(429, 500, 502, 503, 504)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses)
+
+    def should_retry_status(self, status_code, idempotent=True):
+        """
+        判断状态码是否值得重试
+
+        非幂等请求（上传）只重试429和503：这两种情况服务端明确没有处理请求，
+        其他5xx可能已经创建了音色，重试会产生重复音色。
+        """
+        if status_code not in self.retry_statuses:
+            return False
+        return idempotent or status_code in (429, 503)
+
+    def should_retry_exception(self, exc, idempotent=True):
+        """判断异常是否值得重试，非幂等请求只重试连接阶段的错误（见 is_connect_error）"""
+        if isinstance(exc, CircuitOpenError):
+            return False
+        if not idempotent:
+            return is_connect_error(exc)
+        return isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+    def delay(self, attempt, retry_after=None):
+        """第attempt次失败后的等待时间"""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class TokenBucket:
+    """
+    AIMD 自适应令牌桶
+
+    参数:
+        rate (float): 初始速率（每秒请求数）
+        capacity (float): 桶容量，即允许的突发请求数
+        min_rate (float): 速率下限
+        max_rate (float): 速率上限
+        increase (float): 每次成功后速率的增加量
+    """
+
+    def __init__(self, rate=5.0, capacity=5.0, min_rate=0.2, max_rate=None, increase=0.1):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.increase = increase
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """尝试取得一个令牌，不阻塞：成功时返回0，否则返回还需等待的秒数（异步客户端据此 await）"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._blocked_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self):
+        """取得一个令牌，必要时阻塞等待，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self, retry_after=None):
+        """收到429：速率减半，有 Retry-After 时所有线程都暂停到指定时间"""
+        with self._lock:
+            now = time.monotonic()
+            # 并发的请求往往同时收到429，一秒内只降一次速，避免速率瞬间跌到下限
+            if now - self._last_decrease >= 1.0:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_decrease = now
+            self._tokens = 0
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+        logger.warning(f"请求被限流，速率降至 {self.rate:.2f} 次/秒")
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    参数:
+        failure_threshold (int): 连续失败多少次后熔断
+        reset_timeout (float): 熔断持续时间（秒），之后放行一个试探请求
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """
+        请求前检查，熔断期间抛出 CircuitOpenError
+
+        返回:
+            object: 本次请求是试探请求时返回其标记，否则返回None；请求结束后需传给 end_probe()
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return None
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(f"服务暂时不可用，已暂停请求，{max(remaining, 0):.0f}秒后重试")
+            # 熔断时间已过，放行一个试探请求
+            self._probing = object()
+            return self._probing
+
+    def end_probe(self, probe):
+        """
+        试探请求结束时调用（无论结果如何）
+
+        试探请求既没有记录成功也没有记录失败时（如抛出了其他异常或被取消），释放试探名额，
+        由下一个请求重新试探，否则熔断器会一直处于打开状态。
+        """
+        if probe is None:
+            return
+        with self._lock:
+            if self._probing is probe:
+                self._probing = False
+
+    @property
+    def is_open(self):
+        """当前是否处于熔断状态"""
+        with self._lock:
+            return self._opened_at is not None
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("服务已恢复，熔断器关闭")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.error(f"连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -0,0 +1,218 @@
+"""
+生产环境服务模式
+
+把Gradio界面挂载到FastAPI应用中由uvicorn运行，并提供:
+    /healthz  存活检查，进程能响应即返回200
+    /readyz   就绪检查，数据目录可写且任务数据库可访问时返回200，否则返回503
+    /metrics  Prometheus 格式的运行指标（每个进程各自统计）
+
+用法:
+    python server.py --host 0.0.0.0 --port 7860 --workers 4
+
+Gradio的队列状态保存在进程内，同一个页面的请求必须落在同一个进程上，因此多个进程不能共用
+一个端口：第i个进程监听 port+i，由前置的反向代理按客户端做会话保持（如 nginx 的 ip_hash）。
+主进程只负责启动和看护工作进程，工作进程异常退出时会自动重启。
+
+进程间共享的状态都在本地数据目录中：后台任务队列和去重索引本来就是SQLite，音色列表缓存
+的失效标记在多进程时也改为记录在SQLite中（见 voice_cache）。每个API Key的请求速率上限
+按进程数平分，所有进程合计仍不超过配置的速率。
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import log_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7860
+
+# 工作进程连续快速退出时，重启前等待的秒数
+RESTART_DELAY = 2.0
+
+
+def readiness():
+    """
+    就绪检查
+
+    返回:
+        tuple: (是否就绪, 各项检查结果)
+    """
+    from app_paths import get_data_dir
+    from job_queue import get_job_queue
+    from siliconflow_client import get_client
+
+    checks = {}
+    try:
+        probe = os.path.join(get_data_dir(), f".ready-{os.getpid()}")
+        with open(probe, "w") as f:
+            f.write("ok")
+        os.remove(probe)
+        checks["data_dir"] = "ok"
+    except OSError as e:
+        checks["data_dir"] = f"不可写: {e}"
+    try:
+        checks["pending_jobs"] = get_job_queue().pending_count()
+        checks["job_queue"] = "ok"
+    except Exception as e:
+        checks["job_queue"] = f"不可用: {e}"
+    # 上游熔断只作为信息展示，不影响就绪状态，否则所有进程会同时被摘除
+    checks["upstream"] = "circuit_open" if get_client().circuit_breaker.is_open else "ok"
+    ready = checks["data_dir"] == "ok" and checks["job_queue"] == "ok"
+    return ready, checks
+
+
+def configure_staging():
+    """暂存模式下让Gradio把上传的文件直接写入暂存区，需在导入Gradio之前调用"""
+    from upload_staging import staging_enabled, get_upload_spool
+
+    if staging_enabled():
+        get_upload_spool().configure_gradio()
+
+
+def create_app():
+    """
+    创建挂载了Gradio界面的FastAPI应用，并启动本进程的后台任务线程
+
+    返回:
+        fastapi.FastAPI: ASGI 应用
+    """
+    configure_staging()
+    # Gradio 依赖 FastAPI，安装了 Gradio 即可使用
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, PlainTextResponse
+
+    import metrics
+    import upload
+    from job_queue import get_job_queue
+
+    app = FastAPI()
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok", "pid": os.getpid()}
+
+    @app.get("/readyz")
+    def readyz():
+        ready, checks = readiness()
+        return JSONResponse({"status": "ready" if ready else "not_ready", "checks": checks},
+                            status_code=200 if ready else 503)
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return PlainTextResponse(metrics.registry.render_prometheus(),
+                                 media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    # 只恢复心跳已超时的任务，其他工作进程正在执行的任务不受影响
+    get_job_queue().start()
+    demo = upload.enable_queue(upload.create_gradio_interface())
+    return gr.mount_gradio_app(app, demo, path="/")
+
+
+def run_worker(host, port, log_name="voice_upload"):
+    """在当前进程中运行一个服务进程"""
+    configure_staging()
+    import uvicorn
+
+    import upload
+
+    upload.setup_logging(log_name)
+    logger.info(f"服务进程 {os.getpid()} 监听 http://{host}:{port}")
+    uvicorn.run(create_app(), host=host, port=port, log_level="warning")
+
+
+def worker_environment(workers):
+    """工作进程的环境变量：共享缓存失效标记，按进程数平分每个API Key的速率上限"""
+    from siliconflow_client import DEFAULT_RATE_LIMIT
+
+    env = dict(os.environ)
+    if workers > 1:
+        env["VOICE_UPLOAD_SHARED_CACHE"] = "1"
+        rate_limit = float(os.environ.get("SILICONFLOW_RATE_LIMIT", DEFAULT_RATE_LIMIT))
+        env["SILICONFLOW_RATE_LIMIT"] = str(rate_limit / workers)
+    return env
+
+
+def supervise(host, port, workers):
+    """
+    启动多个工作进程并在其异常退出时重启，收到 SIGINT/SIGTERM 时停止所有进程
+
+    工作进程退出时，它正在执行的后台任务立即重新排队，由其他进程（或重启后的进程）继续执行。
+    """
+    from job_queue import get_job_queue, process_owner
+
+    env = worker_environment(workers)
+
+    def spawn(index):
+        command = [sys.executable, os.path.abspath(__file__), "--worker", "--host", host, "--port", str(port + index)]
+        return subprocess.Popen(command, env=env)
+
+    processes = [spawn(index) for index in range(workers)]
+    started = [time.monotonic()] * workers
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"已启动 {workers} 个服务进程，端口 {port}-{port + workers - 1}")
+
+    try:
+        while not stopping:
+            for index, process in enumerate(processes):
+                code = process.poll()
+                if code is None:
+                    continue
+                logger.error(f"服务进程 {process.pid}（端口 {port + index}）退出，返回码 {code}，正在重启")
+                get_job_queue().recover(owner=process_owner(process.pid))
+                # 启动后很快就退出，多半是配置或端口问题，稍等再重启，避免空转
+                if time.monotonic() - started[index] < RESTART_DELAY:
+                    time.sleep(RESTART_DELAY)
+                processes[index] = spawn(index)
+                started[index] = time.monotonic()
+            time.sleep(0.5)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="硅基流动参考音色上传工具（服务模式）")
+    parser.add_argument("--host", default=os.environ.get("VOICE_UPLOAD_HOST", DEFAULT_HOST),
+                        help="监听地址，默认读取环境变量 VOICE_UPLOAD_HOST，对外提供服务时使用 0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("VOICE_UPLOAD_PORT", DEFAULT_PORT)),
+                        help="监听端口，多进程时第i个进程使用 port+i，默认读取环境变量 VOICE_UPLOAD_PORT")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("VOICE_UPLOAD_WORKERS", 1)),
+                        help="服务进程数，默认读取环境变量 VOICE_UPLOAD_WORKERS")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format=log_config.TEXT_FORMAT)
+
+    if args.worker:
+        # 每个工作进程写各自的日志文件，避免多个进程同时轮转同一个文件
+        run_worker(args.host, args.port, f"voice_upload-{args.port}")
+        return 0
+    if args.workers <= 1:
+        run_worker(args.host, args.port)
+        return 0
+    return supervise(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,498 @@
+"""
+硅基流动API客户端
+
+所有对 api.siliconflow.cn 的调用都通过这里的 SiliconFlowClient 发出。客户端持有一个
+keep-alive 的 requests.Session 和调好大小的连接池，连续请求复用同一条 TCP+TLS 连接，
+避免每次调用都重新握手。请求经过熔断器和按API Key共享的令牌桶，遇到429/5xx等临时错误
+按退避策略自动重试（见 retry_policy）。每次请求的耗时和状态码记录在 metrics 中。base_url
+可配置，便于对接本地的桩服务器进行测试。
+
+AsyncSiliconFlowClient 是基于 httpx 的异步版本，供Gradio的异步事件处理函数使用，一个事件循环
+即可同时进行大量上传和查询，不需要每个请求占用一个线程。它与同步客户端共用配置、令牌桶和熔断器。
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from multipart_stream import MultipartFileStream
+from retry_policy import RetryPolicy, TokenBucket, CircuitBreaker, ConnectFailedError, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.siliconflow.cn"
+
+# 各接口的超时时间 (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUTS = {
+    "upload": (5, 60),
+    "list": (5, 30),
+    "delete": (5, 30),
+    "user": (5, 10),
+    # 语音合成的读超时是两个音频块之间的最长间隔，不是整个合成的时长
+    "speech": (5, 30),
+}
+
+# 每个API Key默认的请求速率上限（次/秒），收到429后会自动下调
+DEFAULT_RATE_LIMIT = 5.0
+
+# 连接池大小，需不小于批量上传的最大并发数，否则多出的线程会反复新建连接
+DEFAULT_POOL_SIZE = 16
+
+# 异步客户端的最大连接数，决定同时进行的请求数上限
+DEFAULT_ASYNC_POOL_SIZE = 64
+
+
+class SiliconFlowClient:
+    """
+    硅基流动API客户端
+
+    参数:
+        base_url (str): API根地址，默认读取环境变量 SILICONFLOW_BASE_URL，否则使用官方地址
+        pool_size (int): 每个主机保留的最大keep-alive连接数
+        timeouts (dict): 覆盖默认的各接口超时设置
+        retry_policy (RetryPolicy): 重试策略
+        rate_limit (float): 每个API Key每秒最多发出的请求数，默认读取环境变量 SILICONFLOW_RATE_LIMIT
+        circuit_breaker (CircuitBreaker): 熔断器
+    """
+
+    def __init__(self, base_url=None, pool_size=DEFAULT_POOL_SIZE, timeouts=None, retry_policy=None,
+                 rate_limit=None, circuit_breaker=None):
+        self.base_url = (base_url or os.environ.get("SILICONFLOW_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        # 每个API Key一个令牌桶，同一账号的所有线程共用
+        self.rate_limit = rate_limit or float(os.environ.get("SILICONFLOW_RATE_LIMIT", DEFAULT_RATE_LIMIT))
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+        self.session = requests.Session()
+        # 不读取系统代理等环境配置，与程序启动时禁用代理的行为保持一致
+        self.session.trust_env = False
+        # 重试统一由 _request 按重试策略处理，这里不让urllib3静默重发上传请求
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0, pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _headers(self, api_key):
+        return {"Authorization": f"Bearer {api_key.strip()}"}
+
+    def get_bucket(self, api_key):
+        """获取API Key对应的令牌桶，同一账号的所有线程和协程共用"""
+        key = api_key_fingerprint(api_key)
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate=self.rate_limit, capacity=max(1.0, self.rate_limit))
+        return bucket
+
+    def set_rate_limit(self, api_key, rate):
+        """单独设置某个API Key的请求速率上限（次/秒），用于不同配额的多个Key"""
+        key = api_key_fingerprint(api_key)
+        with self._buckets_lock:
+            self._buckets[key] = TokenBucket(rate=rate, capacity=max(1.0, rate))
+
+    def _request(self, api_key, send, endpoint, idempotent=True):
+        """
+        经过熔断、限流和重试发送请求
+
+        参数:
+            api_key (str): 硅基流动API密钥，用于选择令牌桶
+            send (callable): 发出一次请求并返回响应，每次重试都会重新调用（上传时需重新打开文件流）
+            endpoint (str): 接口名称（upload/list），用作指标的标签
+            idempotent (bool): 请求是否可以安全重发
+
+        返回:
+            requests.Response: 最后一次请求的响应，重试耗尽时为最后一次的失败响应
+        """
+        bucket = self.get_bucket(api_key)
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = self.circuit_breaker.before_request()
+            try:
+                bucket.acquire()
+                start = time.perf_counter()
+                try:
+                    response = send()
+                except requests.exceptions.RequestException as e:
+                    delay = self._after_exception(e, endpoint, start, attempt, idempotent)
+                else:
+                    delay = self._after_response(bucket, response, endpoint, start, attempt, idempotent)
+                    if delay is None:
+                        return response
+                    response.close()
+            finally:
+                self.circuit_breaker.end_probe(probe)
+            time.sleep(delay)
+
+    def _after_exception(self, exc, endpoint, start, attempt, idempotent):
+        """记录一次失败的请求，需要重试时返回等待秒数，否则重新抛出异常（同步和异步客户端共用）"""
+        metrics.API_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.API_REQUESTS.inc(endpoint=endpoint, status=type(exc).__name__)
+        self.circuit_breaker.record_failure()
+        if attempt >= self.retry_policy.max_attempts or not self.retry_policy.should_retry_exception(exc, idempotent):
+            raise exc
+        delay = self.retry_policy.delay(attempt)
+        logger.warning(f"请求失败（{type(exc).__name__}），{delay:.1f}秒后第{attempt}次重试")
+        return delay
+
+    def _after_response(self, bucket, response, endpoint, start, attempt, idempotent):
+        """根据响应更新限流和熔断状态，需要重试时返回等待秒数，否则返回None（同步和异步客户端共用）"""
+        status = response.status_code
+        metrics.API_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.API_REQUESTS.inc(endpoint=endpoint, status=status)
+        retry_after = None
+        if status == 429:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            bucket.on_throttled(retry_after)
+            # 限流说明服务本身可用，熔断器按成功处理（否则试探请求遇到429时熔断器无法关闭）
+            self.circuit_breaker.record_success()
+        elif status >= 500:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+            # 只有成功的请求说明当前速率可以承受；401/403/400等错误与限流无关，速率保持不变
+            if 200 <= status < 300:
+                bucket.on_success()
+
+        if attempt >= self.retry_policy.max_attempts or not self.retry_policy.should_retry_status(status, idempotent):
+            return None
+        delay = self.retry_policy.delay(attempt, retry_after)
+        logger.warning(f"服务端返回 {status}，{delay:.1f}秒后第{attempt}次重试")
+        return delay
+
+    def upload_voice(self, api_key, audio_file, model, custom_name, text, progress_callback=None):
+        """
+        上传参考音频，音频内容边读边发，不会整体读入内存
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            audio_file (str): 音频文件路径
+            model (str): 模型名称
+            custom_name (str): 参考音频名称
+            text (str): 参考音频文字内容
+            progress_callback (callable): 上传进度回调 progress_callback(bytes_sent, total)
+
+        返回:
+            requests.Response: 接口响应
+        """
+        fields = {
+            "model": model,
+            "customName": custom_name,
+            "text": text
+        }
+
+        def send():
+            with MultipartFileStream(fields, "file", audio_file, progress_callback=progress_callback) as body:
+                headers = self._headers(api_key)
+                headers["Content-Type"] = body.content_type
+                start = time.perf_counter()
+                try:
+                    return self.session.post(
+                        f"{self.base_url}/v1/uploads/audio/voice",
+                        headers=headers,
+                        data=body,
+                        timeout=self.timeouts["upload"]
+                    )
+                finally:
+                    _record_upload_phases(start, time.perf_counter(), body)
+
+        # 上传会在服务端创建音色，不是幂等请求
+        return self._request(api_key, send, "upload", idempotent=False)
+
+    def list_voices(self, api_key, etag=None):
+        """
+        获取参考音频列表
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            etag (str): 上次响应的ETag，服务端数据未变化时返回304
+
+        返回:
+            requests.Response: 接口响应
+        """
+        headers = self._headers(api_key)
+        if etag:
+            headers["If-None-Match"] = etag
+        return self._request(api_key, lambda: self.session.get(
+            f"{self.base_url}/v1/audio/voice/list",
+            headers=headers,
+            timeout=self.timeouts["list"]
+        ), "list")
+
+    def get_user_info(self, api_key):
+        """
+        获取账号信息，用作检查API Key是否有效的轻量认证请求
+
+        参数:
+            api_key (str): 硅基流动API密钥
+
+        返回:
+            requests.Response: 接口响应
+        """
+        return self._request(api_key, lambda: self.session.get(
+            f"{self.base_url}/v1/user/info",
+            headers=self._headers(api_key),
+            timeout=self.timeouts["user"]
+        ), "user")
+
+    def delete_voice(self, api_key, uri):
+        """
+        删除参考音频
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            uri (str): 音色ID
+
+        返回:
+            requests.Response: 接口响应
+        """
+        # 重复删除同一个音色没有副作用，可以安全重试
+        return self._request(api_key, lambda: self.session.post(
+            f"{self.base_url}/v1/audio/voice/deletions",
+            headers=self._headers(api_key),
+            json={"uri": uri},
+            timeout=self.timeouts["delete"]
+        ), "delete")
+
+    def synthesize_speech(self, api_key, model, text, voice, response_format="mp3"):
+        """
+        语音合成，以流式响应返回，音频边合成边接收
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            model (str): 模型名称
+            text (str): 要合成的文本
+            voice (str): 音色ID
+            response_format (str): 音频格式
+
+        返回:
+            requests.Response: 流式接口响应，调用方需要关闭
+        """
+        payload = {"model": model, "input": text, "voice": voice, "response_format": response_format, "stream": True}
+        # 合成不会改变服务端状态，可以安全重试
+        return self._request(api_key, lambda: self.session.post(
+            f"{self.base_url}/v1/audio/speech",
+            headers=self._headers(api_key),
+            json=payload,
+            timeout=self.timeouts["speech"],
+            stream=True
+        ), "speech")
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+class AsyncSiliconFlowClient:
+    """
+    基于 httpx 的异步客户端，接口与 SiliconFlowClient 相同，方法均为协程
+
+    httpx 的连接池绑定在创建它的事件循环上，请通过 get_async_client() 获取当前事件循环的实例。
+
+    参数:
+        client (SiliconFlowClient): 共享其 base_url、超时、重试策略、令牌桶和熔断器，默认使用共享客户端
+        pool_size (int): 最大连接数
+    """
+
+    def __init__(self, client=None, pool_size=DEFAULT_ASYNC_POOL_SIZE):
+        # 按需导入，只使用同步客户端时不需要安装httpx
+        import httpx
+
+        self._httpx = httpx
+        self.client = client or get_client()
+        self.http = httpx.AsyncClient(
+            trust_env=False,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    def _timeout(self, endpoint):
+        connect, read = self.client.timeouts[endpoint]
+        return self._httpx.Timeout(read, connect=connect)
+
+    async def _send(self, method, url, **kwargs):
+        """发出请求，把 httpx 的异常转换为对应的 requests 异常，使重试策略和调用方的错误处理保持一致"""
+        httpx = self._httpx
+        try:
+            return await self.http.request(method, url, **kwargs)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(str(e))
+        except httpx.ConnectError as e:
+            # 只有连接阶段的错误可以确定请求没有发出，上传失败时据此判断能否重试
+            raise ConnectFailedError(str(e))
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    async def _request(self, api_key, send, endpoint, idempotent=True):
+        """经过熔断、限流和重试发送请求，约定同 SiliconFlowClient._request，等待时不阻塞事件循环"""
+        client = self.client
+        bucket = client.get_bucket(api_key)
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = client.circuit_breaker.before_request()
+            try:
+                wait = bucket.reserve()
+                while wait > 0:
+                    await asyncio.sleep(wait)
+                    wait = bucket.reserve()
+                start = time.perf_counter()
+                try:
+                    response = await send()
+                except requests.exceptions.RequestException as e:
+                    delay = client._after_exception(e, endpoint, start, attempt, idempotent)
+                else:
+                    delay = client._after_response(bucket, response, endpoint, start, attempt, idempotent)
+                    if delay is None:
+                        return response
+            finally:
+                # 被取消（CancelledError）时同样释放试探名额
+                client.circuit_breaker.end_probe(probe)
+            await asyncio.sleep(delay)
+
+    async def upload_voice(self, api_key, audio_file, model, custom_name, text, progress_callback=None):
+        """
+        上传参考音频，参数同 SiliconFlowClient.upload_voice
+
+        返回:
+            httpx.Response: 接口响应
+        """
+        fields = {
+            "model": model,
+            "customName": custom_name,
+            "text": text
+        }
+
+        async def send():
+            with MultipartFileStream(fields, "file", audio_file, progress_callback=progress_callback) as body:
+                headers = self.client._headers(api_key)
+                headers["Content-Type"] = body.content_type
+                # 异步迭代器作为请求体时 httpx 不知道长度，需要显式设置，否则会改用分块传输编码
+                headers["Content-Length"] = str(len(body))
+                start = time.perf_counter()
+                try:
+                    return await self._send(
+                        "POST",
+                        f"{self.client.base_url}/v1/uploads/audio/voice",
+                        headers=headers,
+                        content=_aiter_chunks(body),
+                        timeout=self._timeout("upload")
+                    )
+                finally:
+                    _record_upload_phases(start, time.perf_counter(), body)
+
+        # 上传会在服务端创建音色，不是幂等请求
+        return await self._request(api_key, send, "upload", idempotent=False)
+
+    async def list_voices(self, api_key, etag=None):
+        """
+        获取参考音频列表，参数同 SiliconFlowClient.list_voices
+
+        返回:
+            httpx.Response: 接口响应
+        """
+        headers = self.client._headers(api_key)
+        if etag:
+            headers["If-None-Match"] = etag
+        return await self._request(api_key, lambda: self._send(
+            "GET",
+            f"{self.client.base_url}/v1/audio/voice/list",
+            headers=headers,
+            timeout=self._timeout("list")
+        ), "list")
+
+    async def close(self):
+        """关闭连接池"""
+        await self.http.aclose()
+
+
+async def _aiter_chunks(body):
+    """把流式请求体包装为异步迭代器，每块只有64KB，直接在事件循环中读取本地文件"""
+    for chunk in body:
+        yield chunk
+
+
+def async_backend_available():
+    """是否安装了异步客户端依赖的httpx"""
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _record_upload_phases(start, end, body):
+    """
+    按请求体被读取的时间把一次上传拆分为三段：
+    建立连接（含发送请求头）、发送请求体、等待服务端响应
+    """
+    metrics.UPLOAD_BYTES.inc(body.bytes_sent)
+    if body.first_read_at is None:
+        # 请求体一次都没有被读取，说明在连接阶段就失败了
+        metrics.observe_phase("upload", "connect", end - start)
+        return
+    metrics.observe_phase("upload", "connect", body.first_read_at - start)
+    metrics.observe_phase("upload", "send", body.last_read_at - body.first_read_at)
+    metrics.observe_phase("upload", "server_wait", end - body.last_read_at)
+
+
+def api_key_fingerprint(api_key):
+    """API Key的摘要，用于缓存和本地索引按账号区分数据，避免保存明文密钥"""
+    return hashlib.sha256(api_key.strip().encode("utf-8")).hexdigest()
+
+
+# 同一账号的多个Key（见 key_pool）共用本地数据：其余Key的摘要 -> 该账号第一个Key的摘要
+_account_aliases = {}
+
+
+def register_account_keys(api_keys):
+    """登记属于同一账号的多个API Key，之后去重索引、列表缓存和检索索引按账号共用数据（以第一个Key为准）"""
+    primary = api_key_fingerprint(api_keys[0])
+    for api_key in api_keys[1:]:
+        _account_aliases[api_key_fingerprint(api_key)] = primary
+
+
+def account_fingerprint(api_key):
+    """本地缓存和索引中区分账号的标识：登记过的同账号Key返回该账号第一个Key的摘要，否则同 api_key_fingerprint"""
+    key = api_key_fingerprint(api_key)
+    return _account_aliases.get(key, key)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """获取进程内共享的客户端实例，所有调用共用同一个连接池"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SiliconFlowClient()
+    return _client
+
+
+# 每个事件循环一个异步客户端，事件循环被回收时随之释放
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """获取当前事件循环共享的异步客户端，需在协程中调用"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncSiliconFlowClient()
+    return client
@@ -0,0 +1,131 @@
+"""
+测试公共夹具
+
+测试直接导入仓库根目录下的模块，需要访问API的用例使用 benchmarks/mock_server.py 在本机随机端口
+启动的模拟服务，需要逐个指定响应（重试、超时等）的用例使用 StubServer，都不会访问真实服务。
+每个用例使用独立的数据目录。
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import mock_server  # noqa: E402
+
+API_KEY = "sk-test-" + "0" * 32
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """每个用例使用独立的数据目录，进程内共享的索引和缓存也重新创建"""
+    import dedup_index
+    import job_queue
+    import key_check
+    import siliconflow_client
+    import tts_preview
+    import upload_staging
+    import voice_cache
+    import voice_index
+
+    directory = tmp_path / "data"
+    monkeypatch.setenv("VOICE_UPLOAD_DATA_DIR", str(directory))
+    for module, name in ((dedup_index, "_index"), (voice_index, "_index"), (tts_preview, "_cache"),
+                         (upload_staging, "_spool"), (job_queue, "_queue")):
+        monkeypatch.setattr(module, name, None)
+    monkeypatch.setattr(siliconflow_client, "_account_aliases", {})
+    voice_cache.voice_list_cache._entries.clear()
+    key_check.key_check_cache.clear()
+    return directory
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    """
+    启动模拟服务，并让 get_client() 返回指向它的新客户端
+
+    返回:
+        ThreadingHTTPServer: 模拟服务，state 属性为 MockState，可在用例中修改错误注入等配置
+    """
+    import siliconflow_client
+
+    server = mock_server.create_server(voices=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    client = siliconflow_client.SiliconFlowClient(base_url=server.base_url, rate_limit=1000)
+    monkeypatch.setattr(siliconflow_client, "_client", client)
+    yield server
+    client.close()
+    server.shutdown()
+    server.server_close()
+
+
+class StubServer:
+    """
+    按脚本依次返回响应的HTTP服务，并记录收到的请求
+
+    script 中每一项为 (状态码, 响应头, 响应体, 返回前等待的秒数)，用完后返回200和空列表。
+    requests 中每一项为 dict: method, path, headers, body, time(time.monotonic()), client(客户端地址)。
+    """
+
+    def __init__(self):
+        self.script = []
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                with stub.lock:
+                    stub.requests.append({"method": self.command, "path": self.path, "headers": dict(self.headers),
+                                          "body": body, "time": time.monotonic(), "client": self.client_address})
+                    status, headers, payload, delay = stub.script.pop(0) if stub.script else (200, {}, None, 0)
+                time.sleep(delay)
+                data = json.dumps({"result": []} if payload is None else payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except OSError:
+                    # 客户端已超时断开
+                    pass
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def respond(self, status, headers=None, payload=None, delay=0.0):
+        """追加一个脚本响应"""
+        self.script.append((status, headers or {}, payload, delay))
+
+
+@pytest.fixture
+def stub_server():
+    """按脚本返回响应的本地服务，见 StubServer"""
+    stub = StubServer()
+    thread = threading.Thread(target=stub.server.serve_forever, daemon=True)
+    thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+
+import siliconflow_client
+import upload
+import voice_api
+from conftest import API_KEY
+
+pytest.importorskip("httpx")
+
+MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+
+
+def _audio(tmp_path, count):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"{i}.wav"
+        path.write_bytes(b"RIFF" + bytes([i]) * 2000)
+        paths.append(str(path))
+    return paths
+
+
+def test_uploads_run_concurrently_on_one_event_loop(tmp_path, mock_api):
+    mock_api.state.latency = 0.3
+    paths = _audio(tmp_path, 5)
+
+    async def run():
+        start = time.monotonic()
+        outcomes = await asyncio.gather(*(
+            voice_api.upload_voice_file_async(API_KEY, path, MODEL, f"v{i}", "文本") for i, path in enumerate(paths)
+        ))
+        # 同一事件循环中的请求共用一个异步客户端
+        assert siliconflow_client.get_async_client() is siliconflow_client.get_async_client()
+        await siliconflow_client.get_async_client().close()
+        return outcomes, time.monotonic() - start
+
+    outcomes, elapsed = asyncio.run(run())
+    assert all(outcome["ok"] for outcome in outcomes), outcomes
+    assert len({outcome["uri"] for outcome in outcomes}) == 5
+    # 依次上传需要1.5秒
+    assert elapsed < 1.0
+    assert mock_api.state.uploads == 5
+
+
+def test_async_upload_reports_progress_and_skips_duplicates(tmp_path, mock_api):
+    [path] = _audio(tmp_path, 1)
+    calls = []
+
+    async def run():
+        first = await voice_api.upload_voice_file_async(API_KEY, path, MODEL, "a", "文本",
+                                                        progress_callback=lambda sent, total: calls.append((sent, total)))
+        second = await voice_api.upload_voice_file_async(API_KEY, path, MODEL, "a", "文本")
+        await siliconflow_client.get_async_client().close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["ok"] and second["duplicate"]
+    assert second["uri"] == first["uri"]
+    assert calls[-1][0] == calls[-1][1]
+    assert mock_api.state.uploads == 1
+
+
+def test_async_upload_errors_match_sync(tmp_path, mock_api):
+    [path] = _audio(tmp_path, 1)
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 400
+    outcome = asyncio.run(voice_api.upload_voice_file_async(API_KEY, path, MODEL, "a", "文本"))
+    assert outcome == voice_api.upload_voice_file(API_KEY, path, MODEL, "a", "文本")
+    assert not outcome["ok"] and not outcome["retryable"]
+
+    outcome = asyncio.run(voice_api.upload_voice_file_async(API_KEY, str(tmp_path / "missing.wav"), MODEL, "a", "文本"))
+    assert not outcome["ok"]
+
+
+def test_async_list_shares_cache_with_sync(mock_api):
+    mock_api.state.add_voice("alice", "文本", MODEL)
+    mock_api.state.add_voice("bob", "文本", MODEL)
+
+    async def run():
+        entry, error = await voice_api.fetch_voice_list_async(API_KEY)
+        table = await voice_api.query_voice_table_async(API_KEY, "alice", 1)
+        await siliconflow_client.get_async_client().close()
+        return entry, error, table
+
+    entry, error, (status, rows, page) = asyncio.run(run())
+    assert error is None and not entry["cached"]
+    assert [row[0] for row in rows] == ["alice"]
+    assert status.startswith("共 2 个音色，匹配 1 个，第 1/1 页")
+    assert voice_api.fetch_voice_list(API_KEY)[0]["cached"]
+
+
+def test_async_list_reports_rejected_key(mock_api):
+    entry, error = asyncio.run(voice_api.fetch_voice_list_async("sk-invalid-" + "0" * 32))
+    assert entry is None
+    assert "401" in error
+
+
+def test_interface_handler_formats_async_upload(tmp_path, mock_api):
+    [path] = _audio(tmp_path, 1)
+    message = asyncio.run(upload.upload_voice_async(API_KEY, path, MODEL, "a", "文本"))
+    assert message.startswith("上传成功！")
+    assert mock_api.state.voices[0]["uri"] in message
@@ -0,0 +1,112 @@
+import os
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import audio_preprocess
+import batch_upload
+import voice_api
+from conftest import API_KEY
+
+
+def _write_tone(path, seconds, rate=16000, channels=1, silence=0.0):
+    t = np.arange(int(seconds * rate)) / rate
+    pcm = (0.3 * np.sin(2 * np.pi * 220 * t) * 32767).astype("<i2")
+    padding = np.zeros(int(silence * rate), dtype="<i2")
+    pcm = np.concatenate([padding, pcm, padding])
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(np.repeat(pcm, channels).tobytes())
+
+
+def _wav_info(path):
+    with wave.open(path, "rb") as f:
+        return f.getnchannels(), f.getframerate(), f.getnframes() / f.getframerate()
+
+
+class RecordingPool(ProcessPoolExecutor):
+    """记录提交到进程池的文件"""
+
+    def __init__(self, max_workers=None):
+        super().__init__(max_workers=max_workers)
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted.append(args[0])
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_stereo_recording_is_downmixed_trimmed_and_resampled(tmp_path):
+    path = tmp_path / "stereo.wav"
+    _write_tone(path, 2, rate=48000, channels=2, silence=1.0)
+    output = audio_preprocess.preprocess_file(str(path), {"format": "wav"}, output_dir=str(tmp_path))
+    assert output != str(path)
+    channels, rate, duration = _wav_info(output)
+    assert (channels, rate) == (1, 24000)
+    # 首尾各保留0.1秒静音
+    assert duration == pytest.approx(2.2, abs=0.05)
+    assert os.path.getsize(output) < path.stat().st_size / 4
+
+
+def test_long_audio_is_rejected_not_truncated(tmp_path):
+    path = tmp_path / "long.wav"
+    _write_tone(path, 3)
+    with pytest.raises(audio_preprocess.AudioTooLongError):
+        audio_preprocess.preprocess_file(str(path), {"max_duration": 2.0, "format": "wav"})
+
+
+def test_malformed_wav_falls_back_to_original(tmp_path, mock_api):
+    path = tmp_path / "odd.wav"
+    _write_tone(path, 1.5)
+    # 文件被截断在半个样本处，数据长度不是样本大小的整数倍
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - 1)
+    with pytest.raises(ValueError):
+        audio_preprocess.preprocess_file(str(path), {"format": "wav"})
+
+    outcome = voice_api.upload_voice_file(API_KEY, str(path), "m", "odd", "文本", skip_duplicates=False,
+                                          preprocess_options={"format": "wav"}, validate=False)
+    assert outcome["ok"], outcome
+
+
+def test_process_pool_matches_in_process_result(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.wav"
+        _write_tone(path, 1 + i, rate=44100, silence=0.5)
+        paths.append(str(path))
+    with audio_preprocess.create_process_pool(max_workers=2) as pool:
+        outputs = list(pool.map(audio_preprocess.preprocess_file, paths, [{"format": "wav"}] * 3))
+    for path, output in zip(paths, outputs):
+        expected = audio_preprocess.preprocess_file(path, {"format": "wav"})
+        with open(output, "rb") as a, open(expected, "rb") as b:
+            assert a.read() == b.read()
+        os.remove(output)
+        os.remove(expected)
+
+
+def test_batch_upload_preprocesses_in_process_pool(tmp_path, mock_api, monkeypatch):
+    pools = []
+
+    def create_process_pool(max_workers=None):
+        pools.append(RecordingPool(max_workers=2))
+        return pools[-1]
+
+    monkeypatch.setattr(audio_preprocess, "create_process_pool", create_process_pool)
+    items = []
+    for i in range(3):
+        path = tmp_path / f"{i}.wav"
+        _write_tone(path, 2, rate=48000, channels=2, silence=1.0)
+        items.append(batch_upload._make_item(i, str(path), f"voice-{i}", "文本", None))
+
+    results = list(voice_api.iter_batch_upload(API_KEY, items, concurrency=3, preprocess=True))
+    assert all(result["status"] == "success" for result in results), results
+    assert sorted(pools[0].submitted) == sorted(item["file"] for item in items)
+    assert mock_api.state.uploads == 3
+    # 批量结束后进程池随之关闭
+    with pytest.raises(RuntimeError):
+        pools[0].submit(os.path.getsize, items[0]["file"])
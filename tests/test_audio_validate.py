@@ -0,0 +1,170 @@
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+import audio_validate
+import voice_api
+from conftest import API_KEY
+
+RATE = 16000
+
+
+def _wav(path, seconds=2.0, amplitude=0.3, rate=RATE, channels=1, samples=None):
+    if samples is None:
+        t = np.arange(int(seconds * rate)) / rate
+        samples = amplitude * np.sin(2 * np.pi * 220 * t)
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(np.repeat(pcm, channels).tobytes())
+    return str(path)
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def _mp3_frames(count, xing_frames=None):
+    # MPEG-1 Layer III，128kbps，44.1kHz，单声道：每帧 144*128000/44100 = 417 字节
+    header = bytes([0xFF, 0xFB, 0x90, 0xC0])
+    frame = header + b"\0" * (417 - 4)
+    frames = [frame] * count
+    if xing_frames is not None:
+        # 单声道 MPEG-1 的 side info 为17字节，Xing 头紧随其后
+        xing = b"Xing" + struct.pack(">II", 1, xing_frames)
+        first = header + b"\0" * 17 + xing
+        frames[0] = first + b"\0" * (417 - len(first))
+    return b"".join(frames)
+
+
+def _flac(rate=44100, channels=2, bits=16, total=88200):
+    packed = (rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | total
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\0" * 6 + struct.pack(">Q", packed) + b"\0" * 16
+    return b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+
+def _ogg_page(packet, granule=0):
+    return b"OggS" + bytes([0, 2]) + struct.pack("<q", granule) + b"\0" * 12 + bytes([1, len(packet)]) + packet
+
+
+def _vorbis(rate=44100, channels=2, samples=132300):
+    head = b"\x01vorbis" + struct.pack("<I", 0) + bytes([channels]) + struct.pack("<I", rate) + b"\0" * 16
+    return _ogg_page(head) + _ogg_page(b"\0" * 10, granule=samples)
+
+
+def _opus(channels=1, pre_skip=312, seconds=2.5):
+    head = b"OpusHead" + bytes([1, channels]) + struct.pack("<HI", pre_skip, 48000) + b"\0" * 3
+    return _ogg_page(head) + _ogg_page(b"\0" * 10, granule=int(seconds * 48000) + pre_skip)
+
+
+def _box(box_type, body):
+    return struct.pack(">I", 8 + len(body)) + box_type + body
+
+
+def _mp4(timescale=1000, duration=4500):
+    mvhd = _box(b"mvhd", b"\0" * 12 + struct.pack(">II", timescale, duration) + b"\0" * 80)
+    return _box(b"ftyp", b"M4A \0\0\0\0") + _box(b"moov", mvhd) + _box(b"mdat", b"\0" * 64)
+
+
+def _adts(channels=2):
+    # 44.1kHz（采样率索引4），AAC LC
+    return bytes([0xFF, 0xF1, (1 << 6) | (4 << 2) | (channels >> 2), (channels & 0x03) << 6, 0, 0, 0]) + b"\0" * 64
+
+
+def test_wav(tmp_path):
+    report = audio_validate.validate_audio(_wav(tmp_path / "a.wav", seconds=2.0, channels=2))
+    assert report["ok"], report
+    info = report["info"]
+    assert (info["format"], info["codec"], info["sample_rate"], info["channels"]) == ("wav", "pcm", RATE, 2)
+    assert info["duration"] == pytest.approx(2.0)
+    assert info["clipping_ratio"] == 0.0
+    assert info["silence_ratio"] < 0.1
+
+
+def test_cbr_and_vbr_mp3(tmp_path):
+    info = audio_validate.validate_audio(_write(tmp_path / "cbr.mp3", _mp3_frames(100)))["info"]
+    assert (info["format"], info["sample_rate"], info["channels"]) == ("mp3", 44100, 1)
+    assert info["duration"] == pytest.approx(100 * 417 * 8 / 128000)
+
+    id3 = b"ID3\x04\0\0" + bytes([0, 0, 0, 20]) + b"\0" * 20
+    info = audio_validate.validate_audio(_write(tmp_path / "vbr.mp3", id3 + _mp3_frames(10, xing_frames=200)))["info"]
+    assert info["duration"] == pytest.approx(200 * 1152 / 44100)
+
+
+def test_flac(tmp_path):
+    info = audio_validate.validate_audio(_write(tmp_path / "a.flac", _flac()))["info"]
+    assert (info["format"], info["sample_rate"], info["channels"]) == ("flac", 44100, 2)
+    assert info["duration"] == pytest.approx(2.0)
+
+
+def test_ogg_vorbis_and_opus(tmp_path):
+    info = audio_validate.validate_audio(_write(tmp_path / "a.ogg", _vorbis()))["info"]
+    assert (info["codec"], info["sample_rate"], info["channels"]) == ("vorbis", 44100, 2)
+    assert info["duration"] == pytest.approx(3.0)
+
+    info = audio_validate.validate_audio(_write(tmp_path / "a.opus", _opus()))["info"]
+    assert (info["codec"], info["channels"]) == ("opus", 1)
+    assert info["duration"] == pytest.approx(2.5)
+
+
+def test_mp4_and_adts(tmp_path):
+    info = audio_validate.validate_audio(_write(tmp_path / "a.m4a", _mp4()))["info"]
+    assert (info["format"], info["duration"]) == ("mp4", pytest.approx(4.5))
+
+    info = audio_validate.validate_audio(_write(tmp_path / "a.aac", _adts()))["info"]
+    assert (info["format"], info["sample_rate"], info["channels"]) == ("aac", 44100, 2)
+
+
+@pytest.mark.parametrize("name, data, error", [
+    ("empty.wav", b"", "文件为空"),
+    ("short-riff.wav", b"RIFF\0\0\0\0WAV", "WAV文件头损坏"),
+    ("truncated-fmt.wav", b"RIFF\0\0\0\0WAVEfmt " + struct.pack("<I", 16) + b"\x01\0\x01\0", "WAV fmt 块不完整"),
+    ("no-data.wav", b"RIFF\0\0\0\0WAVEfmt " + struct.pack("<I16s", 16, struct.pack("<HHIIHH", 1, 1, RATE, 0, 2, 16)),
+     "WAV缺少 data 块"),
+    ("data-before-fmt.wav", b"RIFF\0\0\0\0WAVEdata" + struct.pack("<I", 4) + b"\0" * 4, "WAV缺少 fmt 块"),
+    ("single-frame.mp3", _mp3_frames(1)[:417], "未找到有效的MP3帧"),
+    ("truncated.flac", _flac()[:20], "FLAC文件头损坏"),
+    ("zero-rate.flac", _flac(rate=0), "FLAC采样率无效"),
+    ("unknown-stream.ogg", _ogg_page(b"\x01unknown" + b"\0" * 20), "OGG中没有可识别的音频流"),
+    ("bad-box.m4a", b"\0\0\0\x10ftypM4A \0\0\0\0" + struct.pack(">I", 4) + b"moov", "MP4 box 长度无效"),
+])
+def test_malformed_headers_are_rejected(tmp_path, name, data, error):
+    report = audio_validate.validate_audio(_write(tmp_path / name, data))
+    assert report == {"ok": False, "errors": [error], "info": {}}
+
+
+def test_unknown_format_is_not_checked(tmp_path):
+    # webm（EBML头）等识别不了的格式交给服务端判断
+    report = audio_validate.validate_audio(_write(tmp_path / "a.webm", b"\x1a\x45\xdf\xa3" + b"\0" * 64))
+    assert report == {"ok": True, "errors": [], "info": {"format": None}}
+
+
+def test_rules(tmp_path):
+    assert "时长过短" in audio_validate.validate_audio(_wav(tmp_path / "short.wav", seconds=0.5))["errors"][0]
+    report = audio_validate.validate_audio(_wav(tmp_path / "long.wav", seconds=3.0), {"max_duration": 2.0})
+    assert "时长过长" in report["errors"][0]
+    report = audio_validate.validate_audio(_wav(tmp_path / "silent.wav", samples=np.zeros(RATE * 2)))
+    assert any("静音过多" in error for error in report["errors"])
+    square = np.sign(np.sin(2 * np.pi * 220 * np.arange(RATE * 2) / RATE))
+    report = audio_validate.validate_audio(_wav(tmp_path / "clipped.wav", samples=square))
+    assert any("削波严重" in error for error in report["errors"])
+
+
+def test_upload_validates_preprocessed_audio(tmp_path, mock_api):
+    # 2秒语音后跟65秒静音：原文件超长且几乎全是静音，去除首尾静音后符合要求
+    t = np.arange(RATE * 2) / RATE
+    samples = np.concatenate([0.3 * np.sin(2 * np.pi * 220 * t), np.zeros(RATE * 65)])
+    path = _wav(tmp_path / "padded.wav", samples=samples)
+    assert not audio_validate.validate_audio(path)["ok"]
+
+    outcome = voice_api.upload_voice_file(API_KEY, path, "m", "padded", "文本", skip_duplicates=False,
+                                          preprocess_options={"format": "wav"}, validate=True)
+    assert outcome["ok"], outcome
+    outcome = voice_api.upload_voice_file(API_KEY, path, "m", "padded", "文本", skip_duplicates=False, validate=True)
+    assert not outcome["ok"]
+    assert mock_api.state.uploads == 1
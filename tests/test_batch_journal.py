@@ -0,0 +1,113 @@
+import json
+import wave
+
+import batch_journal
+import batch_upload
+import cli
+from conftest import API_KEY
+
+MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+
+
+def _item(index, name="a", text="文本"):
+    return batch_upload._make_item(index, f"/audio/{name}.wav", name, text, MODEL)
+
+
+def _result(item, status, uri=None):
+    return dict(item, status=status, uri=uri, error=None if status == "success" else "失败")
+
+
+def _wav(path, tone):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(bytes([tone, 1]) * 16000 * 2)
+
+
+def test_resume_skips_only_successful_items(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    items = [_item(0, "a"), _item(1, "b"), _item(2, "c")]
+    with batch_journal.BatchJournal(path) as journal:
+        journal.record(_result(items[0], "success", "speech:a:1"))
+        journal.record(_result(items[1], "failed"))
+        # 同一条目以最后一条记录为准
+        journal.record(_result(items[2], "success", "speech:c:1"))
+        journal.record(_result(items[2], "failed"))
+
+    with batch_journal.BatchJournal(path, resume=True) as journal:
+        pending, done = journal.split(items)
+    assert pending == items[1:]
+    assert [(item, record["uri"]) for item, record in done] == [(items[0], "speech:a:1")]
+
+
+def test_incomplete_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    items = [_item(0, "a"), _item(1, "b")]
+    with batch_journal.BatchJournal(str(path)) as journal:
+        journal.record(_result(items[0], "success", "speech:a:1"))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "' + batch_journal.item_key(items[1]))
+
+    with batch_journal.BatchJournal(str(path), resume=True) as journal:
+        pending, done = journal.split(items)
+        assert pending == [items[1]]
+        journal.record(_result(items[1], "success", "speech:b:1"))
+    # 中断处之后追加的记录仍然有效
+    with batch_journal.BatchJournal(str(path), resume=True) as journal:
+        pending, done = journal.split(items)
+    assert pending == []
+    assert [record["uri"] for _, record in done] == ["speech:a:1", "speech:b:1"]
+
+
+def test_without_resume_the_journal_starts_over(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    item = _item(0)
+    with batch_journal.BatchJournal(path) as journal:
+        journal.record(_result(item, "success", "speech:a:1"))
+    with batch_journal.BatchJournal(path) as journal:
+        assert journal.split([item]) == ([item], [])
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == ""
+
+
+def test_item_key_covers_text_and_model():
+    assert batch_journal.item_key(_item(0)) == batch_journal.item_key(_item(5))
+    assert batch_journal.item_key(_item(0)) != batch_journal.item_key(_item(0, text="其他文本"))
+    assert batch_journal.item_key(_item(0)) != batch_journal.item_key(dict(_item(0), model="other"))
+
+
+def test_default_journal_path(tmp_path):
+    assert batch_journal.default_journal_path(manifest=str(tmp_path / "v.csv")) == str(tmp_path / "v.csv.journal.jsonl")
+    assert batch_journal.default_journal_path(directory=str(tmp_path)) == str(
+        tmp_path / batch_journal.DIRECTORY_JOURNAL_NAME)
+
+
+def test_cli_resume_uploads_only_unfinished_items(tmp_path, mock_api, capsys):
+    manifest = tmp_path / "voices.jsonl"
+    entries = []
+    for i in range(3):
+        entries.append({"file": str(tmp_path / f"{i}.wav"), "customName": f"v{i}", "text": "测试文本", "model": MODEL})
+        if i != 2:
+            _wav(tmp_path / f"{i}.wav", i)
+    manifest.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+
+    # 第三个文件缺失，未通过检查
+    assert cli.main(["--api-key", API_KEY, "batch", "--manifest", str(manifest), "--json"]) == 1
+    assert mock_api.state.uploads == 2
+    capsys.readouterr()
+
+    _wav(tmp_path / "2.wav", 2)
+    assert cli.main(["--api-key", API_KEY, "batch", "--manifest", str(manifest), "--resume", "--json"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary["succeeded"], summary["failed"], summary["resumed"]) == (3, 0, 2)
+    assert mock_api.state.uploads == 3
+    assert sorted(voice["customName"] for voice in mock_api.state.voices) == ["v0", "v1", "v2"]
+
+    with open(str(manifest) + ".journal.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    # 第二次运行只追加了重新上传的条目
+    assert sorted((record["customName"], record["status"]) for record in records[:3]) == [
+        ("v0", "success"), ("v1", "success"), ("v2", "failed")
+    ]
+    assert [(record["customName"], record["status"]) for record in records[3:]] == [("v2", "success")]
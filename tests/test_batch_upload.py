@@ -0,0 +1,42 @@
+import time
+
+import batch_upload
+
+
+def _items(count):
+    return [batch_upload._make_item(i, f"{i}.wav", f"voice-{i}", "文本", None) for i in range(count)]
+
+
+def test_backoff_does_not_hold_worker():
+    calls = []
+
+    def worker(item):
+        calls.append((item["index"], time.monotonic()))
+        if item["index"] == 0 and len([c for c in calls if c[0] == 0]) == 1:
+            return {"ok": False, "error": "限流", "retryable": True}
+        return {"ok": True, "uri": f"uri-{item['index']}"}
+
+    start = time.monotonic()
+    results = list(batch_upload.iter_batch(_items(3), worker, concurrency=1, max_retries=1, retry_delay=0.3))
+    # 退避期间唯一的线程继续执行其余条目，重试的条目最后完成
+    assert sorted(r["index"] for r in results[:2]) == [1, 2]
+    assert results[-1]["index"] == 0
+    assert all(r["status"] == "success" for r in results)
+    assert results[-1]["attempts"] == 2
+    assert calls[1][1] - start < 0.2
+    assert calls[-1][1] - start >= 0.3
+
+
+def test_non_retryable_failure_is_final():
+    results = list(batch_upload.iter_batch(
+        _items(2), lambda item: {"ok": False, "error": "400", "retryable": False}, concurrency=2, retry_delay=0))
+    assert sorted(r["attempts"] for r in results) == [1, 1]
+    assert all(r["status"] == "failed" for r in results)
+
+
+def test_progress_omits_attempts_for_items_never_sent():
+    item = _items(1)[0]
+    rejected = batch_upload.make_result(item, {"ok": False, "error": "音频检查未通过"}, 0, 0.0)
+    assert batch_upload.format_progress(rejected, 1, 2) == "[1/2] ✗ voice-0: 音频检查未通过"
+    failed = batch_upload.make_result(item, {"ok": False, "error": "500"}, 3, 1.0)
+    assert batch_upload.format_progress(failed, 2, 2) == "[2/2] ✗ voice-0: 500 (尝试3次)"
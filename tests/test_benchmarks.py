@@ -0,0 +1,126 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+
+import pytest
+import requests
+
+import metrics
+import mock_server
+import upload_bench
+from conftest import API_KEY, ROOT
+
+
+def _args(**options):
+    return argparse.Namespace(**dict({"count": 3, "size": 0.01, "concurrency": 2}, **options))
+
+
+def test_percentile_uses_nearest_rank():
+    samples = list(range(1, 101))
+    assert upload_bench.percentile(samples, 0.5) == 50
+    assert upload_bench.percentile(samples, 0.99) == 99
+    assert upload_bench.percentile([3.0], 0.99) == 3.0
+    assert upload_bench.percentile([], 0.5) == 0.0
+
+
+def test_mock_server_upload_list_and_delete(mock_api, tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    url = mock_api.base_url
+    headers = {"Authorization": f"Bearer {API_KEY}"}
+    with open(audio, "rb") as f:
+        response = requests.post(url + "/v1/uploads/audio/voice", headers=headers, timeout=5,
+                                 data={"model": "m", "customName": "名称", "text": "文本"}, files={"file": f})
+    uri = response.json()["uri"]
+
+    response = requests.get(url + "/v1/audio/voice/list", headers=headers, timeout=5)
+    assert response.json() == {"result": [{"model": "m", "customName": "名称", "text": "文本", "uri": uri}]}
+    etag = response.headers["ETag"]
+    response = requests.get(url + "/v1/audio/voice/list", headers=dict(headers, **{"If-None-Match": etag}), timeout=5)
+    assert response.status_code == 304
+
+    assert requests.post(url + "/v1/audio/voice/deletions", headers=headers, json={"uri": uri}, timeout=5).ok
+    assert requests.post(url + "/v1/audio/voice/deletions", headers=headers, json={"uri": uri},
+                         timeout=5).status_code == 400
+    assert mock_api.state.voices == []
+    assert requests.get(url + "/v1/audio/voice/list", timeout=5).status_code == 401
+    assert requests.get(url + "/v1/unknown", headers=headers, timeout=5).status_code == 404
+
+
+def test_mock_server_speech_is_chunked_wav(mock_api):
+    response = requests.post(mock_api.base_url + "/v1/audio/speech", headers={"Authorization": f"Bearer {API_KEY}"},
+                             json={"input": "你好", "voice": "speech:a:1"}, timeout=5)
+    assert response.headers["Transfer-Encoding"] == "chunked"
+    with wave.open(io.BytesIO(response.content)) as f:
+        assert f.getnframes() / f.getframerate() == pytest.approx(0.4)
+    assert mock_api.state.syntheses == 1
+
+
+def test_mock_server_error_injection_and_bandwidth(mock_api):
+    url = mock_api.base_url + "/v1/uploads/audio/voice"
+    headers = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "multipart/form-data; boundary=x"}
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 429
+    response = requests.post(url, headers=headers, data=b"--x--", timeout=5)
+    assert (response.status_code, response.headers["Retry-After"]) == (429, "1")
+
+    # 1MB 请求体以 5MB/秒 接收约需0.2秒
+    mock_api.state.error_rate = 0.0
+    mock_api.state.bandwidth = 5
+    start = time.monotonic()
+    assert requests.post(url, headers=headers, data=b"\0" * (1024 * 1024), timeout=5).ok
+    assert time.monotonic() - start >= 0.18
+
+
+@pytest.mark.parametrize("mode", ["sequential", "threaded", "async"])
+def test_upload_scenarios(mock_api, mode):
+    if mode == "async":
+        pytest.importorskip("httpx")
+    row = upload_bench.run_upload(_args(mode=mode))
+    assert (row["scenario"], row["mode"], row["count"], row["failed"]) == ("upload", mode, 3, 0)
+    assert row["concurrency"] == (1 if mode == "sequential" else 2)
+    assert 0 < row["p50"] <= row["p99"] <= row["elapsed"]
+    # 每个测试文件内容不同，都会实际上传
+    assert mock_api.state.uploads == 3
+
+
+def test_failed_uploads_are_counted(mock_api):
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 400
+    row = upload_bench.run_upload(_args(mode="threaded"))
+    assert row["failed"] == 3
+
+
+def test_list_scenario_fetches_every_time(mock_api):
+    mock_api.state.add_voice("a", "文本", "m")
+    fetched = metrics.VOICE_LIST_LOOKUPS.value(source="fetched")
+    row = upload_bench.run_list(_args(count=4))
+    assert (row["scenario"], row["count"], row["failed"]) == ("list", 4, 0)
+    assert metrics.VOICE_LIST_LOOKUPS.value(source="fetched") == fetched + 4
+
+
+def test_benchmark_command_runs_each_scenario_in_a_subprocess():
+    command = [sys.executable, os.path.join(ROOT, "benchmarks", "upload_bench.py"), "--modes", "sequential,threaded",
+               "--concurrency", "1,2", "--sizes", "0.01", "--count", "2", "--voices", "5", "--latency", "0", "--json"]
+    result = subprocess.run(command, cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True, timeout=60, check=True)
+    rows = json.loads(result.stdout)
+    assert [(row["scenario"], row["mode"], row["concurrency"]) for row in rows] == [
+        ("upload", "sequential", 1), ("upload", "threaded", 1), ("upload", "threaded", 2),
+        ("list", "threaded", 1), ("list", "threaded", 2),
+    ]
+    assert all(row["failed"] == 0 for row in rows)
+    assert all(isinstance(row["peak_rss_mb"], float) for row in rows)
+
+
+def test_create_server_is_not_started():
+    server = mock_server.create_server(voices=3, latency=0.5)
+    try:
+        assert len(server.state.voices) == 3
+        assert server.state.latency == 0.5
+    finally:
+        server.server_close()
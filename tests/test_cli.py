@@ -0,0 +1,27 @@
+import pytest
+
+import cli
+from conftest import API_KEY
+
+
+@pytest.mark.parametrize("command", [
+    ["batch", "--manifest"],
+    ["sync", "--manifest"],
+    ["check-text", "--manifest"],
+    ["delete", "--yes", "--manifest"],
+])
+def test_unreadable_manifest_is_reported_without_traceback(tmp_path, capsys, command):
+    missing = str(tmp_path / "missing.csv")
+    assert cli.main(["--api-key", API_KEY] + command + [missing]) == 2
+    err = capsys.readouterr().err.strip().splitlines()
+    assert len(err) == 1 and err[0].startswith("错误：无法读取清单")
+
+    broken = tmp_path / "broken.jsonl"
+    broken.write_text('{"file": "a.wav"\n', encoding="utf-8")
+    assert cli.main(["--api-key", API_KEY] + command + [str(broken)]) == 2
+    assert "不是合法的JSON" in capsys.readouterr().err
+
+
+def test_missing_directory_is_reported(tmp_path, capsys):
+    assert cli.main(["--api-key", API_KEY, "batch", "--dir", str(tmp_path / "missing")]) == 2
+    assert capsys.readouterr().err.startswith("错误：无法读取目录")
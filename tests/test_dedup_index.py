@@ -0,0 +1,91 @@
+import hashlib
+import time
+
+import dedup_index
+import voice_api
+from conftest import API_KEY
+
+MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+OTHER_KEY = "sk-other-" + "1" * 32
+
+
+def _audio(tmp_path, name="a.wav", content=b"RIFF" + b"\1" * 3000):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_hash_file_is_streamed_sha256(tmp_path):
+    content = bytes(range(256)) * 5000
+    path = _audio(tmp_path, content=content)
+    assert dedup_index.hash_file(path, chunk_size=1000) == hashlib.sha256(content).hexdigest()
+    assert dedup_index.hash_file(path) == hashlib.sha256(content).hexdigest()
+
+
+def test_lookup_is_keyed_by_account_model_and_text(tmp_path):
+    index = dedup_index.DedupIndex(str(tmp_path / "index.sqlite3"))
+    index.record(API_KEY, "h1", MODEL, "文本", "a", "speech:a:1")
+    assert index.lookup(API_KEY, "h1", MODEL, "文本") == "speech:a:1"
+    assert index.lookup(API_KEY, "h1", MODEL, "其他文本") is None
+    assert index.lookup(API_KEY, "h1", "other-model", "文本") is None
+    assert index.lookup(API_KEY, "h2", MODEL, "文本") is None
+    assert index.lookup(OTHER_KEY, "h1", MODEL, "文本") is None
+    index.close()
+
+    # 索引保存在本地数据库中，重新打开后仍然有效
+    index = dedup_index.DedupIndex(str(tmp_path / "index.sqlite3"))
+    assert index.lookup(API_KEY, "h1", MODEL, "文本") == "speech:a:1"
+    assert index.forget(API_KEY, ["speech:a:1"]) == 1
+    assert index.lookup(API_KEY, "h1", MODEL, "文本") is None
+
+
+def test_reconcile_keeps_entries_newer_than_the_list(tmp_path):
+    index = dedup_index.DedupIndex(str(tmp_path / "index.sqlite3"))
+    index.record(API_KEY, "h1", MODEL, "文本", "a", "speech:a:1")
+    index.record(API_KEY, "h2", MODEL, "文本", "b", "speech:b:1")
+    listed_at = time.time()
+    index.record(API_KEY, "h3", MODEL, "文本", "c", "speech:c:1")
+
+    # b 已在服务端删除；c 在获取列表之后才上传，不在列表中
+    assert index.reconcile(API_KEY, [{"uri": "speech:a:1"}], listed_at) == 1
+    assert index.lookup(API_KEY, "h1", MODEL, "文本") == "speech:a:1"
+    assert index.lookup(API_KEY, "h2", MODEL, "文本") is None
+    assert index.lookup(API_KEY, "h3", MODEL, "文本") == "speech:c:1"
+
+
+def test_rebuild_from_local_files(tmp_path):
+    index = dedup_index.DedupIndex(str(tmp_path / "index.sqlite3"))
+    path = _audio(tmp_path)
+    voices = [{"customName": "a", "model": MODEL, "text": "文本", "uri": "speech:a:1"}]
+    items = [{"file": path, "customName": "a", "model": MODEL, "text": "文本"},
+             {"file": str(tmp_path / "missing.wav"), "customName": "a", "model": MODEL, "text": "文本"},
+             {"file": path, "customName": "b", "model": MODEL, "text": "文本"}]
+    assert index.rebuild(API_KEY, voices, items) == 1
+    assert index.lookup(API_KEY, dedup_index.hash_file(path), MODEL, "文本") == "speech:a:1"
+
+
+def test_repeated_upload_is_skipped(tmp_path, mock_api):
+    path = _audio(tmp_path)
+    first = voice_api.upload_voice_file(API_KEY, path, MODEL, "a", "文本")
+    assert first["ok"] and not first.get("duplicate")
+
+    # 相同内容的另一个文件也命中索引，不发出请求
+    copy = _audio(tmp_path, "copy.wav")
+    second = voice_api.upload_voice_file(API_KEY, copy, MODEL, "a", "文本")
+    assert second["duplicate"]
+    assert second["uri"] == first["uri"]
+    assert mock_api.state.uploads == 1
+
+    assert not voice_api.upload_voice_file(API_KEY, path, MODEL, "a", "另一段文本").get("duplicate")
+    assert not voice_api.upload_voice_file(API_KEY, path, MODEL, "a", "文本", skip_duplicates=False).get("duplicate")
+    assert mock_api.state.uploads == 3
+
+
+def test_deleted_voice_is_uploaded_again(tmp_path, mock_api):
+    path = _audio(tmp_path)
+    uri = voice_api.upload_voice_file(API_KEY, path, MODEL, "a", "文本")["uri"]
+    assert voice_api.delete_voice(API_KEY, uri)["ok"]
+    outcome = voice_api.upload_voice_file(API_KEY, path, MODEL, "a", "文本")
+    assert not outcome.get("duplicate")
+    assert outcome["uri"] != uri
+    assert mock_api.state.uploads == 2
@@ -0,0 +1,115 @@
+import os
+import stat
+
+import pytest
+
+import desktop
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="假的npm是shell脚本")
+
+
+@pytest.fixture
+def fake_npm(tmp_path):
+    """记录每次调用的假npm，install 时创建依赖目录"""
+    log = tmp_path / "npm.log"
+    path = tmp_path / "bin" / "npm"
+    path.parent.mkdir()
+    path.write_text(f'#!/bin/sh\necho "$@" >> "{log}"\nmkdir -p node_modules/.bin\n', encoding="utf-8")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return path
+
+
+def _calls(fake_npm):
+    log = fake_npm.parent.parent / "npm.log"
+    return log.read_text(encoding="utf-8").split() if log.exists() else []
+
+
+def test_cached_npm_path_skips_lookup(fake_npm, monkeypatch):
+    cache = {"npm": str(fake_npm)}
+
+    def which(name):
+        raise AssertionError("缓存的路径仍存在时不应再查找")
+
+    monkeypatch.setattr(desktop.shutil, "which", which)
+    assert desktop.find_npm(cache) == str(fake_npm)
+
+
+def test_stale_npm_path_is_looked_up_again(fake_npm, tmp_path, monkeypatch):
+    monkeypatch.setattr(desktop.shutil, "which", lambda name: str(fake_npm))
+    cache = {"npm": str(tmp_path / "removed" / "npm")}
+    assert desktop.find_npm(cache) == str(fake_npm)
+    assert cache["npm"] == str(fake_npm)
+
+    monkeypatch.setattr(desktop.shutil, "which", lambda name: None)
+    cache = {"npm": str(tmp_path / "removed" / "npm")}
+    assert desktop.find_npm(cache) is None
+    assert "npm" not in cache
+
+
+def test_electron_files_are_rewritten_only_when_changed(tmp_path):
+    electron_dir = tmp_path / "electron_app"
+    assert desktop.create_electron_files(electron_dir) == (electron_dir, True)
+    mtime = (electron_dir / "main.js").stat().st_mtime_ns
+    assert desktop.create_electron_files(electron_dir) == (electron_dir, False)
+    assert (electron_dir / "main.js").stat().st_mtime_ns == mtime
+
+    (electron_dir / "main.js").unlink()
+    assert desktop.create_electron_files(electron_dir)[1]
+    assert (electron_dir / "main.js").read_text(encoding="utf-8") == desktop.MAIN_JS
+
+    # 升级后生成的内容不同
+    (electron_dir / desktop.GENERATED_STAMP).write_text("old", encoding="utf-8")
+    assert desktop.create_electron_files(electron_dir)[1]
+
+
+def test_install_runs_once_per_package_json(tmp_path, fake_npm):
+    electron_dir, _ = desktop.create_electron_files(tmp_path / "electron_app")
+    assert desktop.install_dependencies(str(fake_npm), electron_dir)
+    assert not desktop.install_dependencies(str(fake_npm), electron_dir)
+    assert _calls(fake_npm) == ["install"]
+
+    (electron_dir / "package.json").write_text('{"name": "changed"}', encoding="utf-8")
+    assert desktop.install_dependencies(str(fake_npm), electron_dir)
+    assert _calls(fake_npm) == ["install", "install"]
+
+
+def test_local_electron_binary_is_preferred(tmp_path):
+    electron_dir = tmp_path / "electron_app"
+    assert desktop.electron_command("npm", electron_dir) == ["npm", "start"]
+    binary = electron_dir / "node_modules" / ".bin" / "electron"
+    binary.parent.mkdir(parents=True)
+    binary.touch()
+    assert desktop.electron_command("npm", electron_dir) == [str(binary.resolve()), "."]
+
+
+def test_second_launch_is_warm(tmp_path, fake_npm, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(desktop.shutil, "which", lambda name: str(fake_npm))
+    launches = []
+    monkeypatch.setattr(desktop, "launch_electron_app", lambda *args: launches.append(args) or "shell")
+
+    cache = desktop.load_cache()
+    assert cache == {}
+    timings = {}
+    assert desktop.prepare_shell(cache, timings) == ("shell", False)
+    assert set(timings) == {"find_npm", "generate", "install"}
+    desktop.save_cache(cache)
+
+    cache = desktop.load_cache()
+    assert cache == {"npm": str(fake_npm)}
+    assert desktop.prepare_shell(cache, {}) == ("shell", True)
+    assert _calls(fake_npm) == ["install"]
+    assert len(launches) == 2
+
+
+def test_missing_npm_falls_back_to_browser(monkeypatch):
+    monkeypatch.setattr(desktop.shutil, "which", lambda name: None)
+    assert desktop.prepare_shell({}, {}) == (None, False)
+
+
+def test_corrupt_cache_is_ignored(data_dir):
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (data_dir / "launcher.json").write_text("[1, 2", encoding="utf-8")
+    assert desktop.load_cache() == {}
+    desktop.save_cache({"npm": "/usr/bin/npm"})
+    assert desktop.load_cache() == {"npm": "/usr/bin/npm"}
@@ -0,0 +1,67 @@
+import time
+import wave
+
+import job_queue
+from conftest import API_KEY
+
+
+def _wav(path):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\0\1" * 16000 * 2)
+    return str(path)
+
+
+def _running(queue, job_id, owner, heartbeat):
+    with queue._connect() as conn:
+        conn.execute("UPDATE jobs SET status=?, owner=?, heartbeat=? WHERE id=?",
+                     (job_queue.RUNNING, owner, heartbeat, job_id))
+
+
+def test_recover_skips_jobs_of_live_processes(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"))
+    live = queue.submit(API_KEY, _wav(tmp_path / "a.wav"), "a", "文本", "m")
+    dead = queue.submit(API_KEY, _wav(tmp_path / "b.wav"), "b", "文本", "m")
+    _running(queue, live, "other-host:1", time.time())
+    _running(queue, dead, "other-host:2", time.time() - job_queue.STALE_AFTER - 1)
+
+    assert queue.recover() == 1
+    assert queue.get(live)["status"] == job_queue.RUNNING
+    assert queue.get(dead)["status"] == job_queue.QUEUED
+
+
+def test_recover_known_dead_owner_immediately(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(API_KEY, _wav(tmp_path / "a.wav"), "a", "文本", "m")
+    _running(queue, job_id, job_queue.process_owner(4242), time.time())
+
+    assert queue.recover(owner=job_queue.process_owner(4243)) == 0
+    assert queue.recover(owner=job_queue.process_owner(4242)) == 1
+    assert queue.get(job_id)["status"] == job_queue.QUEUED
+
+
+def test_heartbeat_keeps_own_jobs_fresh(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"))
+    job_id = queue.submit(API_KEY, _wav(tmp_path / "a.wav"), "a", "文本", "m")
+    _running(queue, job_id, job_queue.process_owner(), 0)
+
+    assert queue.heartbeat() == 1
+    assert queue.recover() == 0
+
+
+def test_claimed_job_runs_to_completion(tmp_path, mock_api):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1)
+    job_id = queue.submit(API_KEY, _wav(tmp_path / "a.wav"), "a", "文本", "m")
+    queue.start()
+    try:
+        deadline = time.monotonic() + 10
+        while queue.get(job_id)["status"] != job_queue.SUCCEEDED and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        queue.stop()
+    job = queue.get(job_id)
+    assert job["status"] == job_queue.SUCCEEDED
+    assert job["owner"] == job_queue.process_owner()
+    assert mock_api.state.uploads == 1
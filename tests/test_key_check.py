@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+import key_check
+import siliconflow_client
+import voice_api
+from conftest import API_KEY
+from retry_policy import RetryPolicy
+
+OTHER_KEY = "sk-other-" + "1" * 32
+
+
+@pytest.fixture
+def stub_client(stub_server, monkeypatch):
+    client = siliconflow_client.SiliconFlowClient(base_url=stub_server.base_url, rate_limit=1000,
+                                                  retry_policy=RetryPolicy(max_attempts=1))
+    monkeypatch.setattr(siliconflow_client, "_client", client)
+    yield client
+    client.close()
+
+
+def test_valid_result_is_cached(stub_server, stub_client):
+    cache = key_check.KeyCheckCache()
+    assert cache.check(API_KEY)["valid"]
+    assert cache.check(API_KEY)["valid"]
+    assert [request["path"] for request in stub_server.requests] == ["/v1/user/info"]
+    assert cache.check(API_KEY, force=True)["valid"]
+    assert len(stub_server.requests) == 2
+    # 只保存摘要，不保存Key的明文
+    assert API_KEY not in repr(cache._entries)
+
+
+def test_concurrent_checks_share_one_request(stub_server, stub_client):
+    cache = key_check.KeyCheckCache()
+    stub_server.respond(200, delay=0.3)
+    barrier = threading.Barrier(8)
+    verdicts = []
+
+    def check():
+        barrier.wait()
+        verdicts.append(cache.check(API_KEY))
+
+    threads = [threading.Thread(target=check) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(stub_server.requests) == 1
+    assert [verdict["valid"] for verdict in verdicts] == [True] * 8
+
+
+def test_invalid_result_expires_sooner(stub_server, stub_client):
+    cache = key_check.KeyCheckCache(valid_ttl=60, invalid_ttl=30)
+    stub_server.respond(401)
+    verdict = cache.check(API_KEY)
+    assert (verdict["valid"], verdict["status_code"]) == (False, 401)
+    assert cache.check(API_KEY)["valid"] is False
+    cache.invalid_ttl = 0
+    assert cache.lookup(API_KEY) is None
+    # Key恢复后再次检查
+    assert cache.check(API_KEY)["valid"]
+    assert cache.check(API_KEY)["valid"]
+    assert len(stub_server.requests) == 2
+
+
+def test_unrelated_status_is_not_cached(stub_server, stub_client):
+    cache = key_check.KeyCheckCache()
+    stub_server.respond(503)
+    assert cache.check(API_KEY) == {"valid": None, "status_code": 503, "error": "状态码 503"}
+    assert cache.lookup(API_KEY) is None
+    assert cache.check(API_KEY)["valid"]
+    assert len(stub_server.requests) == 2
+
+
+def test_least_recently_used_key_is_evicted():
+    cache = key_check.KeyCheckCache(max_entries=2)
+    third_key = "sk-third-" + "2" * 32
+    cache.record(API_KEY, 200)
+    cache.record(OTHER_KEY, 200)
+    cache.lookup(API_KEY)
+    cache.record(third_key, 401)
+    assert cache.lookup(OTHER_KEY) is None
+    assert cache.lookup(API_KEY)["valid"]
+    assert cache.lookup(third_key)["valid"] is False
+
+
+def test_rejected_key_fails_fast(stub_server, stub_client, tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    stub_server.respond(401)
+    assert not voice_api.upload_voice_file(API_KEY, str(audio), "m", "a", "文本")["ok"]
+    outcome = voice_api.upload_voice_file(API_KEY, str(audio), "m", "a", "文本")
+    assert outcome["error"] == "错误：API Key无效（状态码 401），请检查后重试"
+    assert voice_api.fetch_voice_list(API_KEY) == (None, outcome["error"])
+    assert len(stub_server.requests) == 1
+
+    # 检查通过后恢复使用
+    assert voice_api.check_api_key(API_KEY, force=True) == "✓ API Key有效"
+    assert voice_api.known_invalid_key(API_KEY) is None
@@ -0,0 +1,86 @@
+import wave
+
+import pytest
+
+import key_pool
+import voice_api
+from conftest import API_KEY
+
+SUB_KEY = "sk-test-sub-" + "1" * 32
+
+
+def _wav(path):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(bytes(range(256)) * 250)
+    return str(path)
+
+
+def test_keys_of_one_account_share_local_stores(tmp_path, mock_api):
+    key_pool.KeyPool([key_pool.PooledKey("main", API_KEY, "shop"), key_pool.PooledKey("sub", SUB_KEY, "shop")])
+    path = _wav(tmp_path / "a.wav")
+
+    # 用一个Key上传，另一个Key上传同一段音频时命中去重索引
+    first = voice_api.upload_voice_file(API_KEY, path, "m", "a", "文本")
+    second = voice_api.upload_voice_file(SUB_KEY, path, "m", "a", "文本")
+    assert first["ok"] and not first.get("duplicate")
+    assert second["duplicate"] and second["uri"] == first["uri"]
+    assert mock_api.state.uploads == 1
+
+    # 用一个Key拉取列表后，另一个Key直接使用同一份检索索引
+    index = voice_api.get_voice_index()
+    assert not index.has_account(SUB_KEY)
+    entry, error = voice_api.fetch_voice_list(API_KEY, force_refresh=True)
+    assert error is None
+    assert index.has_account(SUB_KEY)
+    assert [voice["uri"] for voice in index.search(SUB_KEY)["voices"]] == [first["uri"]]
+
+
+def test_other_accounts_do_not_share_local_stores(tmp_path, mock_api):
+    key_pool.KeyPool([key_pool.PooledKey("main", API_KEY, "shop"), key_pool.PooledKey("sub", SUB_KEY, "other")])
+    path = _wav(tmp_path / "a.wav")
+    voice_api.upload_voice_file(API_KEY, path, "m", "a", "文本")
+    assert not voice_api.upload_voice_file(SUB_KEY, path, "m", "a", "文本").get("duplicate")
+    assert mock_api.state.uploads == 2
+
+
+def test_batch_through_pool_deduplicates_across_keys(tmp_path, mock_api):
+    pool = key_pool.KeyPool([key_pool.PooledKey("main", API_KEY, "shop"), key_pool.PooledKey("sub", SUB_KEY, "shop")])
+    items = [{"index": 0, "file": _wav(tmp_path / "a.wav"), "customName": "a", "text": "文本", "model": "m"}]
+
+    first = list(voice_api.iter_batch_upload(None, items, key_pool=pool, validate=False))
+    second = list(voice_api.iter_batch_upload(None, items, key_pool=pool, validate=False))
+    assert first[0]["status"] == second[0]["status"] == "success"
+    assert second[0]["duplicate"]
+    assert mock_api.state.uploads == 1
+
+
+def test_pool_list_disables_rejected_key(mock_api):
+    revoked = key_pool.PooledKey("revoked", "sk-invalid-" + "2" * 32, "other")
+    pool = key_pool.KeyPool([key_pool.PooledKey("main", API_KEY, "shop"), revoked])
+
+    voices, errors = voice_api.fetch_pool_voice_list(pool)
+    assert "other" in errors and "shop" not in errors
+    assert revoked.disabled
+
+
+@pytest.mark.parametrize("weight", [0, -1, float("nan")])
+def test_non_positive_weight_is_rejected(weight):
+    with pytest.raises(key_pool.KeyPoolError):
+        key_pool.KeyPool([key_pool.PooledKey("main", API_KEY), key_pool.PooledKey("zero", SUB_KEY, weight=weight)])
+
+
+def test_weighted_round_robin_and_quota():
+    heavy = key_pool.PooledKey("heavy", API_KEY, weight=2)
+    light = key_pool.PooledKey("light", SUB_KEY, quota=2)
+    pool = key_pool.KeyPool([heavy, light], key_pool.ROUND_ROBIN)
+    names = []
+    for _ in range(6):
+        key = pool.acquire()
+        names.append(key.name)
+        pool.release(key, {"ok": True})
+    assert names.count("heavy") == 4 and names.count("light") == 2
+    # light 的配额已用完，之后只分配 heavy
+    assert {pool.acquire(timeout=0).name for _ in range(3)} == {"heavy"}
@@ -0,0 +1,102 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+import pytest
+
+import log_config
+import metrics
+
+logger = logging.getLogger("tests.log_config")
+
+
+def _record(msg, *args, **extra):
+    return logger.makeRecord(logger.name, logging.INFO, __file__, 1, msg, args, None, extra=extra or None)
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def root_info():
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.INFO)
+    yield root
+    log_config.shutdown_logging()
+    root.setLevel(level)
+
+
+def test_records_are_written_by_the_listener_as_json(tmp_path, root_info):
+    log_file = log_config.setup_logging(str(tmp_path / "logs"), "worker-1")
+    assert log_file == str(tmp_path / "logs" / "worker-1.log")
+    assert log_config.setup_logging(str(tmp_path / "logs")) is None
+    assert any(isinstance(handler, log_config.BoundedQueueHandler) for handler in root_info.handlers)
+
+    files = ["a.wav"]
+    logger.info("上传 %s", files, extra={"request_id": "r1", "bytes": 1024, "latency": 0.25})
+    # 参数在调用方线程中合并，之后的修改不影响日志内容
+    files.append("b.wav")
+    try:
+        raise ValueError("坏文件")
+    except ValueError:
+        logger.exception("失败")
+    log_config.shutdown_logging()
+    assert not any(isinstance(handler, log_config.BoundedQueueHandler) for handler in root_info.handlers)
+
+    first, second = _read_json(log_file)
+    assert (first["level"], first["logger"], first["msg"]) == ("INFO", logger.name, "上传 ['a.wav']")
+    assert (first["request_id"], first["bytes"], first["latency"]) == ("r1", 1024, 0.25)
+    assert first["pid"] == os.getpid()
+    assert first["thread"] == threading.current_thread().name
+    assert second["msg"] == "失败"
+    assert "ValueError: 坏文件" in second["exc"]
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = log_config.BoundedQueueHandler(queue.Queue(1))
+    dropped = metrics.LOG_RECORDS_DROPPED.value()
+    for i in range(3):
+        handler.handle(_record("记录 %d", i))
+    assert metrics.LOG_RECORDS_DROPPED.value() == dropped + 2
+    assert handler.queue.get_nowait().msg == "记录 0"
+
+
+def test_size_rotation_compresses_old_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("VOICE_UPLOAD_LOG_MAX_MB", "0.001")
+    monkeypatch.setenv("VOICE_UPLOAD_LOG_BACKUPS", "2")
+    log_file = str(tmp_path / "app.log")
+    handler = log_config.create_file_handler(log_file)
+    try:
+        for i in range(100):
+            handler.handle(_record("第 %d 条记录", i, file=f"{i}.wav"))
+    finally:
+        handler.close()
+
+    assert sorted(os.listdir(tmp_path)) == ["app.log", "app.log.1.gz", "app.log.2.gz"]
+    assert os.path.getsize(log_file) <= 1100
+    with gzip.open(log_file + ".1.gz", "rt", encoding="utf-8") as f:
+        rotated = [json.loads(line) for line in f]
+    current = _read_json(log_file)
+    # 最新的旧文件紧接在当前文件之前
+    assert int(rotated[-1]["file"].split(".")[0]) + 1 == int(current[0]["file"].split(".")[0])
+    assert current[-1]["msg"] == "第 99 条记录"
+
+
+def test_text_format_and_timed_rotation(tmp_path, monkeypatch):
+    monkeypatch.setenv("VOICE_UPLOAD_LOG_FORMAT", "text")
+    monkeypatch.setenv("VOICE_UPLOAD_LOG_ROTATE_WHEN", "midnight")
+    handler = log_config.create_file_handler(str(tmp_path / "app.log"))
+    try:
+        assert isinstance(handler, logging.handlers.TimedRotatingFileHandler)
+        assert handler.namer("app.log.2026-01-01") == "app.log.2026-01-01.gz"
+        handler.handle(_record("你好 %s", "世界"))
+    finally:
+        handler.close()
+    assert (tmp_path / "app.log").read_text(encoding="utf-8").rstrip().endswith(" - INFO - 你好 世界")
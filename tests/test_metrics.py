@@ -0,0 +1,109 @@
+import pytest
+import requests
+
+import metrics
+import voice_api
+from conftest import API_KEY
+
+
+def test_prometheus_exposition_format():
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("demo_requests_total", "Requests", ("endpoint", "status"))
+    histogram = registry.histogram("demo_seconds", "Latency", ("endpoint",), buckets=(0.1, 1.0))
+    counter.inc(endpoint="list", status=200)
+    counter.inc(2, endpoint="list", status=200)
+    counter.inc(endpoint='a"b\\c\nd', status=500)
+    histogram.observe(0.05, endpoint="list")
+    histogram.observe(0.5, endpoint="list")
+    histogram.observe(3.0, endpoint="list")
+
+    assert registry.render_prometheus() == (
+        "# HELP demo_requests_total Requests\n"
+        "# TYPE demo_requests_total counter\n"
+        'demo_requests_total{endpoint="a\\"b\\\\c\\nd",status="500"} 1\n'
+        'demo_requests_total{endpoint="list",status="200"} 3\n'
+        "# HELP demo_seconds Latency\n"
+        "# TYPE demo_seconds histogram\n"
+        'demo_seconds_bucket{endpoint="list",le="0.1"} 1\n'
+        'demo_seconds_bucket{endpoint="list",le="1.0"} 2\n'
+        'demo_seconds_bucket{endpoint="list",le="+Inf"} 3\n'
+        'demo_seconds_sum{endpoint="list"} 3.55\n'
+        'demo_seconds_count{endpoint="list"} 3\n'
+    )
+
+
+def test_unlabelled_counter_and_duplicate_names():
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("demo_bytes_total", "Bytes")
+    counter.inc(10)
+    assert counter.render() == ["demo_bytes_total 10"]
+    assert counter.value() == 10
+    with pytest.raises(ValueError):
+        registry.histogram("demo_bytes_total", "Bytes")
+
+    registry.reset()
+    assert counter.value() == 0
+    assert registry.snapshot() == {"demo_bytes_total": []}
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = metrics.Histogram("demo", "", buckets=tuple(range(10, 101, 10)))
+    for value in range(1, 101):
+        histogram.observe(value)
+    [row] = histogram.snapshot()
+    assert (row["count"], row["sum"], row["mean"], row["max"]) == (100, 5050, 50.5, 100)
+    assert (row["p50"], row["p90"], row["p99"]) == (50, 90, 99)
+
+
+def test_histogram_quantiles_stay_within_observed_range():
+    histogram = metrics.Histogram("demo", "", ("phase",))
+    histogram.observe(0.3, phase="hash")
+    for value in (200.0, 250.0):
+        histogram.observe(value, phase="send")
+    hash_row, send_row = sorted(histogram.snapshot(), key=lambda row: row["phase"])
+    # 只有一次观测时各分位数都等于该值，而不是所在桶的上界
+    assert hash_row["p50"] == hash_row["p99"] == 0.3
+    # 超出最大分桶上界的观测以实际最大值为限
+    assert send_row["p50"] == send_row["p99"] == 250.0
+    assert (hash_row["count"], send_row["count"]) == (1, 2)
+
+
+def test_timer_records_failed_blocks():
+    histogram = metrics.Histogram("demo", "", ("phase",))
+    with pytest.raises(RuntimeError):
+        with histogram.time(phase="parse"):
+            raise RuntimeError
+    assert histogram.snapshot()[0]["count"] == 1
+
+
+def test_upload_records_phases_requests_and_bytes(tmp_path, mock_api):
+    metrics.registry.reset()
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 5000)
+    assert voice_api.upload_voice_file(API_KEY, str(audio), "m", "a", "文本")["ok"]
+
+    phases = {row["phase"] for row in metrics.PHASE_SECONDS.snapshot() if row["operation"] == "upload"}
+    assert {"hash", "connect", "send", "server_wait", "parse"} <= phases
+    assert metrics.API_REQUESTS.value(endpoint="upload", status=200) == 1
+    assert metrics.UPLOAD_BYTES.value() > 5000
+    assert metrics.UPLOADS.value(result="success") == 1
+
+    summary = metrics.summary()
+    assert summary["uploads"] == {"success": 1}
+    assert summary["bytes_sent"] == metrics.UPLOAD_BYTES.value()
+
+
+def test_metrics_endpoint():
+    metrics.UPLOADS.inc(result="success")
+    server = metrics.start_metrics_server(port=0)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        response = requests.get(base_url + "/metrics?name=x", timeout=5)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE voice_upload_uploads_total counter" in response.text
+        assert 'voice_upload_uploads_total{result="success"}' in response.text
+        assert requests.get(base_url + "/", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
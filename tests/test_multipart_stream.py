@@ -0,0 +1,70 @@
+import email.parser
+
+from multipart_stream import MultipartFileStream
+
+
+def _drain(stream, size=8192):
+    while stream.read(size):
+        pass
+
+
+def test_progress_callback_is_throttled(tmp_path):
+    path = tmp_path / "big.wav"
+    path.write_bytes(b"\1" * (8 * 1024 * 1024))
+    calls = []
+    with MultipartFileStream({"model": "m"}, "file", str(path),
+                             progress_callback=lambda sent, total: calls.append(sent)) as stream:
+        # http.client 每次读取8KB，共一千多次
+        _drain(stream)
+        total = stream.total
+    assert len(calls) <= 101
+    assert calls[-1] == total
+    assert calls == sorted(calls)
+
+
+def test_progress_reports_small_files_once_complete(tmp_path):
+    path = tmp_path / "small.wav"
+    path.write_bytes(b"\1" * 100)
+    calls = []
+    with MultipartFileStream({}, "file", str(path),
+                             progress_callback=lambda sent, total: calls.append((sent, total))) as stream:
+        _drain(stream, 16)
+    assert calls[-1] == (stream.total, stream.total)
+
+
+def _parse(stream, body):
+    message = email.parser.BytesParser().parsebytes(
+        f"Content-Type: {stream.content_type}\r\n\r\n".encode("ascii") + body)
+    return {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+
+
+def test_body_is_valid_multipart(tmp_path):
+    path = tmp_path / 'voice "1".wav'
+    audio = bytes(range(256)) * 1000
+    path.write_bytes(audio)
+    fields = {"model": "FunAudioLLM/CosyVoice2-0.5B", "customName": "名称", "text": "你好，世界"}
+    with MultipartFileStream(fields, "file", str(path), chunk_size=4096) as stream:
+        chunks = list(stream)
+    body = b"".join(chunks)
+    # 长度预先算好，requests 据此设置 Content-Length
+    assert len(body) == len(stream) == stream.total == stream.bytes_sent
+    assert max(len(chunk) for chunk in chunks) <= 4096
+
+    parts = _parse(stream, body)
+    assert parts["model"].get_payload(decode=True) == fields["model"].encode("utf-8")
+    assert parts["customName"].get_payload(decode=True).decode("utf-8") == "名称"
+    assert parts["text"].get_payload(decode=True).decode("utf-8") == "你好，世界"
+    assert parts["file"].get_payload(decode=True) == audio
+    assert parts["file"].get_content_type() == "audio/x-wav"
+    assert parts["file"].get_filename() == "voice %221%22.wav"
+
+
+def test_reads_file_lazily(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"\1" * 100000)
+    with MultipartFileStream({"model": "m"}, "file", str(path), chunk_size=1024) as stream:
+        stream.read()
+        # 只读了字段头部之后的第一块，文件的读取位置随之前进
+        assert stream._file.tell() <= 1024
+        assert stream.first_read_at is not None
+    assert stream._file.closed
@@ -0,0 +1,194 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+import retry_policy
+import siliconflow_client
+from conftest import API_KEY
+from retry_policy import CircuitBreaker, CircuitOpenError, ConnectFailedError, RetryPolicy, is_connect_error
+
+
+def _client(base_url, **options):
+    return siliconflow_client.SiliconFlowClient(base_url=base_url, rate_limit=1000, **options)
+
+
+def _open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.is_open
+
+
+def test_breaker_recovers_after_throttled_probe(mock_api):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    client = _client(mock_api.base_url, circuit_breaker=breaker, retry_policy=RetryPolicy(max_attempts=1))
+    _open_breaker(breaker)
+    with pytest.raises(CircuitOpenError):
+        client.list_voices(API_KEY)
+
+    # 熔断时间过后的试探请求被限流
+    time.sleep(0.06)
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 429
+    assert client.list_voices(API_KEY).status_code == 429
+    assert not breaker.is_open
+
+    mock_api.state.error_rate = 0.0
+    assert client.list_voices(API_KEY).status_code == 200
+
+
+def test_probe_released_when_send_raises_other_exception(mock_api):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    client = _client(mock_api.base_url, circuit_breaker=breaker)
+    _open_breaker(breaker)
+
+    def send():
+        raise OSError("文件读取失败")
+
+    with pytest.raises(OSError):
+        client._request(API_KEY, send, "upload", idempotent=False)
+    # 试探名额已释放，下一个请求可以继续试探并关闭熔断器
+    assert client.list_voices(API_KEY).status_code == 200
+    assert not breaker.is_open
+
+
+def test_async_probe_released_when_cancelled(mock_api):
+    pytest.importorskip("httpx")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    client = _client(mock_api.base_url, circuit_breaker=breaker)
+    _open_breaker(breaker)
+
+    async def run():
+        async_client = siliconflow_client.AsyncSiliconFlowClient(client)
+
+        async def send():
+            await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(async_client._request(API_KEY, send, "list"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        response = await async_client.list_voices(API_KEY)
+        await async_client.close()
+        return response.status_code
+
+    assert asyncio.run(run()) == 200
+    assert not breaker.is_open
+
+
+def test_upload_not_retried_after_connection_established():
+    policy = RetryPolicy()
+    aborted = requests.exceptions.ConnectionError("('Connection aborted.', RemoteDisconnected())")
+    assert not policy.should_retry_exception(aborted, idempotent=False)
+    assert policy.should_retry_exception(aborted, idempotent=True)
+    assert not policy.should_retry_exception(requests.exceptions.ReadTimeout(), idempotent=False)
+    assert policy.should_retry_exception(requests.exceptions.ConnectTimeout(), idempotent=False)
+    assert policy.should_retry_exception(ConnectFailedError(), idempotent=False)
+    assert not policy.should_retry_exception(CircuitOpenError(), idempotent=True)
+
+
+def test_connection_refused_is_connect_error():
+    # 绑定后不监听的端口，连接会被拒绝
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        with pytest.raises(requests.exceptions.ConnectionError) as info:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+    assert is_connect_error(info.value)
+
+
+def test_upload_not_retried_on_server_error(mock_api, tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    client = _client(mock_api.base_url, retry_policy=RetryPolicy(max_attempts=3, base_delay=0.0))
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 500
+    assert client.upload_voice(API_KEY, str(audio), "m", "n", "t").status_code == 500
+    assert client.circuit_breaker._failures == 1
+
+
+class RecordingPolicy(RetryPolicy):
+    """记录每次重试的等待时间"""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.delays = []
+
+    def delay(self, attempt, retry_after=None):
+        delay = super().delay(attempt, retry_after)
+        self.delays.append(delay)
+        return delay
+
+
+def test_throttled_and_server_errors_are_retried(stub_server):
+    policy = RecordingPolicy(max_attempts=4, base_delay=0.01)
+    client = _client(stub_server.base_url, retry_policy=policy)
+    stub_server.respond(429)
+    stub_server.respond(503)
+    stub_server.respond(502)
+    assert client.list_voices(API_KEY).status_code == 200
+    assert len(stub_server.requests) == 4
+    assert len(policy.delays) == 3
+
+
+def test_retries_give_up_after_max_attempts(stub_server):
+    client = _client(stub_server.base_url, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01))
+    for _ in range(3):
+        stub_server.respond(500)
+    assert client.list_voices(API_KEY).status_code == 500
+    assert len(stub_server.requests) == 2
+
+
+def test_throttled_upload_is_retried(stub_server, tmp_path):
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    client = _client(stub_server.base_url, retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+    stub_server.respond(429)
+    stub_server.respond(200, payload={"uri": "speech:a:1"})
+    response = client.upload_voice(API_KEY, str(audio), "m", "n", "t")
+    assert response.json() == {"uri": "speech:a:1"}
+    assert len(stub_server.requests) == 2
+    # 重试时重新发送完整的请求体
+    first, second = (request["body"] for request in stub_server.requests)
+    assert len(first) == len(second)
+    assert audio.read_bytes() in second
+
+
+def test_backoff_grows_exponentially(stub_server, monkeypatch):
+    # 抖动取上限，等待时间为 base_delay * 2^(attempt-1)
+    monkeypatch.setattr(retry_policy.random, "uniform", lambda low, high: high)
+    policy = RecordingPolicy(max_attempts=4, base_delay=0.05)
+    client = _client(stub_server.base_url, retry_policy=policy)
+    for _ in range(3):
+        stub_server.respond(503)
+    assert client.list_voices(API_KEY).status_code == 200
+    assert policy.delays == [0.05, 0.1, 0.2]
+    times = [request["time"] for request in stub_server.requests]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    for gap, delay in zip(gaps, policy.delays):
+        assert gap >= delay * 0.9
+
+
+def test_retry_after_is_honored(stub_server):
+    policy = RecordingPolicy(max_attempts=3, base_delay=0.01)
+    client = _client(stub_server.base_url, retry_policy=policy)
+    stub_server.respond(429, {"Retry-After": "1"})
+    assert client.list_voices(API_KEY).status_code == 200
+    assert policy.delays == [1.0]
+    first, second = stub_server.requests
+    assert second["time"] - first["time"] >= 0.9
+
+
+def test_only_successful_responses_raise_the_rate(stub_server):
+    client = _client(stub_server.base_url, retry_policy=RetryPolicy(max_attempts=1))
+    bucket = client.get_bucket(API_KEY)
+    bucket.rate = bucket.max_rate / 2
+    for status in (400, 401, 403, 404):
+        stub_server.respond(status)
+        assert client.list_voices(API_KEY).status_code == status
+    assert bucket.rate == bucket.max_rate / 2
+    client.list_voices(API_KEY)
+    assert bucket.rate == bucket.max_rate / 2 + bucket.increase
@@ -0,0 +1,77 @@
+import pytest
+
+import server
+import siliconflow_client
+
+
+def test_readiness_reports_each_check(mock_api):
+    ready, checks = server.readiness()
+    assert ready
+    assert checks == {"data_dir": "ok", "pending_jobs": 0, "job_queue": "ok", "upstream": "ok"}
+
+    # 上游熔断不影响就绪状态
+    breaker = siliconflow_client.get_client().circuit_breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    ready, checks = server.readiness()
+    assert ready
+    assert checks["upstream"] == "circuit_open"
+
+
+def test_unwritable_data_dir_is_not_ready(tmp_path, monkeypatch, mock_api):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setenv("VOICE_UPLOAD_DATA_DIR", str(blocker / "data"))
+    ready, checks = server.readiness()
+    assert not ready
+    assert checks["data_dir"].startswith("不可写")
+    assert checks["job_queue"].startswith("不可用")
+
+
+def test_worker_environment_splits_rate_limit(monkeypatch):
+    monkeypatch.setenv("SILICONFLOW_RATE_LIMIT", "8")
+    monkeypatch.delenv("VOICE_UPLOAD_SHARED_CACHE", raising=False)
+    assert "VOICE_UPLOAD_SHARED_CACHE" not in server.worker_environment(1)
+    assert server.worker_environment(1)["SILICONFLOW_RATE_LIMIT"] == "8"
+    env = server.worker_environment(4)
+    assert env["VOICE_UPLOAD_SHARED_CACHE"] == "1"
+    assert float(env["SILICONFLOW_RATE_LIMIT"]) == 2.0
+
+
+@pytest.fixture
+def app_client(mock_api):
+    pytest.importorskip("gradio")
+    testclient = pytest.importorskip("fastapi.testclient")
+    import job_queue
+
+    with testclient.TestClient(server.create_app()) as client:
+        yield client
+    job_queue.get_job_queue().stop()
+
+
+def test_health_and_readiness_endpoints(app_client):
+    response = app_client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+    response = app_client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+    assert response.json()["checks"]["job_queue"] == "ok"
+
+
+def test_not_ready_endpoint_returns_503(app_client, tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setenv("VOICE_UPLOAD_DATA_DIR", str(blocker / "data"))
+    response = app_client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+
+def test_metrics_endpoint_and_interface_are_mounted(app_client):
+    response = app_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE voice_upload_uploads_total counter" in response.text
+    assert app_client.get("/").status_code == 200
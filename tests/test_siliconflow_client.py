@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+import requests
+
+import siliconflow_client
+from conftest import API_KEY
+from retry_policy import RetryPolicy
+
+
+def _client(base_url, **options):
+    options.setdefault("retry_policy", RetryPolicy(max_attempts=1))
+    return siliconflow_client.SiliconFlowClient(base_url=base_url, rate_limit=1000, **options)
+
+
+def test_requests_reuse_one_connection(stub_server):
+    client = _client(stub_server.base_url)
+    for _ in range(5):
+        assert client.list_voices(API_KEY).status_code == 200
+    assert client.get_user_info(API_KEY).status_code == 200
+    # keep-alive：所有请求来自同一个本地端口
+    assert len({request["client"] for request in stub_server.requests}) == 1
+    client.close()
+
+
+def test_base_url_from_argument_or_environment(stub_server, monkeypatch):
+    client = _client(stub_server.base_url + "/")
+    assert client.base_url == stub_server.base_url
+    client.delete_voice(API_KEY, "speech:a:1")
+    assert stub_server.requests[-1]["path"] == "/v1/audio/voice/deletions"
+
+    monkeypatch.setenv("SILICONFLOW_BASE_URL", stub_server.base_url)
+    client = siliconflow_client.SiliconFlowClient(rate_limit=1000)
+    assert client.base_url == stub_server.base_url
+    client.list_voices(API_KEY)
+    assert stub_server.requests[-1]["path"] == "/v1/audio/voice/list"
+
+    monkeypatch.delenv("SILICONFLOW_BASE_URL")
+    assert siliconflow_client.SiliconFlowClient().base_url == siliconflow_client.DEFAULT_BASE_URL
+
+
+def test_headers(stub_server, tmp_path):
+    client = _client(stub_server.base_url)
+    client.list_voices(f"  {API_KEY}\n", etag='"v1"')
+    headers = stub_server.requests[-1]["headers"]
+    assert headers["Authorization"] == f"Bearer {API_KEY}"
+    assert headers["If-None-Match"] == '"v1"'
+
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    client.upload_voice(API_KEY, str(audio), "model-a", "名称", "文本")
+    request = stub_server.requests[-1]
+    assert request["path"] == "/v1/uploads/audio/voice"
+    assert request["headers"]["Content-Type"].startswith("multipart/form-data; boundary=")
+    assert int(request["headers"]["Content-Length"]) == len(request["body"])
+    assert "名称".encode("utf-8") in request["body"]
+
+
+def test_read_timeout(stub_server):
+    client = _client(stub_server.base_url, timeouts={"list": (1, 0.2)})
+    # 未覆盖的接口保留默认超时
+    assert client.timeouts["upload"] == siliconflow_client.DEFAULT_TIMEOUTS["upload"]
+    stub_server.respond(200, delay=0.5)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.list_voices(API_KEY)
+
+
+def test_async_client_shares_configuration(stub_server):
+    pytest.importorskip("httpx")
+    client = _client(stub_server.base_url, timeouts={"list": (1, 0.2)})
+
+    async def run():
+        async_client = siliconflow_client.AsyncSiliconFlowClient(client)
+        try:
+            response = await async_client.list_voices(f" {API_KEY} ")
+            stub_server.respond(200, delay=0.5)
+            with pytest.raises(requests.exceptions.Timeout):
+                await async_client.list_voices(API_KEY)
+            return response.status_code
+        finally:
+            await async_client.close()
+
+    assert asyncio.run(run()) == 200
+    assert stub_server.requests[0]["headers"]["Authorization"] == f"Bearer {API_KEY}"
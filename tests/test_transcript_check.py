@@ -0,0 +1,60 @@
+import wave
+
+import numpy as np
+
+import transcript_check
+
+RATE = 16000
+
+
+def _tone(seconds, amplitude, rate=RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def _noise(seconds, amplitude, seed=0):
+    return (amplitude * np.random.default_rng(seed).standard_normal(int(seconds * RATE))).astype(np.float32)
+
+
+def _write(path, samples):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return str(path)
+
+
+def test_silence_has_no_speech(tmp_path):
+    assert transcript_check.speech_seconds(np.zeros(RATE * 2, dtype=np.float32), RATE) == 0.0
+    report = transcript_check.check_transcript(_write(tmp_path / "silence.wav", np.zeros(RATE * 2)), "你好世界")
+    assert report["ok"] is False
+    assert report["speech"] == 0.0
+
+
+def test_speech_over_noise_counts_only_voiced_parts():
+    # 1秒语音 + 2秒底噪 + 1秒语音，底噪约 -50 dB 以上也不算语音
+    samples = _noise(4, 0.005)
+    samples[:RATE] += _tone(1, 0.5)
+    samples[3 * RATE:] += _tone(1, 0.5)
+    speech = transcript_check.speech_seconds(samples, RATE)
+    # 每段语音前后各延长 hangover_ms
+    assert 2.0 <= speech <= 2.0 + 4 * transcript_check.DEFAULT_RULES["hangover_ms"] / 1000
+
+
+def test_continuous_loud_audio_counts_as_speech(tmp_path):
+    # 调制深度0.6：最安静的帧与最响亮的帧相差不到12 dB，估计不出底噪
+    t = np.arange(RATE * 3) / RATE
+    samples = (_tone(3, 0.5) * (1 - 0.3 * (1 + np.sin(2 * np.pi * 3 * t)))).astype(np.float32)
+    assert transcript_check.speech_seconds(samples, RATE) > 2.9
+
+    report = transcript_check.check_transcript(_write(tmp_path / "loud.wav", samples), "今天天气真不错我们出去走走")
+    assert report["ok"] is True
+    assert report["speech"] > 2.9
+
+
+def test_rate_outside_range_is_rejected(tmp_path):
+    path = _write(tmp_path / "short.wav", _tone(1, 0.5))
+    report = transcript_check.check_transcript(path, "这是一段明显比一秒钟的音频长得多的文字内容，朗读需要好几秒钟")
+    assert report["ok"] is False
+    assert report["rate"] > transcript_check.DEFAULT_RULES["max_rate"]
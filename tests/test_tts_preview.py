@@ -0,0 +1,54 @@
+import pytest
+
+import cli
+import key_check
+import siliconflow_client
+import tts_preview
+from conftest import API_KEY
+
+MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+URI = "speech:a:mock:1"
+OTHER_KEY = "sk-other-" + "1" * 32
+
+
+def _preview(api_key):
+    return b"".join(tts_preview.iter_preview(api_key, URI, MODEL, "你好"))
+
+
+def test_repeated_preview_hits_cache(mock_api):
+    audio = _preview(API_KEY)
+    assert _preview(API_KEY) == audio
+    assert mock_api.state.syntheses == 1
+
+
+def test_cache_is_scoped_by_account(mock_api):
+    _preview(API_KEY)
+    _preview(OTHER_KEY)
+    assert mock_api.state.syntheses == 2
+
+    # 同一账号的其他Key共用缓存
+    siliconflow_client.register_account_keys([API_KEY, "sk-sub-" + "2" * 32])
+    _preview("sk-sub-" + "2" * 32)
+    assert mock_api.state.syntheses == 2
+
+
+def test_rejected_key_does_not_read_cache(mock_api):
+    _preview(API_KEY)
+    key_check.key_check_cache.record(API_KEY, 401)
+    with pytest.raises(tts_preview.PreviewError):
+        _preview(API_KEY)
+    assert mock_api.state.syntheses == 1
+
+
+def test_cli_preview_failure_keeps_existing_output(tmp_path, mock_api):
+    output = tmp_path / "out.mp3"
+    output.write_bytes(b"old")
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 400
+    assert cli.main(["--api-key", API_KEY, "preview", URI, "-o", str(output)]) == 1
+    assert output.read_bytes() == b"old"
+    assert not (tmp_path / "out.mp3.part").exists()
+
+    mock_api.state.error_rate = 0.0
+    assert cli.main(["--api-key", API_KEY, "preview", URI, "-o", str(output)]) == 0
+    assert output.read_bytes() != b"old"
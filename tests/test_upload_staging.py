@@ -0,0 +1,61 @@
+import os
+import time
+
+from upload_staging import UploadSpool
+
+
+def _incoming(spool, name, size):
+    directory = os.path.join(spool.incoming_dir, name + "-dir")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + ".wav")
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def _age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_staging_keeps_source_and_counts_hard_links_once(tmp_path):
+    spool = UploadSpool(str(tmp_path / "spool"), max_bytes=1500, max_age=3600)
+    source = _incoming(spool, "a", 1000)
+
+    staged = spool.stage(source)
+    assert os.path.exists(source) and os.path.exists(staged["path"])
+    spool.release(staged)
+    # 界面仍引用原上传文件，再次提交同一个文件可以重新暂存
+    staged = spool.stage(source)
+    assert staged["size"] == 1000
+    spool.release(staged)
+    assert os.path.exists(source)
+
+
+def test_size_pressure_only_evicts_leftover_staged_files(tmp_path):
+    spool = UploadSpool(str(tmp_path / "spool"), max_bytes=1500, max_age=3600)
+    source = _incoming(spool, "a", 1000)
+    leftover = os.path.join(spool.staged_dir, "leftover.wav")
+    with open(leftover, "wb") as f:
+        f.write(os.urandom(1000))
+    _age(leftover, 10)
+
+    assert spool.evict() == 1
+    assert not os.path.exists(leftover)
+    assert os.path.exists(source)
+
+
+def test_in_use_files_survive_age_limit(tmp_path):
+    spool = UploadSpool(str(tmp_path / "spool"), max_bytes=10 ** 9, max_age=60)
+    source = _incoming(spool, "a", 100)
+    old = _incoming(spool, "b", 100)
+    staged = spool.stage(source)
+    for path in (source, old, staged["path"]):
+        _age(path, 120)
+
+    assert spool.evict() == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(source) and os.path.exists(staged["path"])
+    spool.release(staged)
+    assert spool.evict() == 1
+    assert not os.path.exists(source)
@@ -0,0 +1,108 @@
+import pytest
+
+import metrics
+import siliconflow_client
+import voice_api
+import voice_cache
+from conftest import API_KEY
+
+MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+
+
+@pytest.fixture
+def list_requests(mock_api, monkeypatch):
+    """记录每次列表请求携带的 ETag 和返回的状态码"""
+    calls = []
+    list_voices = siliconflow_client.SiliconFlowClient.list_voices
+
+    def recording(self, api_key, etag=None):
+        response = list_voices(self, api_key, etag=etag)
+        calls.append((etag, response.status_code))
+        return response
+
+    monkeypatch.setattr(siliconflow_client.SiliconFlowClient, "list_voices", recording)
+    return calls
+
+
+def _lookups(source):
+    return metrics.VOICE_LIST_LOOKUPS.value(source=source)
+
+
+def test_ttl_and_etag_revalidation(mock_api, list_requests):
+    cache = voice_cache.VoiceListCache(ttl=60)
+    mock_api.state.add_voice("a", "文本", MODEL)
+    first = cache.get(API_KEY)
+    assert not first["cached"]
+    assert [voice["customName"] for voice in first["voices"]] == ["a"]
+
+    hits = _lookups("cache")
+    assert cache.get(API_KEY)["cached"]
+    assert _lookups("cache") == hits + 1
+    assert len(list_requests) == 1
+
+    # 过期后带上 ETag 确认，列表未变化时沿用缓存并刷新更新时间
+    cache.ttl = 0
+    second = cache.get(API_KEY)
+    assert list_requests[-1] == (first["etag"], 304)
+    assert second["voices"] == first["voices"]
+    assert second["fetched_at"] >= first["fetched_at"]
+
+    mock_api.state.add_voice("b", "文本", MODEL)
+    third = cache.get(API_KEY)
+    assert list_requests[-1] == (first["etag"], 200)
+    assert [voice["customName"] for voice in third["voices"]] == ["a", "b"]
+    assert third["etag"] != first["etag"]
+
+
+def test_error_status_raises(mock_api):
+    mock_api.state.error_rate = 1.0
+    mock_api.state.error_status = 400
+    with pytest.raises(voice_cache.VoiceListError) as excinfo:
+        voice_cache.VoiceListCache().get(API_KEY)
+    assert excinfo.value.status_code == 400
+
+
+def test_upload_invalidates_cached_list(tmp_path, mock_api, list_requests):
+    assert voice_api.fetch_voice_list(API_KEY)[0]["voices"] == []
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 100)
+    assert voice_api.upload_voice_file(API_KEY, str(audio), MODEL, "a", "文本")["ok"]
+
+    entry, error = voice_api.fetch_voice_list(API_KEY)
+    assert error is None
+    assert not entry["cached"]
+    assert [voice["customName"] for voice in entry["voices"]] == ["a"]
+    assert len(list_requests) == 2
+
+
+def test_shared_invalidation_reaches_other_processes(mock_api, list_requests, monkeypatch):
+    # 两个缓存实例各自打开数据目录中的失效标记库，相当于两个工作进程
+    monkeypatch.setenv("VOICE_UPLOAD_SHARED_CACHE", "1")
+    worker_a, worker_b = voice_cache.VoiceListCache(), voice_cache.VoiceListCache()
+    worker_a.get(API_KEY)
+    worker_b.get(API_KEY)
+    assert worker_a.get(API_KEY)["cached"]
+    assert len(list_requests) == 2
+
+    mock_api.state.add_voice("a", "文本", MODEL)
+    worker_b.invalidate(API_KEY)
+    entry = worker_a.get(API_KEY)
+    assert not entry["cached"]
+    assert [voice["customName"] for voice in entry["voices"]] == ["a"]
+    assert worker_a.get(API_KEY)["cached"]
+
+
+def test_cache_without_shared_invalidation_stays_local(mock_api, list_requests):
+    worker_a, worker_b = voice_cache.VoiceListCache(), voice_cache.VoiceListCache()
+    worker_a.get(API_KEY)
+    worker_b.invalidate(API_KEY)
+    assert worker_a.get(API_KEY)["cached"]
+    assert len(list_requests) == 1
+
+
+def test_paginate_clamps_page():
+    voices = [{"customName": f"v{i}", "model": MODEL, "uri": f"speech:v{i}", "text": ""} for i in range(120)]
+    rows, page, pages = voice_cache.paginate(voices, 9)
+    assert (page, pages, len(rows)) == (3, 3, 20)
+    assert rows[0] == ["v100", MODEL, "speech:v100", ""]
+    assert voice_cache.paginate([], 0) == ([], 1, 1)
@@ -0,0 +1,112 @@
+import random
+import time
+
+import pytest
+
+import voice_index
+from conftest import API_KEY
+from voice_cache import filter_voices
+
+MODELS = ["FunAudioLLM/CosyVoice2-0.5B", "fishaudio/fish-speech-1.5"]
+WORDS = ["alice", "bob", "天气", "晴朗", "你好世界", "测试", "Voice", "abc"]
+
+
+def _voices(count, seed=7):
+    rng = random.Random(seed)
+    voices = []
+    for i in range(count):
+        name = f"{rng.choice(WORDS)}-{i}"
+        voices.append({
+            "customName": name,
+            "model": rng.choice(MODELS),
+            "text": "".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))),
+            "uri": f"speech:{name}:acct{rng.randint(0, 3)}:{rng.getrandbits(64):016x}",
+        })
+    return voices
+
+
+def _uris(voices):
+    return sorted(voice["uri"] for voice in voices)
+
+
+@pytest.fixture
+def indexed():
+    voices = _voices(400)
+    index = voice_index.VoiceIndex()
+    index.sync(API_KEY, voices, time.time())
+    return index, voices
+
+
+@pytest.mark.parametrize("keyword", ["a", "AL", "ali", "alice", "天", "你好世界", "voice", "cosyvoice",
+                                     "fish-speech", "speech:", "acct2", "ce-1", "不存在的关键字"])
+def test_keyword_matches_brute_force_filter(indexed, keyword):
+    index, voices = indexed
+    result = index.search(API_KEY, keyword)
+    assert _uris(result["voices"]) == _uris(filter_voices(voices, keyword))
+    assert result["total"] == len(voices)
+
+
+def test_filters_combine_with_keyword(indexed):
+    index, voices = indexed
+    query = voice_index.parse_query("bob model:cosyvoice uri:speech:bob")
+    expected = [voice for voice in filter_voices(voices, "bob")
+                if "cosyvoice" in voice["model"].lower() and voice["uri"].startswith("speech:bob")]
+    assert _uris(index.search(API_KEY, **query)["voices"]) == _uris(expected)
+
+
+def test_incremental_updates_match_brute_force(indexed):
+    index, voices = indexed
+    removed = voices[::3]
+    index.remove(API_KEY, [voice["uri"] for voice in removed])
+    added = _voices(20, seed=11)
+    for voice in added:
+        index.add(API_KEY, voice)
+    remaining = [voice for voice in voices if voice not in removed] + added
+    for keyword in ("alice", "天气", "acct1", "fish"):
+        assert _uris(index.search(API_KEY, keyword)["voices"]) == _uris(filter_voices(remaining, keyword))
+
+
+def test_removals_match_brute_force_after_compaction(indexed, monkeypatch):
+    index, voices = indexed
+    monkeypatch.setattr(voice_index, "COMPACT_MIN_STALE", 10)
+    removed = voices[:300]
+    index.remove(API_KEY, [voice["uri"] for voice in removed])
+    remaining = voices[300:]
+    for keyword in ("alice", "天", "acct3", "ce-3"):
+        assert _uris(index.search(API_KEY, keyword)["voices"]) == _uris(filter_voices(remaining, keyword))
+
+
+def _account_index(voices):
+    index = voice_index._AccountIndex(1, 0.0)
+    for created_at, voice in enumerate(voices):
+        index.add(dict(voice, created_at=float(created_at)), keep_sorted=False)
+    index.sort()
+    return index
+
+
+def _best_time(func, repeat=5, number=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def test_selective_search_and_removal_do_not_scale_with_account_size():
+    # 关键字只匹配少数音色时，检索耗时应与账号中的音色总数基本无关（逐个扫描会慢十倍）
+    timings = {}
+    for count in (2000, 20000):
+        voices = _voices(count, seed=1)
+        index = _account_index(voices)
+        keyword = voices[123]["uri"].rsplit(":", 1)[-1][:8]
+        assert [voice["uri"] for voice in index.search(keyword, None, None, None, None)] == [voices[123]["uri"]]
+        timings[count] = _best_time(lambda: index.search(keyword, None, None, None, None))
+    assert timings[20000] < timings[2000] * 4
+
+    # 从倒排表中逐个移除时，两万个音色的账号删除一千个约需两秒
+    start = time.perf_counter()
+    for voice in voices[:1000]:
+        index.remove(voice["uri"])
+    assert time.perf_counter() - start < 0.25
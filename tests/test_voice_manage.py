@@ -0,0 +1,55 @@
+import json
+import wave
+
+import cli
+import voice_manage
+from conftest import API_KEY
+
+MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+
+
+def _wav(path):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\0\1" * 16000 * 2)
+    return str(path)
+
+
+def _manifest(tmp_path, name):
+    path = tmp_path / "voices.jsonl"
+    entry = {"file": _wav(tmp_path / "a.wav"), "customName": name, "text": "测试文本", "model": MODEL}
+    path.write_text(json.dumps(entry, ensure_ascii=False) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def _voice(name, uri, text="测试文本"):
+    return {"customName": name, "model": MODEL, "text": text, "uri": uri}
+
+
+def test_plan_sync_uploads_missing_and_deletes_extra_and_duplicates():
+    items = [{"file": "a.wav", "customName": "a", "text": "测试文本", "model": MODEL},
+             {"file": "b.wav", "customName": "b", "text": "测试文本", "model": MODEL}]
+    voices = [_voice("a", "speech:a:1"), _voice("a", "speech:a:2"), _voice("old", "speech:old:1")]
+    plan = voice_manage.plan_sync(items, voices)
+    assert [item["customName"] for item in plan["upload"]] == ["b"]
+    assert sorted(voice["uri"] for voice in plan["delete"]) == ["speech:a:2", "speech:old:1"]
+    assert plan["unchanged"] == 1
+
+
+def test_sync_rename_uploads_new_voice_before_pruning_old(tmp_path, mock_api):
+    assert cli.main(["--api-key", API_KEY, "sync", "--manifest", _manifest(tmp_path, "old")]) == 0
+    assert [voice["customName"] for voice in mock_api.state.voices] == ["old"]
+
+    # 同一份音频改名后同步：去重索引里有旧音色，同步仍需重新上传，删除旧音色后账号中保留新名称
+    manifest = _manifest(tmp_path, "new")
+    assert cli.main(["--api-key", API_KEY, "sync", "--manifest", manifest, "--prune", "--yes"]) == 0
+    assert [voice["customName"] for voice in mock_api.state.voices] == ["new"]
+    assert mock_api.state.uploads == 2
+
+
+def test_sync_prune_without_yes_keeps_voices(tmp_path, mock_api):
+    assert cli.main(["--api-key", API_KEY, "sync", "--manifest", _manifest(tmp_path, "old")]) == 0
+    assert cli.main(["--api-key", API_KEY, "sync", "--manifest", _manifest(tmp_path, "new"), "--prune"]) == 0
+    assert sorted(voice["customName"] for voice in mock_api.state.voices) == ["new", "old"]
@@ -0,0 +1,154 @@
+"""
+文字内容与音频的匹配检查
+
+参考音频的文字内容必须与音频一致，否则克隆出的音色质量会明显下降。这里在上传前离线估算：
+用向量化的能量检测（VAD）统计音频中有语音的时长，再按文字内容估算音节数，两者之比
+（音节/秒）明显超出正常语速范围时，说明文字内容很可能多写、漏写或对应了别的音频。
+
+这只是粗略的合理性检查，不做语音识别：能发现整句缺失、文本与音频错配等问题，
+发现不了个别错字。批量检查在进程池中并行执行，解码和DSP不受GIL限制。
+"""
+import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_preprocess import decode_audio, to_mono
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES = {
+    # 正常语速范围（音节/秒，只计算有语音的时长），超出范围视为不匹配
+    "min_rate": 1.5,
+    "max_rate": 9.0,
+    # 能量检测的帧长（毫秒）
+    "frame_ms": 20,
+    # 语音帧的判定阈值：高于底噪该分贝数，且不低于绝对阈值（dBFS）
+    "noise_margin_db": 12.0,
+    "min_level_db": -50.0,
+    # 语音帧前后各延长的毫秒数，词与词之间的短停顿计入语音时长
+    "hangover_ms": 150,
+}
+
+# 中日韩文字每个字计一个音节，假名按拍计算，约为音节的0.6
+_CJK = re.compile(r"[㐀-䶿一-鿿豈-﫿가-힯]")
+_KANA = re.compile(r"[぀-ヿ]")
+_WORD = re.compile(r"[A-Za-z]+")
+_VOWELS = re.compile(r"[aeiouy]+", re.IGNORECASE)
+_DIGIT = re.compile(r"[0-9]")
+
+
+def count_syllables(text):
+    """估算文字内容朗读出来的音节数：汉字和谚文每字一个，英文单词按元音组计算，数字每位一个"""
+    text = text or ""
+    count = len(_CJK.findall(text)) + 0.6 * len(_KANA.findall(text)) + len(_DIGIT.findall(text))
+    for word in _WORD.findall(text):
+        count += max(1, len(_VOWELS.findall(word)))
+    return count
+
+
+def speech_seconds(samples, rate, rules=None):
+    """
+    用帧能量检测估算有语音的时长
+
+    参数:
+        samples (np.ndarray): 单声道float32样本
+        rate (int): 采样率
+        rules (dict): 检测参数，见 DEFAULT_RULES
+
+    返回:
+        float: 有语音的秒数
+    """
+    rules = dict(DEFAULT_RULES, **(rules or {}))
+    frame = max(1, int(rate * rules["frame_ms"] / 1000))
+    count = len(samples) // frame
+    if count == 0:
+        return 0.0
+
+    frames = samples[:count * frame].reshape(count, frame)
+    level_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    # 以较安静的10%帧作为底噪估计，适应不同录音环境的本底噪声
+    noise_db, peak_db = np.percentile(level_db, [10, 90])
+    if peak_db - noise_db < rules["noise_margin_db"]:
+        # 安静的帧与响亮的帧相差不到阈值（连续说话或音乐，没有停顿），估计不出底噪，
+        # 只按绝对阈值判定，否则没有任何一帧会被当作语音
+        voiced = level_db > rules["min_level_db"]
+    else:
+        voiced = level_db > max(noise_db + rules["noise_margin_db"], rules["min_level_db"])
+
+    hangover = int(rules["hangover_ms"] / rules["frame_ms"])
+    if hangover > 0 and voiced.any():
+        # 卷积实现的膨胀：语音帧前后 hangover 帧内的帧也算作语音
+        voiced = np.convolve(voiced.astype(np.int32), np.ones(2 * hangover + 1, dtype=np.int32), mode="same") > 0
+    return float(np.count_nonzero(voiced)) * frame / rate
+
+
+def check_transcript(path, text, rules=None):
+    """
+    检查文字内容的长度与音频是否相符
+
+    参数:
+        path (str): 音频文件路径
+        text (str): 参考音频文字内容
+        rules (dict): 检查规则，见 DEFAULT_RULES
+
+    返回:
+        dict: ok(是否相符，无法检查时为None), syllables(估算音节数), duration(总时长),
+              speech(有语音的时长), rate(音节/秒), message(说明)
+    """
+    rules = dict(DEFAULT_RULES, **(rules or {}))
+    syllables = count_syllables(text)
+    report = {"ok": None, "syllables": syllables, "duration": None, "speech": None, "rate": None, "message": None}
+    if syllables == 0:
+        report.update(ok=False, message="文字内容中没有可朗读的文字")
+        return report
+
+    try:
+        samples, rate = decode_audio(path)
+    except Exception as e:
+        report["message"] = f"无法解码音频，跳过检查: {e}"
+        return report
+    samples = to_mono(samples)
+    speech = speech_seconds(samples, rate, rules)
+    report.update(duration=len(samples) / rate, speech=speech)
+    if speech <= 0:
+        report.update(ok=False, message="音频中没有检测到语音")
+        return report
+
+    report["rate"] = syllables / speech
+    summary = (f"约 {syllables:.0f} 个音节，语音 {speech:.1f} 秒（{report['rate']:.1f} 音节/秒，"
+               f"正常范围 {rules['min_rate']:g}-{rules['max_rate']:g}）")
+    if report["rate"] < rules["min_rate"]:
+        report.update(ok=False, message=f"文字内容比音频短很多，可能漏写了部分内容：{summary}")
+    elif report["rate"] > rules["max_rate"]:
+        report.update(ok=False, message=f"文字内容比音频长很多，可能多写了内容或对应了别的音频：{summary}")
+    else:
+        report.update(ok=True, message=summary)
+    return report
+
+
+def _check_item(args):
+    return check_transcript(*args)
+
+
+def check_items(items, rules=None, max_workers=None):
+    """
+    在进程池中并行检查批量条目
+
+    参数:
+        items (list): 条目列表，见 batch_upload.load_manifest / scan_directory
+        rules (dict): 检查规则，见 DEFAULT_RULES
+        max_workers (int): 进程数，默认为CPU核数
+
+    返回:
+        list: 与 items 顺序一致的检查结果，见 check_transcript
+    """
+    if not items:
+        return []
+    tasks = [(item["file"], item["text"], rules) for item in items]
+    if len(tasks) == 1:
+        return [_check_item(tasks[0])]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # 单个检查只有几毫秒，分块提交以减少进程间通信的开销
+        return list(executor.map(_check_item, tasks, chunksize=max(1, len(tasks) // 64)))
@@ -0,0 +1,252 @@
+"""
+音色试听
+
+上传得到uri后，用语音合成接口（/v1/audio/speech）合成一句测试文本来试听。合成结果按
+(账号, uri, 模型, 文本) 缓存在本地磁盘上，总大小超过上限时淘汰最久未使用的，同一句话重复
+试听不再调用接口。缓存只对同一账号的Key生效，已被服务端拒绝的Key也不会读到缓存。未命中
+缓存时边接收边产出音频块，界面可以在合成完成之前开始播放。
+
+缓存目录默认为数据目录下的 preview，大小上限由环境变量 VOICE_UPLOAD_PREVIEW_CACHE_MB 设置。
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+
+from app_paths import get_data_dir
+from key_check import key_check_cache
+from siliconflow_client import account_fingerprint, get_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEXT = "你好，这是我的声音。今天天气真不错，我们一起出去走走吧。"
+
+# 缓存总大小上限（MB）
+DEFAULT_MAX_MB = 200
+
+# 请求的音频格式，mp3 体积小，浏览器可以边下载边播放
+RESPONSE_FORMAT = "mp3"
+
+# 流式产出的音频块大小
+CHUNK_SIZE = 16 * 1024
+
+# 试听文本的长度上限，只用来听音色，不需要长文本
+MAX_TEXT_LENGTH = 200
+
+
+class PreviewError(Exception):
+    """合成失败，消息可以直接展示给用户"""
+
+
+def preview_key(account, uri, model, text):
+    """缓存键：(账号标识, uri, 模型, 文本) 的SHA-256，账号标识见 siliconflow_client.account_fingerprint"""
+    return hashlib.sha256(json.dumps([account, uri, model, text], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class PreviewCache:
+    """
+    按最近使用时间淘汰的合成音频磁盘缓存
+
+    参数:
+        directory (str): 缓存目录，默认为数据目录下的 preview
+        max_bytes (int): 总大小上限（字节），默认读取环境变量 VOICE_UPLOAD_PREVIEW_CACHE_MB
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.path.join(get_data_dir(), "preview")
+        os.makedirs(self.directory, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = float(os.environ.get("VOICE_UPLOAD_PREVIEW_CACHE_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    uri TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_uri ON entries (uri)")
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.{RESPONSE_FORMAT}")
+
+    def get(self, account, uri, model, text):
+        """
+        查找缓存的合成结果并更新其使用时间
+
+        参数:
+            account (str): 账号标识，不同账号的缓存互不可见
+
+        返回:
+            str: 音频文件路径，未命中时返回None
+        """
+        key = preview_key(account, uri, model, text)
+        path = self._path(key)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT size FROM entries WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(path):
+                # 文件被手动删除，索引随之清理
+                self._conn.execute("DELETE FROM entries WHERE key=?", (key,))
+                return None
+            self._conn.execute("UPDATE entries SET last_used=? WHERE key=?", (time.time(), key))
+        return path
+
+    def temp_path(self):
+        """写入中的临时文件路径，写完后交给 put()"""
+        return os.path.join(self.directory, f".{uuid.uuid4().hex}.part")
+
+    def put(self, account, uri, model, text, temp_path):
+        """
+        把写完的临时文件登记到缓存，超出大小上限时淘汰最久未使用的条目
+
+        返回:
+            str: 缓存中的文件路径
+        """
+        key = preview_key(account, uri, model, text)
+        path = self._path(key)
+        os.replace(temp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                               (key, uri, os.path.getsize(path), time.time()))
+        self.evict()
+        return path
+
+    def evict(self):
+        """
+        淘汰最久未使用的条目直到总大小不超过上限
+
+        返回:
+            int: 淘汰的条目数
+        """
+        removed = []
+        with self._lock, self._conn:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                removed.append(key)
+                total -= size
+            self._conn.executemany("DELETE FROM entries WHERE key=?", [(key,) for key in removed])
+        for key in removed:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        return len(removed)
+
+    def forget(self, uris):
+        """删除指定音色的所有缓存（音色已在服务端删除），返回删除的条目数"""
+        with self._lock, self._conn:
+            keys = [key for uri in set(uris)
+                    for (key,) in self._conn.execute("SELECT key FROM entries WHERE uri=?", (uri,))]
+            self._conn.executemany("DELETE FROM entries WHERE key=?", [(key,) for key in keys])
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+        return len(keys)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_preview_cache():
+    """获取进程内共享的试听缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PreviewCache()
+    return _cache
+
+
+def iter_preview(api_key, uri, model, text=None, chunk_size=CHUNK_SIZE):
+    """
+    合成试听音频，命中缓存时直接读取本地文件，否则边接收边产出，接收完整后写入缓存
+
+    参数:
+        api_key (str): 硅基流动API密钥
+        uri (str): 音色ID
+        model (str): 模型名称
+        text (str): 试听文本，默认为 DEFAULT_TEXT
+        chunk_size (int): 产出的音频块大小
+
+    产出:
+        bytes: 音频数据块（mp3）
+
+    异常:
+        PreviewError: 参数无效或合成失败
+    """
+    uri = (uri or "").strip()
+    model = (model or "").strip()
+    text = (text or "").strip() or DEFAULT_TEXT
+    if not api_key:
+        raise PreviewError("错误：请输入API Key")
+    if not uri:
+        raise PreviewError("错误：请输入要试听的音色ID (uri)")
+    if len(text) > MAX_TEXT_LENGTH:
+        raise PreviewError(f"错误：试听文本过长，请控制在{MAX_TEXT_LENGTH}字以内")
+
+    verdict = key_check_cache.lookup(api_key)
+    if verdict is not None and verdict["valid"] is False:
+        raise PreviewError(f"错误：API Key无效（状态码 {verdict['status_code']}），请检查后重试")
+
+    cache = get_preview_cache()
+    account = account_fingerprint(api_key)
+    path = cache.get(account, uri, model, text)
+    if path is not None:
+        logger.info(f"试听命中缓存: {uri}")
+        with open(path, "rb") as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+        return
+
+    try:
+        response = get_client().synthesize_speech(api_key, model, text, uri, RESPONSE_FORMAT)
+    except Exception as e:
+        logger.error(f"试听合成请求失败: {e}")
+        raise PreviewError(f"试听合成请求失败: {e}")
+    key_check_cache.record(api_key, response.status_code)
+    with response:
+        if response.status_code != 200:
+            logger.error(f"试听合成失败: {response.status_code} - {response.text[:500]}")
+            raise PreviewError(f"试听合成失败，状态码: {response.status_code}\n\n{response.text}")
+
+        temp_path = cache.temp_path()
+        complete = False
+        try:
+            with open(temp_path, "wb") as f:
+                try:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        yield chunk
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"接收试听音频中断: {e}")
+                    raise PreviewError(f"接收试听音频中断: {e}")
+            complete = True
+        finally:
+            # 中途失败或调用方停止读取时不缓存不完整的音频
+            if complete:
+                cache.put(account, uri, model, text, temp_path)
+            else:
+                try:
+                    os.remove(temp_path)
+                except FileNotFoundError:
+                    pass
@@ -1,14 +1,34 @@
-import gradio as gr
-import requests
+import asyncio
 import os
 import tempfile
 import logging
+import multiprocessing
 import sys
-import subprocess
-import threading
-import webbrowser
-import json  # 添加这一行
-from pathlib import Path
+
+import batch_upload
+import log_config
+import metrics
+from job_queue import get_job_queue, format_job
+from voice_cache import TABLE_COLUMNS
+# 核心功能在 voice_api 中实现，这里导入以保持原有的调用方式；Gradio 只在创建界面时加载
+from voice_api import (
+    check_upload_params,
+    upload_voice_file,
+    upload_voice_file_async,
+    iter_batch_upload,
+    check_api_key,
+    fetch_voice_list,
+    get_voice_list,
+    query_voice_table,
+    query_voice_table_async,
+)
+from siliconflow_client import async_backend_available
+from tts_preview import DEFAULT_TEXT as PREVIEW_TEXT, PreviewError, iter_preview
+from upload_staging import staging_enabled, get_upload_spool
+
+# 同时执行的事件数。上传和查询由异步处理函数在事件循环中等待，不再各自占用一个线程，
+# 多个用户或多个标签页同时操作时互不阻塞
+QUEUE_CONCURRENCY = 16
 
 # 禁用代理设置
 os.environ['HTTP_PROXY'] = ''
@@ -17,10 +37,10 @@ os.environ['http_proxy'] = ''
 os.environ['https_proxy'] = ''
 
 # 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format=log_config.TEXT_FORMAT)
 logger = logging.getLogger(__name__)
 
-def upload_voice(api_key, audio_file, model_name, voice_name, voice_text):
+def upload_voice(api_key, audio_file, model_name, voice_name, voice_text, preprocess=False, progress=None):
     """
     上传音频文件创建自定义参考音色
     
@@ -30,323 +50,194 @@ def upload_voice(api_key, audio_file, model_name, voice_name, voice_text):
         model_name (str): 模型名称
         voice_name (str): 参考音频名称
         voice_text (str): 参考音频文字内容
+        preprocess (bool): 上传前是否预处理音频（单声道、重采样、去除首尾静音）
+        progress (gr.Progress): Gradio注入的进度条，显示已发送的字节数
         
     返回:
         str: 上传结果信息
     """
-    # 参数验证
-    if not api_key:
-        return "错误：请输入API Key"
-    if not audio_file:
-        return "错误：请上传音频文件"
-    if not voice_name:
-        return "错误：请输入参考音频名称"
-    if not voice_text:
-        return "错误：请输入参考音频文字内容"
-    
+    staged = _stage(audio_file)
     try:
-        # 准备API请求
-        url = "https://api.siliconflow.cn/v1/uploads/audio/voice"
-        headers = {
-            "Authorization": f"Bearer {api_key.strip()}"  # 去除可能的空格
-        }
-        
-        # 检查文件是否存在
-        if not os.path.exists(audio_file):
-            return f"错误：文件不存在 - {audio_file}"
-            
-        # 检查文件大小
-        file_size = os.path.getsize(audio_file) / (1024 * 1024)  # 转换为MB
-        if file_size > 50:  # 假设最大限制为50MB
-            return f"错误：文件过大 ({file_size:.2f}MB)，请上传小于50MB的文件"
-        
-        logger.info(f"准备上传文件: {os.path.basename(audio_file)}, 大小: {file_size:.2f}MB")
-        
-        files = {
-            "file": open(audio_file, "rb")
-        }
-        data = {
-            "model": model_name.strip(),
-            "customName": voice_name.strip(),
-            "text": voice_text.strip()
-        }
-        
-        # 发送请求
-        logger.info("发送API请求...")
-        response = requests.post(url, headers=headers, files=files, data=data, timeout=60)
-        
-        # 显示响应
-        if response.status_code == 200:
-            result = response.json()
-            logger.info(f"上传成功: {result}")
-            if "uri" in result:
-                return f"上传成功！\n\n音色ID (uri): {result['uri']}\n\n您可以将此ID作为后续请求中的voice参数使用。"
-            else:
-                return f"上传成功，但未返回uri字段\n\n{result}"
-        else:
-            logger.error(f"上传失败: {response.status_code} - {response.text}")
-            return f"上传失败，状态码: {response.status_code}\n\n{response.text}"
-    except requests.exceptions.Timeout:
-        logger.error("请求超时")
-        return "错误：请求超时，请稍后重试"
-    except requests.exceptions.ConnectionError:
-        logger.error("连接错误")
-        return "错误：无法连接到服务器，请检查网络连接"
-    except Exception as e:
-        logger.exception("上传过程中发生错误")
-        return f"发生错误: {str(e)}"
+        outcome = upload_voice_file(
+            api_key, staged["path"] if staged else _file_path(audio_file), model_name, voice_name, voice_text,
+            progress_callback=_progress_callback(progress),
+            preprocess_options={} if preprocess else None,
+            content_hash=staged["sha256"] if staged else None
+        )
     finally:
-        # 确保文件被关闭
-        if 'files' in locals() and 'file' in files:
-            files['file'].close()
-
-def validate_api_key(api_key):
-    """验证API密钥格式"""
-    if not api_key:
-        return "请输入API Key"
-    if len(api_key.strip()) < 10:  # 假设API Key至少有10个字符
-        return "API Key格式可能不正确"
-    return None
+        if staged:
+            get_upload_spool().release(staged)
+    return format_upload_outcome(outcome)
 
-def create_electron_files():
-    """创建Electron应用所需的文件"""
-    # 创建package.json
-    package_json = {
-        "name": "voice-upload-tool",
-        "version": "1.0.0",
-        "description": "硅基流动参考音色上传工具",
-        "main": "main.js",
-        "scripts": {
-            "start": "electron ."
-        },
-        "dependencies": {
-            "electron": "^28.0.0"
-        }
-    }
-    
-    # 创建main.js，添加隐藏菜单栏的代码
-    main_js = """
-const { app, BrowserWindow, Menu } = require('electron');
-const path = require('path');
-const url = require('url');
-
-let mainWindow;
-
-function createWindow() {
-  // 创建浏览器窗口
-  mainWindow = new BrowserWindow({
-    width: 1000,
-    height: 800,
-    webPreferences: {
-      nodeIntegration: true
-    },
-    title: '硅基流动参考音色上传工具'
-  });
-
-  // 隐藏菜单栏
-  Menu.setApplicationMenu(null);
-
-  // 加载应用
-  mainWindow.loadURL('http://127.0.0.1:7860/');
-  
-  // 打开开发者工具
-  // mainWindow.webContents.openDevTools();
-
-  // 当窗口关闭时触发
-  mainWindow.on('closed', function () {
-    mainWindow = null;
-    // 关闭Python服务器
-    process.exit();
-  });
-}
-
-// 当Electron完成初始化并准备创建浏览器窗口时调用此方法
-app.on('ready', createWindow);
-
-// 当所有窗口关闭时退出应用
-app.on('window-all-closed', function () {
-  if (process.platform !== 'darwin') {
-    app.quit();
-  }
-});
+async def upload_voice_async(api_key, audio_file, model_name, voice_name, voice_text, preprocess=False, progress=None):
+    """上传音频文件创建自定义参考音色，upload_voice 的协程版本，参数和返回值相同"""
+    staged = await asyncio.get_running_loop().run_in_executor(None, _stage, audio_file)
+    try:
+        outcome = await upload_voice_file_async(
+            api_key, staged["path"] if staged else _file_path(audio_file), model_name, voice_name, voice_text,
+            progress_callback=_progress_callback(progress),
+            preprocess_options={} if preprocess else None,
+            content_hash=staged["sha256"] if staged else None
+        )
+    finally:
+        if staged:
+            get_upload_spool().release(staged)
+    return format_upload_outcome(outcome)
 
-app.on('activate', function () {
-  if (mainWindow === null) {
-    createWindow();
-  }
-});
-"""
-    
-    # 创建electron目录
-    electron_dir = Path("electron_app")
-    electron_dir.mkdir(exist_ok=True)
-    
-    # 写入文件
-    with open(electron_dir / "package.json", "w", encoding="utf-8") as f:
-        import json
-        json.dump(package_json, f, indent=2)
-    
-    with open(electron_dir / "main.js", "w", encoding="utf-8") as f:
-        f.write(main_js)
-    
-    logger.info("Electron文件创建完成")
-    return electron_dir
+def _file_path(value):
+    """旧版Gradio的 gr.File 返回临时文件对象，新版返回路径字符串"""
+    return getattr(value, "name", value)
 
-def find_npm():
-    """尝试在常见的安装位置查找npm"""
-    # 检查是否已在PATH中
+def _stage(audio_file):
+    """暂存模式下把上传的文件登记到暂存区并计算哈希，未开启或失败时返回None，直接使用原文件"""
+    path = _file_path(audio_file)
+    if not staging_enabled() or not path or not os.path.exists(path):
+        return None
     try:
-        subprocess.run(["npm", "--version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return "npm"  # npm在PATH中可用
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        pass
-    
-    # 常见的Node.js安装路径
-    common_paths = [
-        r"C:\Program Files\nodejs\npm.cmd",
-        r"C:\Program Files (x86)\nodejs\npm.cmd",
-        r"C:\ProgramData\nodejs\npm.cmd",
-        os.path.expanduser("~\\AppData\\Roaming\\npm\\npm.cmd"),
-        r"C:\ProgramData\Microsoft\Windows\Start Menu\Programs\Node.js\npm.cmd"
-    ]
-    
-    # 检查Node.js安装目录
-    nodejs_dir = os.environ.get("ProgramFiles") + "\\nodejs"
-    if os.path.exists(nodejs_dir):
-        common_paths.append(os.path.join(nodejs_dir, "npm.cmd"))
-    
-    # 尝试在注册表中查找Node.js安装路径
-    try:
-        import winreg
-        key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Node.js")
-        value, _ = winreg.QueryValueEx(key, "InstallPath")
-        if value:
-            common_paths.append(os.path.join(value, "npm.cmd"))
-    except:
-        pass
-    
-    # 检查每个可能的路径
-    for path in common_paths:
-        if os.path.exists(path):
-            logger.info(f"找到npm: {path}")
-            return path
+        return get_upload_spool().stage(path)
+    except OSError as e:
+        logger.warning(f"暂存上传文件失败，直接使用原文件: {e}")
+        return None
+
+def _progress_callback(progress):
+    """把Gradio进度条包装为上传进度回调，没有进度条时返回None"""
+    if progress is None:
+        return None
     
-    return None
+    def on_progress(bytes_sent, total):
+        progress(bytes_sent / total, desc=f"已上传 {bytes_sent / (1024 * 1024):.2f}MB / {total / (1024 * 1024):.2f}MB")
+    return on_progress
 
-def launch_electron_app(electron_dir):
-    """启动Electron应用"""
-    try:
-        # 查找npm
-        npm_cmd = find_npm()
-        if not npm_cmd:
-            raise FileNotFoundError("未找到npm命令")
-        
-        # 检查electron_app目录中是否已安装依赖
-        node_modules_path = electron_dir / "node_modules"
-        if not node_modules_path.exists():
-            # 安装依赖
-            logger.info("安装Electron依赖...")
-            if npm_cmd == "npm":
-                # npm在PATH中可用
-                subprocess.run(["npm", "install"], cwd=electron_dir, check=True)
-            else:
-                # 使用完整路径
-                subprocess.run([npm_cmd, "install"], cwd=electron_dir, check=True)
-        
-        # 启动Electron应用
-        logger.info("启动Electron应用...")
-        if npm_cmd == "npm":
-            subprocess.Popen(["npm", "start"], cwd=electron_dir)
+def format_upload_outcome(outcome):
+    """把上传结果转换为界面上显示的文字"""
+    if outcome["ok"]:
+        if outcome.get("duplicate"):
+            return f"该音频已上传过，未重复创建音色。\n\n音色ID (uri): {outcome['uri']}\n\n您可以将此ID作为后续请求中的voice参数使用。"
+        if outcome["uri"]:
+            return f"上传成功！\n\n音色ID (uri): {outcome['uri']}\n\n您可以将此ID作为后续请求中的voice参数使用。"
         else:
-            subprocess.Popen([npm_cmd, "start"], cwd=electron_dir)
-        return True
-        
-    except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        logger.error(f"未安装npm或安装依赖失败: {e}")
-        logger.error("将使用浏览器打开应用")
-        webbrowser.open("http://127.0.0.1:7860/")
-        return False
-    except Exception as e:
-        logger.exception(f"启动Electron应用失败: {e}")
-        webbrowser.open("http://127.0.0.1:7860/")
-        return False
+            return f"上传成功，但未返回uri字段\n\n{outcome['result']}"
+    return outcome["error"]
 
-# 创建Gradio界面
-def get_voice_list(api_key):
-    """获取音频列表"""
+def batch_upload_voices(api_key, manifest_file, directory, model_name, concurrency, max_retries, preprocess=False):
+    """
+    批量上传音频（Gradio生成器，逐条输出进度）
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        manifest_file (str): 清单文件路径（CSV/JSONL），与directory二选一
+        directory (str): 音频目录路径，每个音频需有同名.txt文字文件
+        model_name (str): 清单未指定model时使用的模型
+        concurrency (int): 最大并发数
+        max_retries (int): 失败重试次数
+        preprocess (bool): 上传前是否预处理音频，预处理在进程池中进行
+        
+    产出:
+        str: 当前进度信息
+    """
     if not api_key:
-        return "错误：请输入API Key"
+        yield "错误：请输入API Key"
+        return
     
     try:
-        url = "https://api.siliconflow.cn/v1/audio/voice/list"
-        headers = {
-            "Authorization": f"Bearer {api_key.strip()}"
-        }
-        
-        logger.info("发送API请求...")
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            result = response.json()
-            formatted_result = json.dumps(result, indent=2, ensure_ascii=False)
-            logger.info("获取列表成功")
-            return formatted_result
+        if manifest_file:
+            # 旧版Gradio返回临时文件对象，新版返回路径字符串
+            manifest_path = getattr(manifest_file, "name", manifest_file)
+            items = batch_upload.load_manifest(manifest_path, model_name.strip() or batch_upload.DEFAULT_MODEL)
+        elif directory and os.path.isdir(directory.strip()):
+            items = batch_upload.scan_directory(directory.strip(), model_name.strip() or batch_upload.DEFAULT_MODEL)
         else:
-            logger.error(f"获取列表失败: {response.status_code} - {response.text}")
-            return f"获取失败，状态码: {response.status_code}\n\n{response.text}"
-            
-    except requests.exceptions.Timeout:
-        logger.error("请求超时")
-        return "错误：请求超时，请稍后重试"
-    except requests.exceptions.ConnectionError:
-        logger.error("连接错误")
-        return "错误：无法连接到服务器，请检查网络连接"
+            yield "错误：请上传清单文件或填写有效的音频目录"
+            return
     except Exception as e:
-        logger.exception("获取列表过程中发生错误")
-        return f"发生错误: {str(e)}"
+        logger.exception("读取批量清单失败")
+        yield f"读取清单失败: {str(e)}"
+        return
+    
+    if not items:
+        yield "清单中没有可上传的条目"
+        return
+    
+    lines = []
+    stats = batch_upload.BatchStats(len(items))
+    for result in iter_batch_upload(api_key, items, int(concurrency), int(max_retries), preprocess):
+        stats.add(result)
+        lines.append(batch_upload.format_progress(result, stats.done, stats.total))
+        yield "\n".join(lines)
+    
+    yield batch_upload.format_summary(stats.summary()) + "\n\n" + "\n".join(lines)
 
-def create_gradio_interface():
+def submit_upload_job(api_key, audio_file, model_name, voice_name, voice_text, preprocess=False):
     """
-    获取音频列表
+    提交后台上传任务，立即返回任务ID，关闭页面或重启程序都不会丢失任务
     
     参数:
         api_key (str): 硅基流动API密钥
+        audio_file (str): 音频文件路径
+        model_name (str): 模型名称
+        voice_name (str): 参考音频名称
+        voice_text (str): 参考音频文字内容
+        preprocess (bool): 上传前是否预处理音频
         
     返回:
-        str: 音频列表信息
+        str: 提交结果信息
     """
-    if not api_key:
-        return "错误：请输入API Key"
+    audio_file = _file_path(audio_file)
+    error = check_upload_params(api_key, audio_file, voice_name, voice_text)
+    if error:
+        return error
     
     try:
-        url = "https://api.siliconflow.cn/v1/audio/voice/list"
-        headers = {
-            "Authorization": f"Bearer {api_key.strip()}"
-        }
-        
-        logger.info("发送API请求...")
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code == 200:
-            result = response.json()
-            formatted_result = json.dumps(result, indent=2, ensure_ascii=False)
-            logger.info("获取列表成功")
-            return formatted_result
-        else:
-            logger.error(f"获取列表失败: {response.status_code} - {response.text}")
-            return f"获取失败，状态码: {response.status_code}\n\n{response.text}"
-            
-    except requests.exceptions.Timeout:
-        logger.error("请求超时")
-        return "错误：请求超时，请稍后重试"
-    except requests.exceptions.ConnectionError:
-        logger.error("连接错误")
-        return "错误：无法连接到服务器，请检查网络连接"
+        # Gradio的临时文件可能被清理，保存一份到任务目录（同一文件系统时为硬链接）
+        job_id = get_job_queue().submit(api_key, audio_file, voice_name, voice_text, model_name, preprocess, copy_file=True)
     except Exception as e:
-        logger.exception("获取列表过程中发生错误")
-        return f"发生错误: {str(e)}"
+        logger.exception("提交后台任务失败")
+        return f"提交后台任务失败: {str(e)}"
+    return f"已提交后台任务 #{job_id}\n\n可在“后台任务”中查看进度，关闭页面不影响任务执行。"
+
+def preview_voice(api_key, uri, model_name, text):
+    """
+    试听音色，合成的音频块边接收边交给界面播放，相同的 (uri, 模型, 文本) 直接使用本地缓存
+    
+    产出:
+        tuple: (音频数据块, 状态信息)
+    """
+    try:
+        for chunk in iter_preview(api_key, uri, model_name, text):
+            yield chunk, ""
+    except PreviewError as e:
+        yield None, str(e)
+
+def selected_voice_uri(table, row):
+    """音频列表中选中行的uri"""
+    rows = table.values.tolist() if hasattr(table, "values") else (table or [])
+    if row is None or row >= len(rows):
+        return ""
+    return rows[row][TABLE_COLUMNS.index("uri")]
+
+def list_upload_jobs(api_key):
+    """查看当前账号的后台任务"""
+    if not api_key:
+        return "错误：请输入API Key"
+    
+    queue = get_job_queue()
+    # 程序重启后，账号重新提供API Key时继续执行其未完成的任务
+    queue.register_key(api_key)
+    jobs = queue.list_jobs(api_key)
+    if not jobs:
+        return "暂无后台任务"
+    return f"未完成 {queue.pending_count(api_key)} 个\n\n" + "\n".join(format_job(job) for job in jobs)
 
 def create_gradio_interface():
+    # 暂存模式下浏览器上传的文件直接写入暂存区，需在导入Gradio之前设置
+    if staging_enabled():
+        spool = get_upload_spool()
+        spool.configure_gradio()
+        spool.evict()
+    
+    # 导入Gradio耗时数秒，只在启动界面时加载
+    import gradio as gr
+    
     # 定义颜色变量
     primary_color = "#6366f1"  # 紫色
     light_bg_color = "#f3f4f6"  # 浅灰色背景
@@ -377,16 +268,30 @@ def create_gradio_interface():
                 # 音频上传区域
                 with gr.Group(elem_id="audio-upload-group"):
                     gr.Markdown(f'<div style="background-color: {light_bg_color}; padding: 8px; border-radius: 5px;"><h3 style="margin: 0;">音频</h3></div>')
-                    audio_file = gr.Audio(
-                        label="", 
-                        type="filepath",
-                        format="mp3",
-                        elem_id="audio-upload"
-                    )
+                    if staging_enabled():
+                        # gr.Audio 会把上传的文件解码后重新编码，暂存模式下改用 gr.File 原样接收
+                        audio_file = gr.File(
+                            label="",
+                            file_types=["audio"],
+                            elem_id="audio-upload"
+                        )
+                    else:
+                        audio_file = gr.Audio(
+                            label="", 
+                            type="filepath",
+                            format="mp3",
+                            elem_id="audio-upload"
+                        )
                     
                     with gr.Row():
                         gr.Button("⬆️", size="sm")
                         gr.Button("🎤", size="sm")
+                    
+                    preprocess = gr.Checkbox(
+                        label="上传前预处理（转单声道、重采样、去除首尾静音）",
+                        value=False,
+                        elem_id="preprocess-checkbox"
+                    )
                 
                 # 参考音频文字内容（移到这里）
                 with gr.Group(elem_id="voice-text-group"):
@@ -407,6 +312,7 @@ def create_gradio_interface():
                         type="password",
                         elem_id="api-key-input"
                     )
+                    api_key_status = gr.Markdown("", elem_id="api-key-status")
             
             # 右侧区域 - 模型名称和参考音频名称
             with gr.Column(scale=1):
@@ -433,6 +339,7 @@ def create_gradio_interface():
             with gr.Column(scale=1):
                 with gr.Row():
                     submit_btn = gr.Button("提交上传", variant="primary", size="lg", elem_id="submit-button")
+                    job_btn = gr.Button("提交到后台队列", variant="secondary", size="lg", elem_id="job-button")
                     query_btn = gr.Button("查询音频列表", variant="secondary", size="lg", elem_id="query-button")
                 
                 # 结果显示区域
@@ -443,28 +350,172 @@ def create_gradio_interface():
                         lines=10,  # 增加显示行数
                         elem_id="result-output"
                     )
+                
+                # 音频列表
+                with gr.Group(elem_id="voice-list-group"):
+                    gr.Markdown(f'<div style="background-color: {light_bg_color}; padding: 8px; border-radius: 5px;"><h3 style="margin: 0;">音频列表</h3></div>')
+                    with gr.Row():
+                        voice_filter = gr.Textbox(
+                            label="过滤",
+                            placeholder="输入名称、模型、uri或文字内容后回车，可加 model:模型 after:2026-01-01 before:2026-02-01",
+                            scale=3,
+                            elem_id="voice-filter"
+                        )
+                        voice_page = gr.Number(
+                            label="页码",
+                            value=1,
+                            precision=0,
+                            scale=1,
+                            elem_id="voice-page"
+                        )
+                    voice_status = gr.Markdown("")
+                    voice_table = gr.Dataframe(
+                        headers=TABLE_COLUMNS,
+                        datatype=["str"] * len(TABLE_COLUMNS),
+                        interactive=False,
+                        wrap=True,
+                        elem_id="voice-table"
+                    )
 
-        # 添加查询按钮事件
+        # 安装了httpx时使用异步处理函数，请求在事件循环中等待，不占用Gradio的工作线程
+        use_async = async_backend_available()
+        if not use_async:
+            logger.warning("未安装httpx，界面使用同步请求")
+        if use_async:
+            async def refresh_voices(key, keyword):
+                return await query_voice_table_async(key, keyword, 1, refresh=True)
+            async def query_first_page(key, keyword):
+                return await query_voice_table_async(key, keyword, 1)
+            query_page = query_voice_table_async
+        else:
+            def refresh_voices(key, keyword):
+                return query_voice_table(key, keyword, 1, refresh=True)
+            def query_first_page(key, keyword):
+                return query_voice_table(key, keyword, 1)
+            query_page = query_voice_table
+        
+        # 查询按钮向服务端确认列表是否有更新
         query_btn.click(
-            fn=get_voice_list,
-            inputs=[api_key],
-            outputs=output
+            fn=refresh_voices,
+            inputs=[api_key, voice_filter],
+            outputs=[voice_status, voice_table, voice_page]
         )
         
-        # 添加API Key验证
-        api_key.change(
-            fn=validate_api_key,
-            inputs=api_key,
-            outputs=gr.Textbox(visible=False)
+        # 检索和翻页只在本地索引上进行
+        voice_filter.submit(
+            fn=query_first_page,
+            inputs=[api_key, voice_filter],
+            outputs=[voice_status, voice_table, voice_page]
         )
+        voice_page.submit(
+            fn=query_page,
+            inputs=[api_key, voice_filter, voice_page],
+            outputs=[voice_status, voice_table, voice_page]
+        )
+        
+        # 输入完成（离开输入框或按回车）时检查一次API Key，不在每次按键时请求，结果有缓存
+        for event in ("blur", "submit"):
+            # 旧版Gradio的文本框没有 blur 事件
+            if hasattr(api_key, event):
+                getattr(api_key, event)(fn=check_api_key, inputs=api_key, outputs=api_key_status)
+        
+        # 提交按钮事件（通过默认参数让Gradio注入进度条）
+        def on_submit(api_key, audio_file, model_name, voice_name, voice_text, preprocess, progress=gr.Progress()):
+            return upload_voice(api_key, audio_file, model_name, voice_name, voice_text, preprocess, progress)
+        
+        async def on_submit_async(api_key, audio_file, model_name, voice_name, voice_text, preprocess, progress=gr.Progress()):
+            return await upload_voice_async(api_key, audio_file, model_name, voice_name, voice_text, preprocess, progress)
         
-        # 提交按钮事件
         submit_btn.click(
-            fn=upload_voice,
-            inputs=[api_key, audio_file, model_name, voice_name, voice_text],
+            fn=on_submit_async if use_async else on_submit,
+            inputs=[api_key, audio_file, model_name, voice_name, voice_text, preprocess],
             outputs=output
         )
         
+        job_btn.click(
+            fn=submit_upload_job,
+            inputs=[api_key, audio_file, model_name, voice_name, voice_text, preprocess],
+            outputs=output
+        )
+        
+        # 试听
+        with gr.Accordion("试听音色", open=False, elem_id="preview-accordion"):
+            gr.Markdown("用上方的模型合成一句话试听音色，点击音频列表中的一行可以自动填入uri。相同的音色和文本再次试听时直接使用本地缓存。")
+            with gr.Row():
+                preview_uri = gr.Textbox(label="音色ID (uri)", scale=2, elem_id="preview-uri")
+                preview_text = gr.Textbox(label="试听文本", value=PREVIEW_TEXT, scale=3, elem_id="preview-text")
+            preview_btn = gr.Button("试听", variant="secondary", elem_id="preview-button")
+            preview_status = gr.Markdown("")
+            preview_audio = gr.Audio(label="", streaming=True, autoplay=True, interactive=False, elem_id="preview-audio")
+        
+        preview_btn.click(
+            fn=preview_voice,
+            inputs=[api_key, preview_uri, model_name, preview_text],
+            outputs=[preview_audio, preview_status]
+        )
+        
+        def on_voice_select(table, evt: gr.SelectData):
+            return selected_voice_uri(table, evt.index[0] if isinstance(evt.index, (list, tuple)) else evt.index)
+        
+        voice_table.select(fn=on_voice_select, inputs=voice_table, outputs=preview_uri)
+        
+        # 后台任务
+        with gr.Accordion("后台任务", open=False, elem_id="jobs-accordion"):
+            jobs_refresh_btn = gr.Button("刷新任务状态", elem_id="jobs-refresh-button")
+            jobs_output = gr.Textbox(
+                label="",
+                lines=10,
+                elem_id="jobs-output"
+            )
+        
+        jobs_refresh_btn.click(
+            fn=list_upload_jobs,
+            inputs=[api_key],
+            outputs=jobs_output
+        )
+        
+        # 批量上传
+        with gr.Accordion("批量上传", open=False, elem_id="batch-accordion"):
+            gr.Markdown("上传清单文件（CSV/JSONL，字段：file, customName, text, model），或填写服务器上的音频目录（每个音频需有同名 .txt 文字文件）。API Key、默认模型和预处理选项使用上方填写的内容。")
+            with gr.Row():
+                manifest_file = gr.File(
+                    label="清单文件",
+                    file_types=[".csv", ".jsonl"],
+                    elem_id="batch-manifest"
+                )
+                with gr.Column():
+                    batch_dir = gr.Textbox(
+                        label="音频目录",
+                        placeholder="例如：D:\\voices",
+                        elem_id="batch-dir"
+                    )
+                    batch_concurrency = gr.Slider(
+                        label="并发数",
+                        minimum=1,
+                        maximum=16,
+                        step=1,
+                        value=4
+                    )
+                    batch_retries = gr.Slider(
+                        label="失败重试次数",
+                        minimum=0,
+                        maximum=5,
+                        step=1,
+                        value=2
+                    )
+            batch_btn = gr.Button("开始批量上传", variant="primary", elem_id="batch-button")
+            batch_output = gr.Textbox(
+                label="批量上传进度",
+                lines=12,
+                elem_id="batch-output"
+            )
+
+        batch_btn.click(
+            fn=batch_upload_voices,
+            inputs=[api_key, manifest_file, batch_dir, model_name, batch_concurrency, batch_retries, preprocess],
+            outputs=batch_output
+        )
+
         # 使用说明
         with gr.Accordion("使用说明", open=False, elem_id="instructions-accordion"):
             gr.Markdown("""
@@ -540,6 +591,17 @@ def create_gradio_interface():
     
     return demo
 
+def enable_queue(demo, concurrency=QUEUE_CONCURRENCY):
+    """启用Gradio队列，兼容各版本的参数"""
+    try:
+        demo.queue(concurrency_count=concurrency)  # Gradio 3.x
+    except TypeError:
+        try:
+            demo.queue(default_concurrency_limit=concurrency)  # Gradio 4.x
+        except TypeError:
+            demo.queue()  # 旧版Gradio
+    return demo
+
 def is_packaged():
     """检查是否是打包后的环境"""
     return getattr(sys, 'frozen', False)
@@ -554,8 +616,8 @@ def get_resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
-def setup_logging():
-    """配置日志系统"""
+def setup_logging(name="voice_upload"):
+    """配置日志系统，日志经由队列在后台线程写入，文件按大小轮转（见 log_config）"""
     try:
         if is_packaged():
             # 打包环境下将日志写入临时目录
@@ -564,39 +626,45 @@ def setup_logging():
             # 开发环境下写入当前目录的 logs 文件夹
             log_dir = "logs"
         
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, "voice_upload.log")
-        
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logger.addHandler(file_handler)
-        
-        logger.info("日志系统初始化成功")
+        # 挂在根日志器上，voice_api 等模块的日志也写入文件
+        if log_config.setup_logging(log_dir, name):
+            logger.info("日志系统初始化成功")
     except Exception as e:
         print(f"设置日志系统时出错: {e}")
 
 if __name__ == "__main__":
+    # 打包后的程序在进程池（批量预处理）的子进程中不再重复启动界面
+    multiprocessing.freeze_support()
     try:
         # 设置日志
         setup_logging()
         
+        # 启动后台任务队列，继续执行上次未完成的任务
+        get_job_queue().start()
+        
+        # 在Gradio旁边提供 /metrics 接口，端口设为0时不启动
+        metrics_port = int(os.environ.get("VOICE_UPLOAD_METRICS_PORT", metrics.DEFAULT_METRICS_PORT))
+        if metrics_port:
+            try:
+                metrics.start_metrics_server("127.0.0.1", metrics_port)
+            except OSError as e:
+                logger.warning(f"指标接口启动失败: {e}")
+        
         # 创建 Gradio 界面
         demo = create_gradio_interface()
         
         # 启动 Gradio 服务器
         logger.info("启动 Gradio 服务器...")
-        # 兼容旧版本Gradio
-        try:
-            demo.queue(concurrency_count=1)  # 新版Gradio
-        except TypeError:
-            demo.queue()  # 旧版Gradio
-            
+        enable_queue(demo)
+        
+        # 多人共用或多进程部署请使用 server.py
+        host = os.environ.get("VOICE_UPLOAD_HOST", "127.0.0.1")
         demo.launch(
-            server_name="127.0.0.1",
-            server_port=7860,
+            server_name=host,
+            server_port=int(os.environ.get("VOICE_UPLOAD_PORT", 7860)),
             show_api=False,
             share=False,
-            inbrowser=True
+            inbrowser=host == "127.0.0.1"
         )
     except Exception as e:
         logger.exception("程序运行出错")
@@ -0,0 +1,201 @@
+"""
+服务端上传暂存区
+
+默认的 gr.Audio(type="filepath") 会把浏览器上传的文件写入Gradio临时目录，再完整解码并重新
+编码为mp3写出一份，上传前又要读一遍计算哈希。大文件在请求路径上会产生多份完整拷贝和一次转码。
+
+暂存模式（环境变量 VOICE_UPLOAD_STAGING=1）下：
+- Gradio的临时目录指向暂存区的 incoming 目录，浏览器上传的文件直接流式写入这里；
+- 界面改用 gr.File 接收音频，原样传给处理函数，不解码也不转码；
+- stage() 用硬链接把文件登记到暂存区（不在同一文件系统时复制），同一遍读取中计算SHA-256，
+  哈希直接交给去重索引，上传时不再重复计算。
+
+暂存区的总大小和文件存放时间都有上限（VOICE_UPLOAD_SPOOL_MB、VOICE_UPLOAD_SPOOL_MAX_AGE）。
+超过保留时间的文件都会被清理；总大小超出上限时，从最旧的开始清理 staged 目录中遗留的文件。
+incoming 目录中的文件是界面仍在引用的Gradio上传文件，只按保留时间清理。正在上传的文件和它的
+来源文件都不会被清理，硬链接的多个路径只按一份大小计算。
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from app_paths import get_data_dir
+
+logger = logging.getLogger(__name__)
+
+# 暂存区总大小上限（MB）和文件最长保留时间（秒）
+DEFAULT_MAX_MB = 2048
+DEFAULT_MAX_AGE = 6 * 3600
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def staging_enabled():
+    """是否开启暂存模式"""
+    return os.environ.get("VOICE_UPLOAD_STAGING", "").lower() in ("1", "true", "yes", "on")
+
+
+def link_or_copy(source, target, chunk_size=CHUNK_SIZE):
+    """
+    把文件放到目标路径：同一文件系统时创建硬链接（不复制数据），否则复制；
+    两种情况都只读取一遍文件，同时计算SHA-256
+
+    返回:
+        str: 文件内容的SHA-256
+    """
+    digest = hashlib.sha256()
+    try:
+        os.link(source, target)
+    except OSError:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+        return digest.hexdigest()
+    with open(target, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadSpool:
+    """
+    有容量上限的暂存目录
+
+    参数:
+        directory (str): 暂存目录，默认为环境变量 VOICE_UPLOAD_SPOOL_DIR 或数据目录下的 spool
+        max_bytes (int): 总大小上限（字节），默认读取环境变量 VOICE_UPLOAD_SPOOL_MB
+        max_age (float): 文件最长保留秒数，默认读取环境变量 VOICE_UPLOAD_SPOOL_MAX_AGE
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None):
+        self.directory = os.path.abspath(
+            directory or os.environ.get("VOICE_UPLOAD_SPOOL_DIR") or os.path.join(get_data_dir(), "spool")
+        )
+        self.incoming_dir = os.path.join(self.directory, "incoming")
+        self.staged_dir = os.path.join(self.directory, "staged")
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        os.makedirs(self.staged_dir, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = float(os.environ.get("VOICE_UPLOAD_SPOOL_MB", DEFAULT_MAX_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.max_age = float(os.environ.get("VOICE_UPLOAD_SPOOL_MAX_AGE", DEFAULT_MAX_AGE)) if max_age is None else max_age
+        # 正在上传的暂存文件 -> 来源文件（Gradio保存的上传文件）
+        self._in_use = {}
+        self._lock = threading.Lock()
+
+    def configure_gradio(self):
+        """让Gradio把上传的文件直接写入暂存区，需在导入Gradio之前调用；已设置 GRADIO_TEMP_DIR 时不覆盖"""
+        os.environ.setdefault("GRADIO_TEMP_DIR", self.incoming_dir)
+
+    def stage(self, path):
+        """
+        登记一个待上传的文件，在 release() 之前不会被清理
+
+        参数:
+            path (str): 浏览器上传后Gradio保存的文件
+
+        返回:
+            dict: path(暂存区中的路径), sha256(内容哈希), size(字节数)
+        """
+        target = os.path.join(self.staged_dir, f"{uuid.uuid4().hex}{os.path.splitext(path)[1].lower()}")
+        with self._lock:
+            self._in_use[target] = os.path.abspath(path)
+        try:
+            content_hash = link_or_copy(path, target)
+        except Exception:
+            self.release({"path": target})
+            raise
+        size = os.path.getsize(target)
+        self.evict()
+        return {"path": target, "sha256": content_hash, "size": size}
+
+    def release(self, staged):
+        """上传结束，删除暂存的文件"""
+        path = staged["path"]
+        with self._lock:
+            self._in_use.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """
+        清理超过保留时间的文件，总大小仍超过上限时从最旧的开始清理 staged 目录中的文件
+
+        返回:
+            int: 删除的文件数
+        """
+        now = time.time()
+        # 按 (设备, inode) 合并同一文件的多个硬链接：inode -> [最近修改时间, 大小, 路径列表]
+        inodes = {}
+        for directory in (self.incoming_dir, self.staged_dir):
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entry = inodes.setdefault((stat.st_dev, stat.st_ino), [stat.st_mtime, stat.st_size, []])
+                    entry[0] = max(entry[0], stat.st_mtime)
+                    entry[2].append(path)
+
+        with self._lock:
+            protected_paths = set(self._in_use) | set(self._in_use.values())
+        protected = set()
+        for path in protected_paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            protected.add((stat.st_dev, stat.st_ino))
+
+        total = sum(size for _, size, _ in inodes.values())
+        removed = 0
+
+        def remove(inode, paths):
+            nonlocal total, removed
+            entry = inodes[inode]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                entry[2].remove(path)
+                removed += 1
+            # 所有硬链接都删除后才真正释放空间
+            if not entry[2]:
+                total -= entry[1]
+                del inodes[inode]
+
+        candidates = sorted((entry[0], inode) for inode, entry in inodes.items() if inode not in protected)
+        for mtime, inode in candidates:
+            if now - mtime >= self.max_age:
+                remove(inode, list(inodes[inode][2]))
+        for mtime, inode in candidates:
+            if total <= self.max_bytes:
+                break
+            if inode in inodes:
+                remove(inode, [path for path in inodes[inode][2] if path.startswith(self.staged_dir + os.sep)])
+        if removed:
+            logger.info(f"暂存区清理了 {removed} 个文件，当前占用 {total / (1024 * 1024):.1f}MB")
+        return removed
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_upload_spool():
+    """获取进程内共享的暂存区"""
+    global _spool
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = UploadSpool()
+    return _spool
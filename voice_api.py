@@ -0,0 +1,636 @@
+"""
+硅基流动参考音色上传工具的核心接口
+
+上传、查询音色等功能都在这里实现，不依赖Gradio，命令行工具（cli.py）、脚本和
+图形界面（upload.py）共用同一套逻辑。导入本模块不会加载Gradio和NumPy，
+适合在定时任务和CI中频繁调用。
+
+带 _async 后缀的函数是供Gradio异步事件处理函数使用的协程版本，与同步版本共用检查、
+去重、预处理和结果处理逻辑，只是请求通过异步客户端发出。
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import audio_validate
+import batch_upload
+import metrics
+from dedup_index import get_dedup_index, hash_file
+from key_check import key_check_cache
+from key_pool import KeyPoolError
+from retry_policy import CircuitOpenError, is_connect_error
+from siliconflow_client import get_client, get_async_client
+from tts_preview import get_preview_cache
+from voice_cache import voice_list_cache, VoiceListError, paginate
+from voice_index import get_voice_index, parse_query
+
+logger = logging.getLogger(__name__)
+
+
+def check_upload_params(api_key, audio_file, voice_name, voice_text):
+    """
+    检查上传参数是否完整、音频文件是否存在
+    
+    返回:
+        str: 错误信息，参数有效时返回None
+    """
+    if not api_key:
+        return "错误：请输入API Key"
+    if not audio_file:
+        return "错误：请上传音频文件"
+    if not voice_name:
+        return "错误：请输入参考音频名称"
+    if not voice_text:
+        return "错误：请输入参考音频文字内容"
+    if not os.path.exists(audio_file):
+        return f"错误：文件不存在 - {audio_file}"
+    return None
+
+
+def upload_voice_file(api_key, audio_file, model_name, voice_name, voice_text, progress_callback=None, skip_duplicates=True,
+                      preprocess_options=None, preprocess_executor=None, validate=False, validation_rules=None,
+                      content_hash=None):
+    """
+    上传单个音频文件，返回结构化结果（单条上传和批量上传共用的执行单元）
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        audio_file (str): 音频文件路径
+        model_name (str): 模型名称
+        voice_name (str): 参考音频名称
+        voice_text (str): 参考音频文字内容
+        progress_callback (callable): 上传进度回调 progress_callback(bytes_sent, total)
+        skip_duplicates (bool): 相同的音频、模型和文字内容已上传过时直接返回已有的uri
+        preprocess_options (dict): 上传前预处理参数（见 audio_preprocess.DEFAULT_OPTIONS），为None时不预处理
+        preprocess_executor (Executor): 执行预处理的进程池，批量上传时使用，为None时在当前线程处理
+        validate (bool): 上传前在本地检查音频（格式、时长、采样率、削波、静音），未通过时不发送请求；
+                         需要预处理时检查预处理之后的文件
+        validation_rules (dict): 检查规则（见 audio_validate.DEFAULT_RULES）
+        content_hash (str): 已知的音频SHA-256（如暂存时已计算），提供时去重不再重新读取文件
+        
+    返回:
+        dict: ok(是否成功), uri(音色ID), result(接口返回内容), status_code(状态码),
+              error(错误信息), retryable(失败是否可重试), duplicate(是否命中去重索引)
+    """
+    outcome = _upload_voice_file(api_key, audio_file, model_name, voice_name, voice_text, progress_callback,
+                                 skip_duplicates, preprocess_options, preprocess_executor, validate, validation_rules,
+                                 content_hash)
+    if not outcome["ok"]:
+        metrics.UPLOADS.inc(result="failed")
+    else:
+        metrics.UPLOADS.inc(result="duplicate" if outcome.get("duplicate") else "success")
+    return outcome
+
+
+def _upload_voice_file(api_key, audio_file, model_name, voice_name, voice_text, progress_callback, skip_duplicates,
+                       preprocess_options, preprocess_executor, validate, validation_rules, content_hash):
+    upload_path = audio_file
+    try:
+        outcome, upload_path, content_hash = _prepare_upload(
+            api_key, audio_file, model_name, voice_name, voice_text, skip_duplicates,
+            preprocess_options, preprocess_executor, validate, validation_rules, content_hash
+        )
+        if outcome is not None:
+            return outcome
+        
+        # 发送请求（API Key的首尾空格由客户端去除）
+        fields = _request_fields(upload_path)
+        logger.info("发送API请求...", extra=fields)
+        started = time.monotonic()
+        response = get_client().upload_voice(
+            api_key,
+            upload_path,
+            model_name.strip(),
+            voice_name.strip(),
+            voice_text.strip(),
+            progress_callback=progress_callback
+        )
+        fields["latency"] = round(time.monotonic() - started, 3)
+        return _upload_response_outcome(api_key, response, content_hash, model_name, voice_name, voice_text, fields)
+    except Exception as e:
+        error, retryable = _request_error(e, "上传", idempotent=False)
+        return {"ok": False, "error": error, "retryable": retryable}
+    finally:
+        _remove_preprocessed(upload_path, audio_file)
+
+
+async def upload_voice_file_async(api_key, audio_file, model_name, voice_name, voice_text, progress_callback=None,
+                                  skip_duplicates=True, preprocess_options=None, validate=False, validation_rules=None,
+                                  content_hash=None):
+    """
+    上传单个音频文件，upload_voice_file 的协程版本，参数和返回值相同
+    
+    检查、计算哈希和预处理会读取整个文件，放到线程池中执行，不阻塞事件循环。
+    """
+    loop = asyncio.get_running_loop()
+    upload_path = audio_file
+    try:
+        outcome, upload_path, content_hash = await loop.run_in_executor(None, lambda: _prepare_upload(
+            api_key, audio_file, model_name, voice_name, voice_text, skip_duplicates,
+            preprocess_options, None, validate, validation_rules, content_hash
+        ))
+        if outcome is None:
+            fields = _request_fields(upload_path)
+            logger.info("发送API请求...", extra=fields)
+            started = time.monotonic()
+            response = await get_async_client().upload_voice(
+                api_key,
+                upload_path,
+                model_name.strip(),
+                voice_name.strip(),
+                voice_text.strip(),
+                progress_callback=progress_callback
+            )
+            fields["latency"] = round(time.monotonic() - started, 3)
+            outcome = _upload_response_outcome(api_key, response, content_hash, model_name, voice_name, voice_text,
+                                               fields)
+    except Exception as e:
+        error, retryable = _request_error(e, "上传", idempotent=False)
+        outcome = {"ok": False, "error": error, "retryable": retryable}
+    finally:
+        _remove_preprocessed(upload_path, audio_file)
+    
+    if not outcome["ok"]:
+        metrics.UPLOADS.inc(result="failed")
+    else:
+        metrics.UPLOADS.inc(result="duplicate" if outcome.get("duplicate") else "success")
+    return outcome
+
+
+def _prepare_upload(api_key, audio_file, model_name, voice_name, voice_text, skip_duplicates,
+                    preprocess_options, preprocess_executor, validate, validation_rules, content_hash=None):
+    """
+    发送上传请求前的准备：检查参数、查询去重索引、预处理、检查音频和文件大小（同步和异步上传共用）
+    
+    返回:
+        tuple: (outcome, upload_path, content_hash)，outcome 不为None时无需发送请求，直接以它作为结果；
+               upload_path 与 audio_file 不同时为预处理生成的临时文件，由调用方删除
+    """
+    # 参数验证
+    error = check_upload_params(api_key, audio_file, voice_name, voice_text) or known_invalid_key(api_key)
+    if error:
+        return {"ok": False, "error": error, "retryable": False}, audio_file, None
+    
+    # 查询去重索引（按原始音频计算），命中时无需预处理和任何网络请求
+    if skip_duplicates:
+        with metrics.phase_timer("upload", "hash"):
+            content_hash = content_hash or hash_file(audio_file)
+            uri = get_dedup_index().lookup(api_key, content_hash, model_name.strip(), voice_text.strip())
+        if uri:
+            logger.info(f"音频已上传过，直接使用已有音色: {os.path.basename(audio_file)} -> {uri}")
+            return {"ok": True, "uri": uri, "result": {"uri": uri}, "status_code": 200, "duplicate": True}, audio_file, content_hash
+    
+    # 预处理失败（无法解码、WAV格式有误等）时不影响上传，直接使用原文件
+    upload_path = audio_file
+    if preprocess_options is not None:
+        # 按需导入，避免不做预处理时也加载NumPy
+        import audio_preprocess
+        try:
+            with metrics.phase_timer("upload", "preprocess"):
+                if preprocess_executor is not None:
+                    upload_path = preprocess_executor.submit(audio_preprocess.preprocess_file, audio_file, preprocess_options).result()
+                else:
+                    upload_path = audio_preprocess.preprocess_file(audio_file, preprocess_options)
+        except audio_preprocess.AudioTooLongError as e:
+            return {"ok": False, "error": f"错误：{e}", "retryable": False}, audio_file, content_hash
+        except (audio_preprocess.PreprocessError, ValueError) as e:
+            logger.warning(f"音频预处理失败，使用原文件上传: {e}")
+
+    # 检查实际要上传的文件：预处理会去掉首尾静音、转换格式，原文件超长或格式少见时不应被提前拒绝
+    if validate:
+        with metrics.phase_timer("upload", "validate"):
+            report = audio_validate.validate_audio(upload_path, validation_rules)
+        if not report["ok"]:
+            return {"ok": False, "error": "错误：" + audio_validate.format_errors(report), "retryable": False}, upload_path, content_hash
+
+    # 检查文件大小
+    file_size = os.path.getsize(upload_path) / (1024 * 1024)  # 转换为MB
+    if file_size > 50:  # 假设最大限制为50MB
+        return {"ok": False, "error": f"错误：文件过大 ({file_size:.2f}MB)，请上传小于50MB的文件", "retryable": False}, upload_path, content_hash
+    
+    logger.info(f"准备上传文件: {os.path.basename(upload_path)}, 大小: {file_size:.2f}MB")
+    return None, upload_path, content_hash
+
+
+def _request_fields(upload_path):
+    """一次上传请求的结构化日志字段"""
+    return {
+        "request_id": uuid.uuid4().hex[:16],
+        "file": os.path.basename(upload_path),
+        "bytes": os.path.getsize(upload_path),
+    }
+
+
+def _upload_response_outcome(api_key, response, content_hash, model_name, voice_name, voice_text, fields=None):
+    """把上传接口的响应转换为结构化结果，成功时更新缓存和去重索引"""
+    key_check_cache.record(api_key, response.status_code)
+    fields = dict(fields or {}, status=response.status_code)
+    if response.status_code == 200:
+        with metrics.phase_timer("upload", "parse"):
+            result = response.json()
+        # 只记录uri，完整的响应内容对排查问题没有帮助，却会让日志成倍增长
+        fields["uri"] = result.get("uri")
+        logger.info(f"上传成功: {fields.get('file', '')} -> {fields['uri']}", extra=fields)
+        # 新音色已创建，该账号缓存的列表不再准确，检索索引直接加入新音色，不必重新拉取
+        voice_list_cache.invalidate(api_key)
+        if result.get("uri"):
+            get_voice_index().add(api_key, {"uri": result["uri"], "customName": voice_name.strip(),
+                                            "model": model_name.strip(), "text": voice_text.strip()})
+        if content_hash and result.get("uri"):
+            get_dedup_index().record(api_key, content_hash, model_name.strip(), voice_text.strip(), voice_name.strip(), result["uri"])
+        return {"ok": True, "uri": result.get("uri"), "result": result, "status_code": 200}
+    
+    logger.error(f"上传失败: {response.status_code} - {response.text[:500]}", extra=fields)
+    return {
+        "ok": False,
+        "status_code": response.status_code,
+        "error": f"上传失败，状态码: {response.status_code}\n\n{response.text}",
+        # 只有限流可以确定服务端没有创建音色，其他5xx重新上传可能产生重复音色（客户端已按同样的规则重试过）
+        "retryable": response.status_code == 429
+    }
+
+
+def _request_error(e, action, idempotent=True):
+    """
+    把请求过程中的异常转换为错误信息
+    
+    参数:
+        e (Exception): 捕获的异常
+        action (str): 正在执行的操作，用于日志
+        idempotent (bool): 请求是否可以安全重发，上传只有请求确定未送达（熔断、连接阶段失败）时才可重试
+        
+    返回:
+        tuple: (错误信息, 是否可重试)
+    """
+    if isinstance(e, CircuitOpenError):
+        logger.error(f"熔断中，未发送请求: {e}")
+        return f"错误：{e}", True
+    if isinstance(e, requests.exceptions.Timeout):
+        logger.error("请求超时")
+        return "错误：请求超时，请稍后重试", idempotent or is_connect_error(e)
+    if isinstance(e, requests.exceptions.ConnectionError):
+        logger.error("连接错误")
+        return "错误：无法连接到服务器，请检查网络连接", idempotent or is_connect_error(e)
+    logger.error(f"{action}过程中发生错误", exc_info=e)
+    return f"发生错误: {str(e)}", False
+
+
+def _remove_preprocessed(upload_path, audio_file):
+    """删除预处理生成的临时文件"""
+    if upload_path != audio_file and os.path.exists(upload_path):
+        os.remove(upload_path)
+
+
+def iter_batch_upload(api_key, items, concurrency=4, max_retries=2, preprocess=False, validate=True, validation_rules=None,
+                      key_pool=None, journal=None, check_text=False, skip_duplicates=True):
+    """
+    批量上传，按完成顺序逐条产出结果
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        items (list): 条目列表，见 batch_upload.load_manifest / scan_directory
+        concurrency (int): 最大并发数
+        max_retries (int): 失败重试次数
+        preprocess (bool): 上传前是否预处理音频，预处理在进程池中进行
+        validate (bool): 上传前并行检查所有音频，未通过的条目直接产出失败结果，不占用上传线程；
+                         需要预处理时改为在各条目预处理之后检查
+        validation_rules (dict): 检查规则（见 audio_validate.DEFAULT_RULES）
+        key_pool (KeyPool): 指定时每个条目从Key池中分配API Key，忽略api_key参数
+        journal (BatchJournal): 检查点日志，日志中已成功的条目直接产出记录的结果，其余条目完成后写入日志
+        check_text (bool): 上传前在进程池中检查文字内容与音频时长是否相符，明显不符的条目直接产出失败结果
+        skip_duplicates (bool): 相同的音频、模型和文字内容已上传过时直接返回已有的uri，
+                                同步时需关闭，否则改名的条目会拿到旧音色的uri
+        
+    产出:
+        dict: 单个条目的最终结果，见 batch_upload.iter_batch，使用Key池时 key 为所用Key的名称，
+              resumed 表示沿用了上次运行的结果
+    """
+    if journal is not None:
+        items, completed = journal.split(items)
+        for item, record in completed:
+            yield batch_upload.make_result(item, {"ok": True, "uri": record["uri"], "resumed": True}, 0, 0.0)
+        if completed:
+            logger.info(f"跳过上次已完成的 {len(completed)} 个条目，剩余 {len(items)} 个")
+        for result in _iter_batch_upload(api_key, items, concurrency, max_retries, preprocess, validate,
+                                         validation_rules, key_pool, check_text, skip_duplicates):
+            journal.record(result)
+            yield result
+        return
+    yield from _iter_batch_upload(api_key, items, concurrency, max_retries, preprocess, validate,
+                                  validation_rules, key_pool, check_text, skip_duplicates)
+
+
+def _iter_batch_upload(api_key, items, concurrency, max_retries, preprocess, validate, validation_rules, key_pool,
+                       check_text=False, skip_duplicates=True):
+    # 预处理可能修正原文件的问题（首尾静音、格式），此时不提前检查原文件，由每个条目预处理后检查
+    if validate and not preprocess:
+        start = time.monotonic()
+        reports = audio_validate.validate_files([item["file"] for item in items], validation_rules, max(8, int(concurrency)))
+        valid = []
+        for item, report in zip(items, reports):
+            if report["ok"]:
+                valid.append(item)
+            else:
+                metrics.UPLOADS.inc(result="failed")
+                outcome = {"ok": False, "error": "错误：" + audio_validate.format_errors(report)}
+                yield batch_upload.make_result(item, outcome, 0, time.monotonic() - start)
+        if len(valid) < len(items):
+            logger.warning(f"{len(items) - len(valid)} 个条目未通过音频检查，不会上传")
+        items = valid
+
+    if check_text and items:
+        import transcript_check
+        start = time.monotonic()
+        reports = transcript_check.check_items(items)
+        matched = []
+        for item, report in zip(items, reports):
+            if report["ok"] is False:
+                metrics.UPLOADS.inc(result="failed")
+                outcome = {"ok": False, "error": f"错误：文字内容与音频不符 - {report['message']}"}
+                yield batch_upload.make_result(item, outcome, 0, time.monotonic() - start)
+                continue
+            if report["ok"] is None:
+                logger.warning(f"{item['file']}: {report['message']}")
+            matched.append(item)
+        if len(matched) < len(items):
+            logger.warning(f"{len(items) - len(matched)} 个条目的文字内容与音频不符，不会上传")
+        items = matched
+
+    # 预处理是CPU密集型任务，放到进程池中与上传线程流水线执行
+    preprocess_pool = None
+    if preprocess:
+        import audio_preprocess
+        preprocess_pool = audio_preprocess.create_process_pool()
+    
+    def upload(key_value, item):
+        return upload_voice_file(
+            key_value, item["file"], item["model"], item["customName"], item["text"],
+            skip_duplicates=skip_duplicates,
+            preprocess_options={} if preprocess else None,
+            preprocess_executor=preprocess_pool,
+            validate=validate and preprocess,
+            validation_rules=validation_rules
+        )
+    
+    def worker(item):
+        if key_pool is None:
+            return upload(api_key, item)
+        # 失败重试时会重新分配，可能换到另一个Key
+        key = key_pool.acquire()
+        outcome = {"ok": False, "error": "错误：上传过程中断", "retryable": False}
+        try:
+            outcome = upload(key.api_key, item)
+        finally:
+            key_pool.release(key, outcome)
+        outcome["key"] = key.name
+        return outcome
+    
+    try:
+        yield from batch_upload.iter_batch(items, worker, concurrency, max_retries)
+    finally:
+        if preprocess_pool is not None:
+            preprocess_pool.shutdown()
+
+
+def delete_voice(api_key, uri):
+    """
+    删除单个音色
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        uri (str): 音色ID
+        
+    返回:
+        dict: ok(是否成功), uri(音色ID), status_code(状态码), error(错误信息), retryable(失败是否可重试)
+    """
+    error = "错误：请输入API Key" if not api_key else known_invalid_key(api_key)
+    if error:
+        return {"ok": False, "uri": uri, "error": error, "retryable": False}
+    try:
+        response = get_client().delete_voice(api_key, uri)
+    except Exception as e:
+        error, retryable = _request_error(e, "删除")
+        return {"ok": False, "uri": uri, "error": error, "retryable": retryable}
+    
+    key_check_cache.record(api_key, response.status_code)
+    if response.status_code == 200:
+        logger.info(f"已删除音色: {uri}")
+        # 列表缓存不再准确，去重索引也不应再返回已删除的音色，试听缓存随之清理
+        voice_list_cache.invalidate(api_key)
+        get_dedup_index().forget(api_key, [uri])
+        get_voice_index().remove(api_key, [uri])
+        get_preview_cache().forget([uri])
+        return {"ok": True, "uri": uri, "status_code": 200}
+    logger.error(f"删除失败: {response.status_code} - {response.text}")
+    return {
+        "ok": False,
+        "uri": uri,
+        "status_code": response.status_code,
+        "error": f"删除失败，状态码: {response.status_code}\n\n{response.text}",
+        "retryable": response.status_code == 429 or response.status_code >= 500
+    }
+
+
+def validate_api_key(api_key):
+    """验证API密钥格式"""
+    if not api_key:
+        return "请输入API Key"
+    if len(api_key.strip()) < 10:  # 假设API Key至少有10个字符
+        return "API Key格式可能不正确"
+    return None
+
+
+def check_api_key(api_key, force=False):
+    """
+    检查API Key是否有效：先检查格式，再用一次轻量的认证请求确认，结果有缓存
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        force (bool): 忽略缓存重新检查
+        
+    返回:
+        str: 检查结果信息
+    """
+    error = validate_api_key(api_key)
+    if error:
+        return error
+    verdict = key_check_cache.check(api_key, force)
+    if verdict["valid"]:
+        return "✓ API Key有效"
+    if verdict["valid"] is False:
+        return f"API Key无效（状态码 {verdict['status_code']}），请检查是否填写正确"
+    return f"暂时无法验证API Key: {verdict['error']}"
+
+
+def known_invalid_key(api_key):
+    """API Key最近已被服务端拒绝时返回错误信息，不发送请求；未知或有效时返回None"""
+    verdict = key_check_cache.lookup(api_key)
+    if verdict is not None and verdict["valid"] is False:
+        return f"错误：API Key无效（状态码 {verdict['status_code']}），请检查后重试"
+    return None
+
+
+def fetch_voice_list(api_key, force_refresh=False):
+    """
+    获取音频列表（带缓存）
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        force_refresh (bool): 忽略缓存有效期，向服务端确认最新数据
+        
+    返回:
+        tuple: (缓存条目, 错误信息)，成功时错误信息为None
+    """
+    error = "错误：请输入API Key" if not api_key else known_invalid_key(api_key)
+    if error:
+        return None, error
+    
+    try:
+        logger.info("获取音频列表...")
+        return _fetched_entry(api_key, voice_list_cache.get(api_key, force_refresh)), None
+    except VoiceListError as e:
+        logger.error(f"获取列表失败: {e.status_code} - {e.text}")
+        key_check_cache.record(api_key, e.status_code)
+        return None, str(e)
+    except Exception as e:
+        return None, _request_error(e, "获取列表")[0]
+
+
+async def fetch_voice_list_async(api_key, force_refresh=False):
+    """获取音频列表（带缓存），fetch_voice_list 的协程版本，参数和返回值相同"""
+    error = "错误：请输入API Key" if not api_key else known_invalid_key(api_key)
+    if error:
+        return None, error
+    
+    try:
+        logger.info("获取音频列表...")
+        entry = await voice_list_cache.get_async(api_key, force_refresh)
+        # 与去重索引对账会读写索引文件，放到线程池中执行
+        return await asyncio.get_running_loop().run_in_executor(None, _fetched_entry, api_key, entry), None
+    except VoiceListError as e:
+        logger.error(f"获取列表失败: {e.status_code} - {e.text}")
+        key_check_cache.record(api_key, e.status_code)
+        return None, str(e)
+    except Exception as e:
+        return None, _request_error(e, "获取列表")[0]
+
+
+def _fetched_entry(api_key, entry):
+    """取得列表后的处理，新拉取的列表用于与去重索引对账并更新检索索引"""
+    if entry["cached"]:
+        logger.info("获取列表成功（命中缓存）")
+        # 内存中有列表但检索索引中还没有该账号（如索引文件被删除）时补上
+        if not get_voice_index().has_account(api_key):
+            get_voice_index().sync(api_key, entry["voices"], entry["fetched_at"])
+    else:
+        logger.info("获取列表成功")
+        key_check_cache.record(api_key, 200)
+        # 服务端已删除的音色不应再被去重索引命中
+        get_dedup_index().reconcile(api_key, entry["voices"], entry["fetched_at"])
+        get_voice_index().sync(api_key, entry["voices"], entry["fetched_at"])
+    return entry
+
+def fetch_pool_voice_list(key_pool, force_refresh=False):
+    """
+    查询Key池中所有账号的音色列表，每个账号由调度器选出一个Key并行查询
+    
+    参数:
+        key_pool (KeyPool): Key池
+        force_refresh (bool): 忽略缓存有效期，向服务端确认最新数据
+        
+    返回:
+        tuple: (合并后的音色列表，每个音色带有 account 字段, 各账号的错误信息 {账号: 错误})
+    """
+    def fetch(account):
+        try:
+            key = key_pool.acquire(account)
+        except KeyPoolError as e:
+            return None, str(e)
+        entry, error = None, "错误：查询中断"
+        try:
+            entry, error = fetch_voice_list(key.api_key, force_refresh)
+        finally:
+            outcome = {"ok": error is None, "retryable": True}
+            verdict = key_check_cache.lookup(key.api_key)
+            if error and verdict is not None and verdict["valid"] is False:
+                # 认证失败（401/403）的Key由Key池停用，不再分配
+                outcome.update(retryable=False, status_code=verdict["status_code"])
+            key_pool.release(key, outcome)
+        return entry, error
+    
+    accounts = key_pool.accounts
+    with ThreadPoolExecutor(max_workers=len(accounts), thread_name_prefix="pool-list") as executor:
+        results = list(executor.map(fetch, accounts))
+    
+    voices = []
+    errors = {}
+    for account, (entry, error) in zip(accounts, results):
+        if error:
+            errors[account] = error
+            continue
+        voices.extend(dict(voice, account=account) for voice in entry["voices"])
+    return voices, errors
+
+def get_voice_list(api_key):
+    """获取音频列表，返回格式化的JSON文本"""
+    entry, error = fetch_voice_list(api_key)
+    if error:
+        return error
+    return json.dumps(entry["result"], indent=2, ensure_ascii=False)
+
+async def get_voice_list_async(api_key):
+    """获取音频列表，返回格式化的JSON文本（协程版本）"""
+    entry, error = await fetch_voice_list_async(api_key)
+    if error:
+        return error
+    return json.dumps(entry["result"], indent=2, ensure_ascii=False)
+
+def query_voice_table(api_key, keyword, page, refresh=False):
+    """
+    以表格形式分页显示音频列表，检索和翻页都在本地索引上完成，不会重复请求接口
+    
+    参数:
+        api_key (str): 硅基流动API密钥
+        keyword (str): 检索内容，关键字匹配名称、模型、uri或文字内容，
+                       另可用 model:、uri:、after:、before: 过滤（见 voice_index.parse_query）
+        page (int): 页码
+        refresh (bool): 先向服务端确认列表是否有更新（列表缓存未过期时不发请求）；
+                        未指定时只在本地还没有该账号的列表时拉取
+        
+    返回:
+        tuple: (状态信息, 表格数据, 实际页码)
+    """
+    if not api_key:
+        return "错误：请输入API Key", [], 1
+    if refresh or not get_voice_index().has_account(api_key):
+        entry, error = fetch_voice_list(api_key)
+        if error:
+            return error, [], 1
+    return _voice_table(api_key, keyword, page)
+
+async def query_voice_table_async(api_key, keyword, page, refresh=False):
+    """以表格形式分页显示音频列表，query_voice_table 的协程版本，参数和返回值相同"""
+    if not api_key:
+        return "错误：请输入API Key", [], 1
+    if refresh or not get_voice_index().has_account(api_key):
+        entry, error = await fetch_voice_list_async(api_key)
+        if error:
+            return error, [], 1
+    return _voice_table(api_key, keyword, page)
+
+def _voice_table(api_key, keyword, page):
+    start = time.perf_counter()
+    result = get_voice_index().search(api_key, **parse_query(keyword))
+    elapsed = (time.perf_counter() - start) * 1000
+    matched = result["voices"]
+    rows, page, pages = paginate(matched, page)
+    updated = time.strftime("%m-%d %H:%M:%S", time.localtime(result["synced_at"])) if result["synced_at"] else "未知"
+    status = (f"共 {result['total']} 个音色，匹配 {len(matched)} 个，第 {page}/{pages} 页"
+              f"（列表更新于 {updated}，检索用时 {elapsed:.2f}ms）")
+    return status, rows, page
@@ -0,0 +1,205 @@
+"""
+音色列表缓存
+
+按API Key缓存 /v1/audio/voice/list 的结果。缓存在TTL内直接返回；过期后带上
+If-None-Match 重新请求，服务端返回304时沿用本地数据，只刷新时间戳。上传成功后
+调用 invalidate() 使对应账号的缓存失效，下次查询会拉取最新列表。get_async() 是供异步
+事件处理函数使用的协程版本，与 get() 共用同一份缓存。
+
+多进程部署时（见 server.py），每个进程各有一份缓存，失效标记则记录在本地SQLite中由所有进程
+共享：任一进程上传或删除音色后，其他进程的缓存在下次查询时也会向服务端确认。
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from app_paths import get_data_dir
+from siliconflow_client import get_client, get_async_client, account_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# 缓存有效期（秒）
+DEFAULT_TTL = 60
+
+# 表格视图每页显示的条数
+PAGE_SIZE = 50
+
+# 表格视图的列，与接口返回的字段对应
+TABLE_COLUMNS = ["customName", "model", "uri", "text"]
+
+
+class VoiceListError(Exception):
+    """获取音色列表时接口返回了非200状态码"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"获取失败，状态码: {status_code}\n\n{text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class SharedInvalidations:
+    """
+    进程间共享的缓存失效标记，记录每个账号最近一次失效的时间
+
+    参数:
+        db_path (str): 数据库文件路径，默认保存在本地数据目录
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir(), "voice_cache.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS invalidations (account TEXT PRIMARY KEY, invalidated_at REAL NOT NULL)"
+            )
+
+    def mark(self, account):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO invalidations VALUES (?, ?)", (account, time.time()))
+
+    def invalidated_at(self, account):
+        """账号最近一次失效的时间戳，从未失效时返回0"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT invalidated_at FROM invalidations WHERE account=?", (account,)
+            ).fetchone()
+        return row[0] if row else 0.0
+
+
+class VoiceListCache:
+    """
+    按API Key缓存的音色列表
+
+    参数:
+        ttl (float): 缓存有效期（秒）
+        client_factory (callable): 返回 SiliconFlowClient 的函数，默认使用共享客户端
+        shared (SharedInvalidations): 进程间共享的失效标记，默认在环境变量 VOICE_UPLOAD_SHARED_CACHE=1 时启用
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, client_factory=get_client, shared=None):
+        self.ttl = ttl
+        self.client_factory = client_factory
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._shared = shared
+        self._shared_checked = shared is not None
+
+    def _shared_invalidations(self):
+        # 首次使用时才打开数据库，导入本模块不产生文件
+        if not self._shared_checked:
+            self._shared_checked = True
+            if os.environ.get("VOICE_UPLOAD_SHARED_CACHE") == "1":
+                self._shared = SharedInvalidations()
+        return self._shared
+
+    def get(self, api_key, force_refresh=False):
+        """
+        获取音色列表
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            force_refresh (bool): 忽略TTL，向服务端确认最新数据
+
+        返回:
+            dict: result(接口返回的完整内容), voices(音色列表), fetched_at(更新时间戳), cached(是否命中缓存)
+        """
+        key, entry, hit = self._lookup(api_key, force_refresh)
+        if hit:
+            return dict(entry, cached=True)
+
+        # 以发出请求的时间作为列表的更新时间，之后创建的音色不一定包含在结果中
+        requested_at = time.time()
+        with metrics.phase_timer("list", "request"):
+            response = self.client_factory().list_voices(api_key, etag=entry["etag"] if entry else None)
+        return self._store(key, entry, response, requested_at)
+
+    async def get_async(self, api_key, force_refresh=False):
+        """获取音色列表，get() 的协程版本，请求通过当前事件循环的异步客户端发出"""
+        key, entry, hit = self._lookup(api_key, force_refresh)
+        if hit:
+            return dict(entry, cached=True)
+
+        requested_at = time.time()
+        with metrics.phase_timer("list", "request"):
+            response = await get_async_client().list_voices(api_key, etag=entry["etag"] if entry else None)
+        return self._store(key, entry, response, requested_at)
+
+    def _lookup(self, api_key, force_refresh):
+        """查找缓存，返回 (缓存键, 已有条目, 是否可直接使用)"""
+        key = account_fingerprint(api_key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and not force_refresh and time.monotonic() - entry["checked_at"] < self.ttl:
+            shared = self._shared_invalidations()
+            # 其他进程在本地缓存之后修改过该账号的音色
+            if shared is None or shared.invalidated_at(key) < entry["fetched_at"]:
+                metrics.VOICE_LIST_LOOKUPS.inc(source="cache")
+                return key, entry, True
+        return key, entry, False
+
+    def _store(self, key, entry, response, requested_at):
+        """根据接口响应更新缓存，返回新的条目"""
+        if response.status_code == 304 and entry:
+            logger.info("音色列表未变化，沿用缓存")
+            metrics.VOICE_LIST_LOOKUPS.inc(source="not_modified")
+            # 服务端确认列表在本次请求时仍是最新的
+            entry = dict(entry, fetched_at=requested_at, checked_at=time.monotonic())
+        elif response.status_code == 200:
+            with metrics.phase_timer("list", "parse"):
+                result = response.json()
+            metrics.VOICE_LIST_LOOKUPS.inc(source="fetched")
+            entry = {
+                "result": result,
+                "voices": result.get("result", []) if isinstance(result, dict) else [],
+                "etag": response.headers.get("ETag"),
+                "fetched_at": requested_at,
+                "checked_at": time.monotonic(),
+            }
+        else:
+            raise VoiceListError(response.status_code, response.text)
+
+        with self._lock:
+            self._entries[key] = entry
+        return dict(entry, cached=False)
+
+    def invalidate(self, api_key):
+        """使某个API Key的缓存失效"""
+        key = account_fingerprint(api_key)
+        with self._lock:
+            self._entries.pop(key, None)
+        shared = self._shared_invalidations()
+        if shared is not None:
+            shared.mark(key)
+
+
+def filter_voices(voices, keyword):
+    """按关键字过滤音色（匹配名称、模型、uri和文字内容，不区分大小写）"""
+    keyword = (keyword or "").strip().lower()
+    if not keyword:
+        return voices
+    return [
+        voice for voice in voices
+        if any(keyword in str(voice.get(column, "")).lower() for column in TABLE_COLUMNS)
+    ]
+
+
+def paginate(voices, page, page_size=PAGE_SIZE):
+    """
+    分页并转换为表格行
+
+    返回:
+        tuple: (rows, page, pages) 其中page已被限制在有效范围内
+    """
+    pages = max(1, (len(voices) + page_size - 1) // page_size)
+    page = min(max(1, int(page or 1)), pages)
+    start = (page - 1) * page_size
+    rows = [[voice.get(column, "") for column in TABLE_COLUMNS] for voice in voices[start:start + page_size]]
+    return rows, page, pages
+
+
+voice_list_cache = VoiceListCache()
@@ -0,0 +1,397 @@
+"""
+本地音色检索索引
+
+音色列表保存在本地SQLite数据库中，程序重启后不必重新拉取整个列表就能检索。查询时在内存中
+使用倒排索引：名称、文字内容和uri按单字、两字组和三字组（trigram）建立索引，uri另按字典序
+排序支持前缀查找，模型和创建时间作为过滤条件。关键字为1-3个字时直接取对应的倒排表，更长的
+关键字对各三字组的倒排表求交集后再核对，上万个音色的账号中检索也只需几十微秒到一毫秒。与
+voice_cache.filter_voices 一致，关键字同样匹配模型名称，模型只有少数几种，逐个核对即可。
+
+上传、删除成功后增量更新索引，拉取到新的列表时按uri比对增删。接口不返回音色的创建时间，
+这里记录的是本地第一次见到该音色的时间（上传成功或首次拉取到列表的时间）。
+
+多进程部署时每个进程在内存中各有一份索引，修改时递增数据库中该账号的版本号，其他进程
+检索前发现版本变化会重新加载。
+"""
+import bisect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from app_paths import get_data_dir
+from siliconflow_client import account_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# 查询语法中的过滤条件前缀
+FILTER_PREFIXES = ("model:", "uri:", "after:", "before:")
+
+# 倒排表中已删除音色的编号累积到此数量且超过现有音色数时重建倒排表
+COMPACT_MIN_STALE = 1000
+
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def parse_time(value):
+    """解析 YYYY-MM-DD[ HH:MM[:SS]] 格式的本地时间，返回时间戳，无法解析时返回None"""
+    for fmt in _TIME_FORMATS:
+        try:
+            return time.mktime(time.strptime(value.strip(), fmt))
+        except ValueError:
+            continue
+    return None
+
+
+def parse_query(text):
+    """
+    解析检索框中的内容，例如 `alice model:CosyVoice2 after:2026-10-01`
+
+    返回:
+        dict: keyword(关键字), model(模型), uri_prefix(uri前缀), created_after/created_before(时间戳)
+    """
+    query = {"keyword": "", "model": None, "uri_prefix": None, "created_after": None, "created_before": None}
+    words = []
+    for token in (text or "").split():
+        name, _, value = token.partition(":")
+        if token.lower().startswith(FILTER_PREFIXES) and value:
+            name = name.lower()
+            if name == "model":
+                query["model"] = value
+            elif name == "uri":
+                query["uri_prefix"] = value
+            else:
+                # 日期与时间之间的空格会拆开，after:2026-10-01 只精确到天
+                query["created_after" if name == "after" else "created_before"] = parse_time(value)
+            continue
+        words.append(token)
+    query["keyword"] = " ".join(words)
+    return query
+
+
+def _haystack(voice):
+    # 各字段用换行分隔，关键字不含空白以外的分隔符，不会跨字段匹配
+    return f"{voice.get('customName') or ''}\n{voice.get('text') or ''}\n{voice.get('uri') or ''}".lower()
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class _AccountIndex:
+    """一个账号的内存索引"""
+
+    def __init__(self, version, synced_at):
+        self.version = version
+        self.synced_at = synced_at
+        self.voices = {}
+        self.haystacks = {}
+        self.ids = {}
+        # grams[n] 为长度为 n+1 的字组到音色的倒排表。倒排表用列表而不是集合：绝大多数字组
+        # 只对应少数几个音色，空集合本身就要两百多字节，列表的内存占用只有几分之一。
+        # 删除音色时不逐个从列表中移除（常见字组的列表很长，逐个移除是平方级），查找时跳过
+        # 已删除的编号，失效的条目累积到与现有音色数相当时再统一重建
+        self.grams = (defaultdict(list), defaultdict(list), defaultdict(list))
+        self._stale = 0
+        self.models = defaultdict(set)
+        self.uris = []
+        self.created = []
+        self._next_id = 0
+
+    def add(self, voice, keep_sorted=True):
+        """加入音色，批量加入时 keep_sorted=False，全部加入后调用 sort()"""
+        uri = voice["uri"]
+        if uri in self.ids:
+            self.remove(uri)
+        voice_id = self._next_id
+        self._next_id += 1
+        haystack = _haystack(voice)
+        self.voices[voice_id] = voice
+        self.haystacks[voice_id] = haystack
+        self.ids[uri] = voice_id
+        for n, postings in enumerate(self.grams, 1):
+            for gram in _grams(haystack, n):
+                postings[gram].append(voice_id)
+        self.models[voice.get("model") or ""].add(voice_id)
+        if keep_sorted:
+            bisect.insort(self.uris, (uri, voice_id))
+            bisect.insort(self.created, (voice["created_at"], voice_id))
+        else:
+            self.uris.append((uri, voice_id))
+            self.created.append((voice["created_at"], voice_id))
+
+    def sort(self):
+        self.uris.sort()
+        self.created.sort()
+
+    def remove(self, uri):
+        voice_id = self.ids.pop(uri, None)
+        if voice_id is None:
+            return False
+        voice = self.voices.pop(voice_id)
+        del self.haystacks[voice_id]
+        self._stale += 1
+        if self._stale > max(COMPACT_MIN_STALE, len(self.voices)):
+            self._compact()
+        self.models[voice.get("model") or ""].discard(voice_id)
+        del self.uris[bisect.bisect_left(self.uris, (uri, voice_id))]
+        del self.created[bisect.bisect_left(self.created, (voice["created_at"], voice_id))]
+        return True
+
+    def _compact(self):
+        """按现有音色重建倒排表，去掉已删除音色的编号"""
+        self.grams = (defaultdict(list), defaultdict(list), defaultdict(list))
+        for voice_id, haystack in self.haystacks.items():
+            for n, postings in enumerate(self.grams, 1):
+                for gram in _grams(haystack, n):
+                    postings[gram].append(voice_id)
+        self._stale = 0
+
+    def _uri_prefix(self, prefix):
+        start = bisect.bisect_left(self.uris, (prefix,))
+        matched = set()
+        for uri, voice_id in self.uris[start:]:
+            if not uri.startswith(prefix):
+                break
+            matched.add(voice_id)
+        return matched
+
+    def _keyword(self, keyword):
+        keyword = keyword.lower()
+        matched = self._text(keyword)
+        for name, ids in self.models.items():
+            if keyword in name.lower():
+                matched |= ids
+        return matched
+
+    def _text(self, keyword):
+        """名称、文字内容或uri包含关键字的音色，keyword 需已转为小写"""
+        if len(keyword) <= 3:
+            return {voice_id for voice_id in self.grams[len(keyword) - 1].get(keyword, ()) if voice_id in self.voices}
+        # 从最短的倒排表开始求交集，候选很快缩小，最后核对关键字是否连续出现。剩下的倒排表
+        # 比候选多得多时不再求交集，直接核对候选比遍历长列表快
+        postings = sorted((self.grams[2].get(gram, ()) for gram in _grams(keyword, 3)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) * 4 < len(posting):
+                break
+            candidates.intersection_update(posting)
+        return {voice_id for voice_id in candidates if keyword in self.haystacks.get(voice_id, "")}
+
+    def search(self, keyword, model, uri_prefix, created_after, created_before):
+        candidates = None
+
+        def narrow(ids):
+            nonlocal candidates
+            candidates = ids if candidates is None else candidates & ids
+
+        if keyword:
+            narrow(self._keyword(keyword))
+        if uri_prefix:
+            narrow(self._uri_prefix(uri_prefix))
+        if model:
+            # 模型只有少数几种，按子串匹配，model:cosyvoice 即可
+            model = model.lower()
+            narrow(set().union(*(ids for name, ids in self.models.items() if model in name.lower())))
+        if created_after is not None or created_before is not None:
+            low = float("-inf") if created_after is None else created_after
+            high = float("inf") if created_before is None else created_before
+            if candidates is None:
+                start = bisect.bisect_left(self.created, (low,))
+                end = bisect.bisect_left(self.created, (high,))
+                candidates = {voice_id for _, voice_id in self.created[start:end]}
+            else:
+                candidates = {voice_id for voice_id in candidates if low <= self.voices[voice_id]["created_at"] < high}
+
+        # 最近创建的排在前面：匹配的条目较多时按时间顺序扫描一遍，比排序快
+        if candidates is None:
+            return [self.voices[voice_id] for _, voice_id in reversed(self.created)]
+        if len(candidates) * 8 > len(self.created):
+            return [self.voices[voice_id] for _, voice_id in reversed(self.created) if voice_id in candidates]
+        return sorted((self.voices[voice_id] for voice_id in candidates), key=lambda voice: voice["created_at"],
+                      reverse=True)
+
+
+class VoiceIndex:
+    """
+    持久化的音色检索索引
+
+    参数:
+        db_path (str): 数据库文件路径，默认保存在本地数据目录
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(get_data_dir(), "voice_index.sqlite3")
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS voices (
+                    account TEXT NOT NULL,
+                    uri TEXT NOT NULL,
+                    custom_name TEXT,
+                    model TEXT,
+                    text TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (account, uri)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS accounts (
+                    account TEXT PRIMARY KEY,
+                    synced_at REAL,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+
+    def _version(self, account):
+        row = self._conn.execute("SELECT version, synced_at FROM accounts WHERE account=?", (account,)).fetchone()
+        return row if row else (None, None)
+
+    def _index(self, account):
+        """取得账号的内存索引，数据库中的版本变化（其他进程修改过）时重新加载，需持有锁"""
+        version, synced_at = self._version(account)
+        index = self._accounts.get(account)
+        if index is not None and index.version == version:
+            return index
+        index = _AccountIndex(version, synced_at)
+        rows = self._conn.execute(
+            "SELECT uri, custom_name, model, text, created_at FROM voices WHERE account=?", (account,)
+        ).fetchall()
+        for uri, custom_name, model, text, created_at in rows:
+            index.add({"customName": custom_name, "model": model, "uri": uri, "text": text, "created_at": created_at},
+                      keep_sorted=False)
+        index.sort()
+        self._accounts[account] = index
+        return index
+
+    def _bump(self, account, index, synced_at=None):
+        """递增账号的版本号，需持有锁并在事务中调用"""
+        current = self._version(account)[0]
+        self._conn.execute(
+            "INSERT INTO accounts (account, synced_at, version) VALUES (?, ?, 1) "
+            "ON CONFLICT(account) DO UPDATE SET version=version+1, synced_at=COALESCE(?, synced_at)",
+            (account, synced_at, synced_at)
+        )
+        version, index.synced_at = self._version(account)
+        # 加载之后其他进程也修改过，内存中的索引不完整，下次检索时重新加载
+        index.version = version if current == index.version else None
+
+    def has_account(self, api_key):
+        """是否已经拉取过该账号的音色列表"""
+        with self._lock:
+            return self._version(account_fingerprint(api_key))[1] is not None
+
+    def sync(self, api_key, voices, listed_at):
+        """
+        用服务端的完整列表更新索引
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            voices (list): 服务端的音色列表
+            listed_at (float): 获取列表的时间戳，此后新增的音色可能不在列表中，予以保留
+
+        返回:
+            tuple: (新增数, 删除数)
+        """
+        account = account_fingerprint(api_key)
+        remote = {voice["uri"]: voice for voice in voices if voice.get("uri")}
+        with self._lock, self._conn:
+            index = self._index(account)
+            added = [dict(voice, created_at=listed_at) for uri, voice in remote.items()
+                     if uri not in index.ids or _haystack(index.voices[index.ids[uri]]) != _haystack(voice)
+                     or index.voices[index.ids[uri]].get("model") != voice.get("model")]
+            # 名称等字段变化的音色沿用原来的创建时间
+            for voice in added:
+                if voice["uri"] in index.ids:
+                    voice["created_at"] = index.voices[index.ids[voice["uri"]]]["created_at"]
+            removed = [uri for uri, voice_id in index.ids.items()
+                       if uri not in remote and index.voices[voice_id]["created_at"] < listed_at]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO voices VALUES (?, ?, ?, ?, ?, ?)",
+                [(account, voice["uri"], voice.get("customName"), voice.get("model"), voice.get("text"),
+                  voice["created_at"]) for voice in added]
+            )
+            self._conn.executemany("DELETE FROM voices WHERE account=? AND uri=?", [(account, uri) for uri in removed])
+            # 先删除（依赖有序列表），再批量加入后统一排序
+            for uri in removed + [voice["uri"] for voice in added]:
+                index.remove(uri)
+            for voice in added:
+                index.add(_indexed(voice), keep_sorted=False)
+            index.sort()
+            self._bump(account, index, listed_at)
+        if added or removed:
+            logger.info(f"音色索引更新：新增 {len(added)} 个，删除 {len(removed)} 个")
+        return len(added), len(removed)
+
+    def add(self, api_key, voice):
+        """上传成功后加入新音色"""
+        account = account_fingerprint(api_key)
+        voice = dict(_indexed(voice), created_at=time.time())
+        with self._lock, self._conn:
+            index = self._index(account)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO voices VALUES (?, ?, ?, ?, ?, ?)",
+                (account, voice["uri"], voice["customName"], voice["model"], voice["text"], voice["created_at"])
+            )
+            index.add(voice)
+            self._bump(account, index)
+
+    def remove(self, api_key, uris):
+        """删除成功后移除音色，返回移除的条目数"""
+        account = account_fingerprint(api_key)
+        with self._lock, self._conn:
+            index = self._index(account)
+            self._conn.executemany("DELETE FROM voices WHERE account=? AND uri=?", [(account, uri) for uri in uris])
+            removed = sum(1 for uri in uris if index.remove(uri))
+            self._bump(account, index)
+        return removed
+
+    def search(self, api_key, keyword="", model=None, uri_prefix=None, created_after=None, created_before=None):
+        """
+        检索音色
+
+        参数:
+            api_key (str): 硅基流动API密钥
+            keyword (str): 关键字，匹配名称、模型、uri和文字内容（不区分大小写），同 voice_cache.filter_voices
+            model (str): 只返回模型名称包含此内容的音色（不区分大小写）
+            uri_prefix (str): 只返回uri以此开头的音色
+            created_after (float): 只返回此时间之后创建的音色（时间戳）
+            created_before (float): 只返回此时间之前创建的音色（时间戳）
+
+        返回:
+            dict: voices(匹配的音色，最近创建的在前), total(账号的音色总数), synced_at(上次拉取列表的时间)
+        """
+        with self._lock:
+            index = self._index(account_fingerprint(api_key))
+            voices = index.search((keyword or "").strip(), model, uri_prefix, created_after, created_before)
+            return {"voices": voices, "total": len(index.voices), "synced_at": index.synced_at}
+
+
+def _indexed(voice):
+    """索引中保存的字段"""
+    return {
+        "customName": voice.get("customName") or "",
+        "model": voice.get("model") or "",
+        "uri": voice["uri"],
+        "text": voice.get("text") or "",
+        "created_at": voice.get("created_at"),
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_voice_index():
+    """获取进程内共享的检索索引"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VoiceIndex()
+    return _index
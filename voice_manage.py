@@ -0,0 +1,155 @@
+"""
+音色的批量管理
+
+按关键字、uri或清单批量删除音色，导出完整的音色列表（CSV/Parquet），以及把账号中的
+音色与本地清单同步：只上传清单中有而服务端没有的音色，可选删除清单中没有的音色。
+删除请求与批量上传一样由 batch_upload.iter_batch 并发执行，经过客户端的限流和重试。
+
+比对时服务端列表先按 (名称, 模型, 文字内容) 建立字典索引，每个条目只做一次查找，
+账号中有数万个音色时也能很快完成。
+"""
+import csv
+import logging
+
+import batch_upload
+import voice_api
+from voice_cache import TABLE_COLUMNS, filter_voices
+
+logger = logging.getLogger(__name__)
+
+
+def voice_key(entry):
+    """音色或清单条目的比对键，与 dedup_index.rebuild 一致"""
+    return (
+        (entry.get("customName") or "").strip(),
+        (entry.get("model") or "").strip(),
+        (entry.get("text") or "").strip(),
+    )
+
+
+def select_voices(voices, keyword=None, uris=None, items=None):
+    """
+    选出要处理的音色，多个条件同时指定时取交集
+
+    参数:
+        voices (list): 服务端的音色列表
+        keyword (str): 过滤关键字，匹配名称、模型、uri和文字内容
+        uris (list): 只选择这些uri
+        items (list): 只选择与清单条目匹配的音色
+
+    返回:
+        list: 选中的音色
+    """
+    selected = filter_voices(voices, keyword)
+    if uris:
+        wanted = set(uris)
+        selected = [voice for voice in selected if voice.get("uri") in wanted]
+    if items is not None:
+        keys = {voice_key(item) for item in items}
+        selected = [voice for voice in selected if voice_key(voice) in keys]
+    return selected
+
+
+def iter_delete(api_key, voices, concurrency=8, max_retries=2):
+    """
+    并发删除音色，按完成顺序逐条产出结果
+
+    参数:
+        api_key (str): 硅基流动API密钥
+        voices (list): 要删除的音色，至少包含 uri
+        concurrency (int): 最大并发数
+        max_retries (int): 失败重试次数
+
+    产出:
+        dict: 单个音色的删除结果，字段同 batch_upload.iter_batch
+    """
+    items = [
+        {
+            "index": index,
+            "file": "",
+            "customName": voice.get("customName", ""),
+            "text": voice.get("text", ""),
+            "model": voice.get("model", ""),
+            "uri": voice["uri"],
+        }
+        for index, voice in enumerate(voices)
+    ]
+    yield from batch_upload.iter_batch(items, lambda item: voice_api.delete_voice(api_key, item["uri"]),
+                                       concurrency, max_retries)
+
+
+def export_voices(voices, path):
+    """
+    导出音色列表，按扩展名选择格式：.parquet 导出为Parquet（需要安装pyarrow），其余导出为CSV
+
+    参数:
+        voices (list): 音色列表，合并了多个账号时带有 account 字段
+        path (str): 输出文件路径
+
+    返回:
+        int: 导出的条数
+    """
+    columns = list(TABLE_COLUMNS)
+    if any("account" in voice for voice in voices):
+        columns.insert(0, "account")
+
+    if path.lower().endswith(".parquet"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("导出Parquet需要安装pyarrow：pip install pyarrow")
+        table = pyarrow.table({column: [str(voice.get(column, "")) for voice in voices] for column in columns})
+        pyarrow.parquet.write_table(table, path)
+    else:
+        # utf-8-sig 便于用 Excel 直接打开，batch_upload.load_manifest 也能读取
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for voice in voices:
+                writer.writerow({column: voice.get(column, "") for column in columns})
+    logger.info(f"已导出 {len(voices)} 个音色: {path}")
+    return len(voices)
+
+
+def plan_sync(items, voices):
+    """
+    比对本地清单和服务端的音色列表
+
+    参数:
+        items (list): 清单条目，见 batch_upload.load_manifest / scan_directory
+        voices (list): 服务端的音色列表
+
+    返回:
+        dict: upload(服务端缺少、需要上传的条目), delete(清单中没有的音色，以及同一条目多余的重复音色),
+              unchanged(已存在的条目数)
+    """
+    remote = {}
+    for voice in voices:
+        remote.setdefault(voice_key(voice), []).append(voice)
+
+    upload = []
+    wanted = set()
+    for item in items:
+        key = voice_key(item)
+        if key in wanted:
+            continue
+        wanted.add(key)
+        if key not in remote:
+            upload.append(item)
+
+    delete = []
+    for key, group in remote.items():
+        # 清单中有的条目保留一个音色，其余视为多余
+        delete.extend(group[1:] if key in wanted else group)
+    return {"upload": upload, "delete": delete, "unchanged": len(wanted) - len(upload)}
+
+
+def format_plan(plan, prune=False):
+    """格式化同步计划"""
+    lines = [f"已存在 {plan['unchanged']} 个，需上传 {len(plan['upload'])} 个，"
+             f"清单外的音色 {len(plan['delete'])} 个{'（将删除）' if prune else '（保留，加上 --prune 删除）'}"]
+    lines += [f"  + {item['customName']} ({item['file']})" for item in plan["upload"]]
+    if prune:
+        lines += [f"  - {voice.get('customName', '')} ({voice.get('uri', '')})" for voice in plan["delete"]]
+    return "\n".join(lines)